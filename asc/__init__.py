@@ -0,0 +1,15 @@
+# python >= 3.6
+""" This is the Astro Script Compiler (asc), lowering the code object
+generated by the parser into compact instructions for the interpreter.
+The parser output is great for reading, but executing it means comparing
+the type & name strings of each statement every single time it runs, so
+the interpreter compiles the whole code once before executing it. The
+instruction set can be found in the opcodes module.
+"""
+
+__version__ = '0.2'
+
+# Interface imports
+from .compiler import Code, Compiler, CompileError, NULL, compile_code, dis
+from . import opcodes
+from .expression import ExpressionError
@@ -0,0 +1,531 @@
+""" The compiler lowering the pax3 code object generated by asp3 into a
+flat instruction array, which the interpreter can execute without having
+to look at the statement dicts again.
+
+* Code objects: Each compiled block of code (the module itself and every
+  function) is a Code object. The instructions are stored in the ops list
+  as opcode & argument pairs, constants and the (name, argc) call sites
+  are collected in the consts pool and variable names in the names table,
+  so the instructions only have to carry integer indexes. The lines list holds the source line of every
+  instruction for error reporting.
+
+* Locals: The local variables of a function are resolved when compiling,
+  each one gets a slot index in the varnames table: first the parameters,
+  then every assigned or deleted variable. A function using @mixin has no
+  idea which variables the mixin will set, so every variable used in it is
+  local. Local variables are accessed with the *_FAST instructions, the
+  other ones with the *_NAME instructions, looking them up in the global
+  variable storage.
+
+* Values: Constants are stored in the same tagged tuple format the
+  interpreter uses for its variables, so ('num', 1.0) or ('str', 'abc').
+  Array literals are built at runtime with BUILD_ARRAY, because mixins
+  are allowed to modify arrays in place and a shared constant array would
+  leak the changes into the next execution. Literals of numbers only are
+  stored as a tuple of the numbers and built with BUILD_NUMBERS into the
+  compact array type of astropy (NumArray), 8 bytes per number. Map
+  literals are built at runtime too, pushing every key & value and then
+  building the map with BUILD_MAP.
+
+* Expressions: Math & comparisons are parsed into a tree by the expression
+  module (folding the constant parts) and emitted in postfix order, so the
+  operands are on the stack by the time the operator instruction runs.
+
+* Control flow: if/elif/else chains and while loops are lowered into
+  conditional jumps, their targets being indexes in the ops list. The
+  conditions are compiled once, a constant condition removes the jump (or
+  the whole block) altogether.
+
+* Profiling: Compiling with profile=True places a LINE instruction at the
+  start of every statement (and before every loop or elif condition), so
+  the interpreter can tell the profiler which line is running. Normal
+  code has none of them, so it doesn't pay anything for the profiler.
+"""
+import math
+
+from . import expression
+from . import operators
+from . import opcodes as op
+
+# The value pushed when there is nothing to push, like the return value
+# of a function without a return statement.
+NULL = ('null', None)
+
+
+class CompileError(Exception):
+    """ Raised when the code object contains something the compiler
+    cannot lower into instructions. """
+
+    def __init__(self, message: str, line: int = 0):
+        super().__init__(f'{message} @ line {line}')
+        self.line = line
+
+
+class Code:
+    """ A compiled block of astro code. """
+
+    __slots__ = ('name', 'params', 'ops', 'consts', 'names', 'varnames',
+                 'lines', 'filename', 'firstline', '_index')
+
+    def __init__(self, name: str, params: list = None,
+                 filename: str = '<string>', firstline: int = 0):
+        self.name = name
+        self.params = params or []
+        self.filename = filename
+        self.firstline = firstline
+        self.ops = []
+        self.consts = []
+        self.names = []
+        self.varnames = []
+        self.lines = []
+        self._index = {}
+        for param in self.params:
+            self.add_local(param)
+
+    def __repr__(self):
+        return f'<Code {self.name}, {len(self.ops) // 2} instructions>'
+
+    def add_const(self, value) -> int:
+        """ Returns the index of the constant, adding it to the pool
+        if it's not there yet. """
+        return self._add(self.consts, 'const', value, self.const_key(value))
+
+    def add_call(self, name: str, argc: int) -> int:
+        """ Returns the consts index of the (name, argc) call site,
+        adding it to the pool if it's not there yet. Call sites are
+        indexed apart from the constants, so a function named like a
+        value type never shares its entry with a value. """
+        return self._add(self.consts, 'call', (name, argc))
+
+    def add_name(self, name: str) -> int:
+        """ Returns the index of the name, adding it to the names
+        table if it's not there yet. """
+        return self._add(self.names, 'name', name)
+
+    def add_local(self, name: str) -> int:
+        """ Returns the slot index of the local variable, adding it to
+        the varnames table if it's not there yet. """
+        return self._add(self.varnames, 'local', name)
+
+    def local(self, name: str):
+        """ Returns the slot index of the local variable, or None if
+        the variable is not local. """
+        return self._index.get(('local', name))
+
+    @classmethod
+    def const_key(cls, value):
+        """ Returns the key the constant is indexed by. Values comparing
+        equal but of a different type (1, 1.0 & True) or sign (0.0 &
+        -0.0) get different keys, so they're never merged. """
+        if type(value) is float:
+            return float, value, math.copysign(1.0, value)
+        if type(value) is tuple:
+            return tuple, tuple(cls.const_key(item) for item in value)
+        return type(value), value
+
+    def _add(self, table: list, kind: str, item, key=None) -> int:
+        key = (kind, item if key is None else key)
+        if key not in self._index:
+            self._index[key] = len(table)
+            table.append(item)
+        return self._index[key]
+
+    def emit(self, opcode: int, arg: int = 0, line: int = 0) -> int:
+        """ Appends the instruction to the code and returns its
+        position in the ops list. """
+        self.ops.append(opcode)
+        self.ops.append(arg)
+        self.lines.append(line)
+        return len(self.ops) - 2
+
+    def patch(self, pos: int, target: int = None):
+        """ Sets the target of the jump instruction at the position,
+        by default to the end of the code emitted so far. """
+        self.ops[pos + 1] = len(self.ops) if target is None else target
+
+
+class Compiler:
+    """ Compiles a pax3 code object into Code objects. """
+
+    def __init__(self, assignment_kw: str = 'data', prefix: str = '',
+                 filename: str = '<string>', profile: bool = False):
+        """ The assignment_kw has to be the same keyword that was passed
+        to the parser. The prefix is placed before the names of all
+        defined functions, so library functions can be called with
+        the library name, like Array.len(). The filename is stored in
+        every Code object, profile adds the LINE instructions. """
+        self.assignment_kw = assignment_kw
+        self.prefix = prefix
+        self.filename = filename
+        self.profile = profile
+
+    def compile(self, source: list, name: str = '<module>') -> Code:
+        """ Compiles the whole module. The header placed by asp3 is
+        checked and skipped. """
+        if source and 'format' in source[0]:
+            if source[0]['format'] != 'pax3':
+                raise CompileError(f"unsupported format {source[0]['format']}")
+            source = source[1:]
+
+        code = Code(name, filename=self.filename)
+        self.block(code, source)
+        return code
+
+    # Statement type -> name of the compiling method. Base statements
+    # are looked up by their name in the STATEMENTS table instead. The
+    # if blocks are compiled together with the elif & else blocks
+    # following them, so those only end up here if there is no if before
+    # them. The try & for blocks are not supported yet and get skipped,
+    # just like before.
+    TYPES = {
+        'assignment': 'c_assignment',
+        'function': 'c_function',
+        'call': 'c_call',
+        'statement': 'c_statement',
+        'delete': 'c_delete',
+        'import': 'c_import',
+        'mixin': 'c_mixin',
+        'elif': 'c_orphan',
+        'else': 'c_orphan',
+        'while': 'c_while'
+    }
+
+    STATEMENTS = {
+        'out': 's_out',
+        'say': 's_out',
+        'pause': 's_pause',
+        'return': 's_return'
+    }
+
+    def block(self, code: Code, statements: list):
+        """ Compiles a list of statements into the code object. Each
+        statement is handed to the method found in the TYPES table. """
+        pos = 0
+        while pos < len(statements):
+            statement = statements[pos]
+            pos += 1
+            if self.profile:
+                code.emit(op.LINE, statement['line'], statement['line'])
+
+            if statement['type'] == 'if':
+                # Collecting the elif & else blocks of the chain
+                chain = [statement]
+                while pos < len(statements) and chain[-1]['type'] != 'else' \
+                        and statements[pos]['type'] in ('elif', 'else'):
+                    chain.append(statements[pos])
+                    pos += 1
+                self.c_if(code, chain, statement['line'])
+                continue
+
+            method = self.TYPES.get(statement['type'])
+            if method:
+                getattr(self, method)(code, statement, statement['line'])
+
+    # ------------------------------------------
+    # Statement types
+    # ------------------------------------------
+
+    def c_assignment(self, code: Code, statement: dict, line: int):
+        self.value(code, statement[self.assignment_kw], line)
+        self.variable(code, op.STORE_FAST, op.STORE_NAME, statement['var'], line)
+
+    def c_function(self, code: Code, statement: dict, line: int):
+        params = [p for p in statement['parameters'] if p]
+        func = Code(self.prefix + statement['name'], params, self.filename, line)
+
+        assigned, used, mixin = [], [], False
+        for child in self.walk(statement['code']):
+            if child['type'] == 'assignment' or child['type'] == 'delete':
+                assigned.append(child['var'])
+            elif child['type'] == 'mixin':
+                mixin = True
+            for value in self.values_of(child):
+                used.extend(self.names_in(value))
+
+        for name in assigned + (used if mixin else []):
+            func.add_local(name)
+
+        self.block(func, statement['code'])
+        code.emit(op.MAKE_FUNCTION, code.add_const(func), line)
+
+    def c_call(self, code: Code, statement: dict, line: int):
+        self.call(code, statement['name'], statement['params'], line)
+        code.emit(op.POP_TOP, 0, line)
+
+    def c_statement(self, code: Code, statement: dict, line: int):
+        method = self.STATEMENTS.get(statement['name'])
+        if not method:
+            raise CompileError(f'unknown statement "{statement["name"]}"', line)
+        getattr(self, method)(code, statement['params'], line)
+
+    def c_delete(self, code: Code, statement: dict, line: int):
+        self.variable(code, op.DELETE_FAST, op.DELETE_NAME, statement['var'], line)
+
+    def c_import(self, code: Code, statement: dict, line: int):
+        code.emit(op.IMPORT, code.add_name(statement['name']), line)
+
+    def c_mixin(self, code: Code, statement: dict, line: int):
+        code.emit(op.MIXIN, code.add_name(statement['value']), line)
+
+    def c_if(self, code: Code, chain: list, line: int):
+        # Every branch jumps over the following ones when it's done
+        ends = []
+        for branch in chain:
+            line = branch['line']
+            skip = None
+            if branch['type'] != 'else':
+                tree = self.condition(branch['condition'], line)
+                if tree[0] == 'const':
+                    if not operators.truth(tree[1]):
+                        continue    # Never taken
+                    self.block(code, branch['code'])
+                    break           # Always taken, the other branches are unreachable
+                if self.profile and branch is not chain[0]:
+                    code.emit(op.LINE, line, line)
+                self.expression(code, tree, line)
+                skip = code.emit(op.JUMP_IF_FALSE, 0, line)
+
+            self.block(code, branch['code'])
+            if skip is None:
+                break
+            if branch is not chain[-1]:
+                ends.append(code.emit(op.JUMP, 0, line))
+            code.patch(skip)
+
+        for jump in ends:
+            code.patch(jump)
+
+    def c_orphan(self, code: Code, statement: dict, line: int):
+        raise CompileError(f'"{statement["type"]}" without "if"', line)
+
+    def c_while(self, code: Code, statement: dict, line: int):
+        # The condition is placed after the body, so every iteration only
+        # runs a single jump instruction
+        tree = self.condition(statement['condition'], line)
+        if tree[0] == 'const':
+            if operators.truth(tree[1]):
+                start = len(code.ops)
+                self.block(code, statement['code'])
+                code.emit(op.JUMP, start, line)
+            return
+
+        check = code.emit(op.JUMP, 0, line)
+        start = len(code.ops)
+        self.block(code, statement['code'])
+        code.patch(check)
+        if self.profile:
+            code.emit(op.LINE, line, line)
+        self.expression(code, tree, line)
+        code.emit(op.JUMP_IF_TRUE, start, line)
+
+    # ------------------------------------------
+    # Base statements
+    # ------------------------------------------
+
+    def s_out(self, code: Code, params: list, line: int):
+        for param in params:
+            self.value(code, param, line)
+        code.emit(op.OUT, len(params), line)
+
+    def s_pause(self, code: Code, params: list, line: int):
+        if len(params) != 1:
+            raise CompileError('pause takes exactly one parameter', line)
+        self.value(code, params[0], line)
+        code.emit(op.PAUSE, 0, line)
+
+    def s_return(self, code: Code, params: list, line: int):
+        if params:
+            self.value(code, params[0], line)
+        else:
+            code.emit(op.LOAD_CONST, code.add_const(NULL), line)
+        code.emit(op.RETURN_VALUE, 0, line)
+
+    # ------------------------------------------
+    # Values
+    # ------------------------------------------
+
+    def call(self, code: Code, name: str, params: list, line: int):
+        """ Compiles a function call, leaving the returned value on
+        the stack. """
+        for param in params:
+            self.value(code, param, line)
+        code.emit(op.CALL, code.add_call(name, len(params)), line)
+
+    def value(self, code: Code, value, line: int):
+        """ Compiles a value in the tagged format, pushing it onto
+        the stack. """
+        type_, data = value[0], value[1]
+
+        if type_ in ('num', 'str', 'bool'):
+            code.emit(op.LOAD_CONST, code.add_const((type_, data)), line)
+
+        elif type_ == 'array':
+            if data and all(element[0] == 'num' for element in data):
+                numbers = tuple(element[1] for element in data)
+                code.emit(op.BUILD_NUMBERS, code.add_const(numbers), line)
+                return
+            for element in data:
+                self.value(code, element, line)
+            code.emit(op.BUILD_ARRAY, len(data), line)
+
+        elif type_ == 'map':
+            for key, element in data:
+                self.value(code, key, line)
+                self.value(code, element, line)
+            code.emit(op.BUILD_MAP, len(data), line)
+
+        elif type_ == 'var':
+            self.variable(code, op.LOAD_FAST, op.LOAD_NAME, data, line)
+
+        elif type_ == 'elm':
+            self.variable(code, op.LOAD_FAST, op.LOAD_NAME, data['var'], line)
+            code.emit(op.LOAD_INDEX, data['element'], line)
+
+        elif type_ == 'call':
+            self.call(code, f"{data['module']}.{data['name']}", data['params'], line)
+
+        elif type_ == 'math':
+            try:
+                tree = expression.parse(data)
+            except expression.ExpressionError as e:
+                raise CompileError(f'invalid expression, {e}', line)
+            self.expression(code, tree, line)
+
+        else:
+            raise CompileError(f'unknown value type "{type_}"', line)
+
+
+    @staticmethod
+    def condition(tokens: list, line: int):
+        """ Returns the expression tree of the block condition. """
+        try:
+            return expression.parse(tokens)
+        except expression.ExpressionError as e:
+            raise CompileError(f'invalid condition, {e}', line)
+
+    # Binary operator name -> instruction
+    BINARY = {
+        'ADD': op.BINARY_ADD,
+        'SUB': op.BINARY_SUB,
+        'MUL': op.BINARY_MUL,
+        'DIV': op.BINARY_DIV
+    }
+
+    def expression(self, code: Code, node, line: int):
+        """ Compiles the expression tree into postfix instructions,
+        pushing the result onto the stack. """
+        kind = node[0]
+
+        if kind == 'const':
+            code.emit(op.LOAD_CONST, code.add_const(node[1]), line)
+
+        elif kind == 'var':
+            self.variable(code, op.LOAD_FAST, op.LOAD_NAME, node[1], line)
+
+        elif kind == 'elm':
+            self.variable(code, op.LOAD_FAST, op.LOAD_NAME, node[1], line)
+            code.emit(op.LOAD_INDEX, node[2], line)
+
+        elif kind == 'call':
+            for arg in node[2]:
+                self.expression(code, arg, line)
+            code.emit(op.CALL, code.add_call(node[1], len(node[2])), line)
+
+        elif kind == 'neg':
+            self.expression(code, node[1], line)
+            code.emit(op.UNARY_NEG, 0, line)
+
+        else:
+            self.expression(code, node[2], line)
+            self.expression(code, node[3], line)
+            if node[1] in self.BINARY:
+                code.emit(self.BINARY[node[1]], 0, line)
+            else:
+                code.emit(op.COMPARE_OP, operators.COMPARISONS.index(node[1]), line)
+
+    @staticmethod
+    def variable(code: Code, fast: int, name: int, var: str, line: int):
+        """ Emits the fast instruction if the variable is local, else
+        the name instruction. """
+        slot = code.local(var)
+        if slot is not None:
+            code.emit(fast, slot, line)
+        else:
+            code.emit(name, code.add_name(var), line)
+
+    # ------------------------------------------
+    # Scanning
+    # ------------------------------------------
+
+    @classmethod
+    def walk(cls, statements: list):
+        """ Yields every statement in the block, including the ones in
+        nested blocks, but not the ones in nested functions. """
+        for statement in statements:
+            yield statement
+            if 'code' in statement and statement['type'] != 'function':
+                yield from cls.walk(statement['code'])
+
+    def values_of(self, statement: dict):
+        """ Returns the values used by the statement. """
+        kind = statement['type']
+        if kind == 'assignment':
+            return [statement[self.assignment_kw]]
+        if kind == 'call' or kind == 'statement':
+            return statement['params']
+        if 'condition' in statement:
+            return [('math', statement['condition'])]
+        return []
+
+    @classmethod
+    def names_in(cls, value):
+        """ Yields the names of all variables used in the value. """
+        type_, data = value[0], value[1]
+        if type_ == 'var':
+            yield data
+        elif type_ == 'elm':
+            yield data['var']
+        elif type_ == 'array':
+            for element in data:
+                yield from cls.names_in(element)
+        elif type_ == 'map':
+            for key, element in data:
+                yield from cls.names_in(key)
+                yield from cls.names_in(element)
+        elif type_ == 'call':
+            for param in data['params']:
+                yield from cls.names_in(param)
+        elif type_ == 'math':
+            try:
+                yield from expression.variables(expression.parse(data))
+            except expression.ExpressionError:
+                pass
+
+
+def compile_code(source: list, **kw) -> Code:
+    """ Compiles the pax3 code object and returns the module Code
+    object. The keyword arguments are passed to the Compiler. """
+    return Compiler(**kw).compile(source)
+
+
+def dis(code: Code) -> str:
+    """ Returns a human readable listing of the instructions. """
+    out = [repr(code)]
+    for i in range(0, len(code.ops), 2):
+        opcode, arg = code.ops[i], code.ops[i + 1]
+        name = op.NAMES.get(opcode, str(opcode))
+        if opcode in (op.LOAD_CONST, op.CALL, op.MAKE_FUNCTION, op.BUILD_NUMBERS):
+            detail = repr(code.consts[arg])
+        elif opcode in (op.LOAD_NAME, op.STORE_NAME, op.DELETE_NAME,
+                        op.IMPORT, op.MIXIN):
+            detail = code.names[arg]
+        elif opcode in (op.LOAD_FAST, op.STORE_FAST, op.DELETE_FAST):
+            detail = code.varnames[arg]
+        elif opcode in (op.JUMP, op.JUMP_IF_FALSE, op.JUMP_IF_TRUE):
+            detail = f'to {arg}'
+        elif opcode == op.COMPARE_OP:
+            detail = operators.SYMBOLS[operators.COMPARISONS[arg]]
+        else:
+            detail = str(arg)
+        out.append(f'{code.lines[i // 2]:>5} {i:>5} {name:<14} {detail}')
+    return '\n'.join(out)
@@ -0,0 +1,190 @@
+""" The expression parser of the compiler. The asp3 parser turns math and
+conditions into a flat list of tokens, like [1.0, 'ADD', 'x', 'MUL', 2.0],
+which is turned into a tree here using precedence climbing. String
+literals are kept as tagged ('str', text) values in the tokens. Parts of the
+expression that only use literals are folded into a single constant right
+away, so the interpreter never computes them.
+
+* Nodes: The tree is made out of tuples, the first element being the type
+  of the node:
+    ('const', value)            - a value in the tagged format
+    ('var', name)               - a variable
+    ('elm', name, index)        - an element of an array variable
+    ('call', name, [args])      - a function call
+    ('neg', node)               - a negated node
+    ('binary', op, left, right) - an operator, using the parse_math names
+
+* Precedence: Comparisons bind the weakest, then addition & subtraction,
+  then multiplication & division. The unary minus binds the strongest.
+  All binary operators are left-associative.
+"""
+from . import operators
+import re
+
+# Binding power of the binary operators.
+PRECEDENCE = {
+    'CSM': 1, 'CLG': 1, 'CSE': 1, 'CLE': 1, 'CEQ': 1, 'NOT': 1,
+    'ADD': 2, 'SUB': 2,
+    'MUL': 3, 'DIV': 3
+}
+
+# Brackets & the argument separator, which parse_math leaves inside of
+# the operand strings, so the tokens have to be split on it.
+BRO = 'BRO'
+BRC = 'BRC'
+COMMA = ','
+
+_NAME = re.compile(r'^[_A-Za-z][_A-Za-z0-9]*$')
+_FUNCTION = re.compile(r'^[_A-Za-z][_A-Za-z0-9]*(\.[_A-Za-z][_A-Za-z0-9]*)?$')
+_ELEMENT = re.compile(r'^([_A-Za-z][_A-Za-z0-9]*)\[([0-9]+)\]$')
+
+
+class ExpressionError(Exception):
+    """ Raised when the tokens do not make a valid expression. """
+    pass
+
+
+def _split(tokens: list) -> list:
+    """ Splits the operand strings containing commas, which parse_math
+    leaves in function calls with multiple arguments. """
+    split = []
+    for token in tokens:
+        if isinstance(token, list):
+            # A string literal, which the JSON parse cache turns into a list
+            split.append(tuple(token))
+        elif isinstance(token, str) and COMMA in token:
+            for i, part in enumerate(token.split(COMMA)):
+                if i:
+                    split.append(COMMA)
+                if part:
+                    try:
+                        split.append(float(part))
+                    except ValueError:
+                        split.append(part)
+        else:
+            split.append(token)
+    return split
+
+
+class _Parser:
+    # Internal class, use parse()
+
+    def __init__(self, tokens: list):
+        self.tokens = _split(tokens)
+        self.pos = 0
+
+    def peek(self):
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return None
+
+    def next(self):
+        token = self.peek()
+        if token is None:
+            raise ExpressionError('unexpected end of expression')
+        self.pos += 1
+        return token
+
+    def expect(self, token):
+        if self.next() != token:
+            raise ExpressionError(f'expected {token}')
+
+    def parse(self):
+        node = self.expression(1)
+        if self.peek() is not None:
+            raise ExpressionError(f'unexpected {self.peek()}')
+        return node
+
+    def expression(self, min_prec: int):
+        """ Precedence climbing, parses operators binding at least as
+        strong as min_prec. """
+        left = self.unary()
+        while True:
+            op = self.peek()
+            prec = PRECEDENCE.get(op, 0)
+            if prec < min_prec:
+                return left
+            self.pos += 1
+            right = self.expression(prec + 1)
+            left = fold(('binary', op, left, right))
+
+    def unary(self):
+        token = self.next()
+        if token == 'SUB':
+            return fold(('neg', self.unary()))
+        if token == 'ADD':
+            return self.unary()
+        if token == BRO:
+            node = self.expression(1)
+            self.expect(BRC)
+            return node
+        return self.operand(token)
+
+    def operand(self, token):
+        if isinstance(token, float):
+            return 'const', ('num', token)
+        if isinstance(token, tuple):
+            return 'const', token
+        if token in PRECEDENCE or token in (BRC, COMMA):
+            raise ExpressionError(f'unexpected {token}')
+        if token == 'True' or token == 'False':
+            return 'const', ('bool', token == 'True')
+
+        if self.peek() == BRO and _FUNCTION.match(token):
+            self.pos += 1
+            args = []
+            if self.peek() == BRC:
+                self.pos += 1
+                return 'call', token, args
+            while True:
+                args.append(self.expression(1))
+                separator = self.next()
+                if separator == BRC:
+                    return 'call', token, args
+                if separator != COMMA:
+                    raise ExpressionError('invalid function arguments')
+
+        element = _ELEMENT.match(token)
+        if element:
+            return 'elm', element.group(1), int(element.group(2))
+        if _NAME.match(token):
+            return 'var', token
+
+        raise ExpressionError(f'invalid operand {token}')
+
+
+def fold(node):
+    """ Returns a constant node if all operands of the node are constant,
+    else returns the node itself. Operations that would fail (like a
+    division by zero) are left for the interpreter to report. """
+    try:
+        if node[0] == 'neg' and node[1][0] == 'const':
+            return 'const', operators.negative(node[1][1])
+
+        if node[0] == 'binary' and node[2][0] == 'const' and node[3][0] == 'const':
+            op, a, b = node[1], node[2][1], node[3][1]
+            if op in operators.COMPARISONS:
+                return 'const', operators.compare(op, a, b)
+            return 'const', operators.binary(op, a, b)
+    except operators.OperatorError:
+        pass
+    return node
+
+
+def parse(tokens: list):
+    """ Returns the expression tree from the parse_math tokens. """
+    return _Parser(tokens).parse()
+
+
+def variables(node):
+    """ Yields the names of all variables used in the expression. """
+    if node[0] == 'var' or node[0] == 'elm':
+        yield node[1]
+    elif node[0] == 'call':
+        for arg in node[2]:
+            yield from variables(arg)
+    elif node[0] == 'neg':
+        yield from variables(node[1])
+    elif node[0] == 'binary':
+        yield from variables(node[2])
+        yield from variables(node[3])
@@ -0,0 +1,39 @@
+""" The opcodes of compiled astro code. Every instruction takes up two
+places in the instruction array: the opcode and its argument, which is
+0 for instructions not taking any argument. The comments describe what
+the argument of each instruction is.
+"""
+
+LOAD_CONST    = 1   # consts index, pushes the constant
+LOAD_NAME     = 2   # names index, pushes the value of the variable
+STORE_NAME    = 3   # names index, pops the value into the variable
+DELETE_NAME   = 4   # names index, removes the variable
+LOAD_INDEX    = 5   # element index, pops an array and pushes the element
+BUILD_ARRAY   = 6   # element count, pops the elements and pushes an array
+CALL          = 7   # consts index of the (name, argc) call site
+POP_TOP       = 8   # -, pops and discards the top of the stack
+RETURN_VALUE  = 9   # -, pops the value and returns it to the caller
+MAKE_FUNCTION = 10  # consts index of the function code object
+OUT           = 11  # value count, pops and prints the values
+PAUSE         = 12  # -, pops the amount of seconds to wait
+IMPORT        = 13  # names index of the imported library
+MIXIN         = 14  # names index of the mixin
+LOAD_FAST     = 15  # slot index, pushes the value of the local variable
+STORE_FAST    = 16  # slot index, pops the value into the local variable
+DELETE_FAST   = 17  # slot index, removes the local variable
+BINARY_ADD    = 18  # -, pops 2 values and pushes their sum
+BINARY_SUB    = 19  # -, pops 2 values and pushes their difference
+BINARY_MUL    = 20  # -, pops 2 values and pushes their product
+BINARY_DIV    = 21  # -, pops 2 values and pushes their quotient
+COMPARE_OP    = 22  # index in operators.COMPARISONS, pops 2 values and pushes a bool
+UNARY_NEG     = 23  # -, pops a number and pushes it negated
+JUMP          = 24  # target index in ops, continues execution there
+JUMP_IF_FALSE = 25  # target index in ops, pops the value and jumps if it's false
+JUMP_IF_TRUE  = 26  # target index in ops, pops the value and jumps if it's true
+LINE          = 27  # source line, marks the start of a statement (profiling only)
+BUILD_NUMBERS = 28  # consts index of a tuple of numbers, pushes a new compact array of them
+BUILD_MAP     = 29  # pair count, pops the keys & values and pushes a map
+
+# Opcode -> name mapping, used by the disassembler.
+NAMES = {v: k for k, v in dict(globals()).items()
+         if k.isupper() and isinstance(v, int)}
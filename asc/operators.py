@@ -0,0 +1,106 @@
+""" The operators of astro expressions, working on values in the tagged
+tuple format. These are used by the compiler for folding constant parts
+of expressions and by the interpreter when the operands are not both
+numbers (which the interpreter handles on its own, as that's the most
+common case).
+"""
+from astropy import errors
+import operator
+
+
+class OperatorError(Exception):
+    """ Raised when an operator can't be used on the given values. The
+    kind is one of the error types found in astropy.errors. """
+
+    def __init__(self, kind: str, message: str):
+        super().__init__(message)
+        self.kind = kind
+        self.message = message
+
+
+# Names of the operators as generated by asp3 parse_math(), mapped to
+# the symbol used in error messages.
+SYMBOLS = {
+    'ADD': '+',
+    'SUB': '-',
+    'MUL': '*',
+    'DIV': '/',
+    'CSM': '<',
+    'CLG': '>',
+    'CSE': '<=',
+    'CLE': '>=',
+    'CEQ': '==',
+    'NOT': '!='
+}
+
+# Comparison operators, the index in this tuple is the argument of the
+# COMPARE_OP instruction.
+COMPARISONS = ('CSM', 'CLG', 'CSE', 'CLE', 'CEQ', 'NOT')
+
+# Python functions of the comparison operators, in the same order as
+# COMPARISONS. Used directly on the numbers by the interpreter.
+COMPARE_FUNCTIONS = (operator.lt, operator.gt, operator.le,
+                     operator.ge, operator.eq, operator.ne)
+
+# The results of comparisons, so no new tuple has to be created.
+TRUE = ('bool', True)
+FALSE = ('bool', False)
+
+
+def _fail(op: str, a, b):
+    raise OperatorError(errors.type_error, f"unsupported types for {SYMBOLS[op]}: "
+                                           f"'{a[0]}' and '{b[0]}'")
+
+
+def binary(op: str, a, b):
+    """ Returns the result of the arithmetic operator. Numbers support
+    all of them, strings and arrays can be joined together with +. """
+    if a[0] == 'num' and b[0] == 'num':
+        if op == 'ADD':
+            return 'num', a[1] + b[1]
+        if op == 'SUB':
+            return 'num', a[1] - b[1]
+        if op == 'MUL':
+            return 'num', a[1] * b[1]
+        if op == 'DIV':
+            if b[1] == 0:
+                raise OperatorError(errors.zero_division, 'division by zero')
+            return 'num', a[1] / b[1]
+
+    if op == 'ADD' and a[0] == b[0] and a[0] in ('str', 'array'):
+        return a[0], a[1] + b[1]
+
+    _fail(op, a, b)
+
+
+def compare(op: str, a, b):
+    """ Returns the result of the comparison as a bool value. Any two
+    values can be checked for equality, but only numbers and strings can
+    be ordered. """
+    if op == 'CEQ':
+        return 'bool', a[0] == b[0] and a[1] == b[1]
+    if op == 'NOT':
+        return 'bool', a[0] != b[0] or a[1] != b[1]
+
+    if a[0] != b[0] or a[0] not in ('num', 'str'):
+        _fail(op, a, b)
+    if op == 'CSM':
+        return 'bool', a[1] < b[1]
+    if op == 'CLG':
+        return 'bool', a[1] > b[1]
+    if op == 'CSE':
+        return 'bool', a[1] <= b[1]
+    return 'bool', a[1] >= b[1]
+
+
+def truth(a) -> bool:
+    """ Returns the truth value used by conditions. False, 0, empty
+    strings & arrays and null are false, everything else is true. """
+    return bool(a[1])
+
+
+def negative(a):
+    """ Returns the negated number. """
+    if a[0] != 'num':
+        raise OperatorError(errors.type_error, f"unsupported type for -: '{a[0]}'")
+    return 'num', -a[1]
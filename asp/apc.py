@@ -0,0 +1,152 @@
+# python >= 3.6
+""" This is the Astro Parse Cache (apc), which stores the parsed pax3 code
+objects on disk, so a script that has not changed since the last run does
+not have to go through the whole parser again. It works pretty much like
+the __pycache__ folder in Python: next to every parsed .asx file a folder
+called __asxcache__ is created, holding one JSON file per script.
+
+* Keys: Each cached file stores the modification time, size and SHA-1 hash
+  of the source, the version & format of the parser that created it and the
+  parser options that were used. The mtime & size are checked first, as that
+  is just a stat() call. If they differ (the file has been touched or copied
+  around) the hash is compared, and only if that differs too the script is
+  parsed again. Changing the asp3 __version__ or FORMAT invalidates all of
+  the cached files.
+
+* Memory: Long running processes (like the interpreter server) also keep
+  the recently used code objects in memory, so loading an unchanged file
+  again only costs a stat() call. The least recently used object is dropped
+  once there are too many. The code objects are shared, so they must not be
+  modified.
+
+* Failures: The cache is only an optimization, so any problem with it (a
+  read-only directory, a corrupted cache file) is silently ignored and the
+  script is just parsed like normal.
+"""
+from collections import OrderedDict
+from asp import asp3
+import threading
+import hashlib
+import json
+import os
+import io
+
+__version__ = '0.1'
+
+# Name of the cache directory placed next to the parsed scripts.
+CACHE_DIR = '__asxcache__'
+
+# Maximum amount of code objects kept in memory.
+MEMORY_SIZE = 256
+
+# Absolute path -> (mtime, size, options, code object), least recently
+# used first.
+_memory = OrderedDict()
+_memory_lock = threading.Lock()
+
+
+def cache_path(src_file: str) -> str:
+    """ Returns the path of the cache file for the given source file. """
+    head, tail = os.path.split(os.path.abspath(src_file))
+    name = os.path.splitext(tail)[0]
+    return os.path.join(head, CACHE_DIR, f'{name}.{asp3.FORMAT}.json')
+
+
+def _key(stat, digest: str, kw: dict) -> dict:
+    """ Creates the key which has to match for the cache to be used. """
+    return {
+        'mtime': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'hash': digest,
+        'version': asp3.__version__,
+        'format': asp3.FORMAT,
+        'options': kw
+    }
+
+
+def _read(path: str):
+    """ Returns the cached object or None if it cannot be read, or is
+    not a dict with the key and the code. """
+    try:
+        with open(path, 'r', encoding='utf8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cached, dict) or not isinstance(cached.get('key'), dict) \
+            or not isinstance(cached.get('code'), list):
+        return None
+    return cached
+
+
+def _write(path: str, key: dict, code: list):
+    """ Writes the code object to the cache. The data is first written
+    to a temporary file and then moved in place, so a different process
+    never reads a half-written cache file. """
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Unique for every thread, the server writes from many of them
+        temp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp, 'w', encoding='utf8') as f:
+            # json.dumps() uses the C encoder, json.dump() does not
+            f.write(json.dumps({'key': key, 'code': code}, separators=(',', ':')))
+        os.replace(temp, path)
+    except (OSError, TypeError, ValueError):
+        pass
+
+
+def load(src_file: str, **kw) -> list:
+    """ Returns the pax3 code object of the given file, loading it from
+    the cache if possible, else parsing it and saving it for the next
+    time. The keyword arguments are passed to asp3.parse().
+    :param src_file: path to the .asx file """
+
+    stat = os.stat(src_file)
+    src = os.path.abspath(src_file)
+    memo = _memory.get(src)
+    if memo and memo[:3] == (stat.st_mtime_ns, stat.st_size, kw):
+        with _memory_lock:
+            if src in _memory:
+                _memory.move_to_end(src)
+        return memo[3]
+
+    code = _load(src, stat, kw)
+    with _memory_lock:
+        _memory.pop(src, None)
+        if len(_memory) >= MEMORY_SIZE:
+            _memory.popitem(last=False)
+        _memory[src] = (stat.st_mtime_ns, stat.st_size, kw, code)
+    return code
+
+
+def _load(src_file: str, stat, kw: dict) -> list:
+    """ Loads the code object from the cache file, or parses it. """
+    path = cache_path(src_file)
+    cached = _read(path)
+
+    if cached:
+        key = cached['key']
+        if key.get('version') == asp3.__version__ \
+                and key.get('format') == asp3.FORMAT \
+                and key.get('options') == kw \
+                and key.get('mtime') == stat.st_mtime_ns \
+                and key.get('size') == stat.st_size:
+            return cached['code']
+
+    with open(src_file, 'rb') as f:
+        data = f.read()
+    digest = hashlib.sha1(data).hexdigest()
+    key = _key(stat, digest, kw)
+
+    if cached:
+        old = cached['key']
+        if old.get('hash') == digest and all(
+                old.get(k) == key[k] for k in ('version', 'format', 'options')):
+            # The file has been touched but the content is the
+            # same, so only the stat part of the key is updated.
+            _write(path, key, cached['code'])
+            return cached['code']
+
+    lines = io.StringIO(data.decode('utf8'), newline=None).readlines()
+    code = asp3.parse(lines, **kw)
+    _write(path, key, code)
+    return code
@@ -32,17 +32,23 @@ library.
   and execute. Internally, the parse() function creates an instance of the
   _Parser class to call its render() method which returns the generated code
   object (which happens already in the __init__ function. The constructor
-  takes in the list of strings, cleaning them up, removing comments and
-  calculating tab sizes. Note: a single tab can be any amount of spaces,
-  but then it has to be kept the same for every single indent, or the
-  parser will raise an IndentError which the interpreter can catch and
-  read.
-
-* Typing: After cleaning, each line of code is passed to the type() method,
-  which defines the type and class of the code, using regular expression
-  patterns. After that, each type is sent out to a different method returning
-  the parsed line. You can easily tell such a method as its name starts with
-  the 'parse_' prefix.
+  takes in the list of strings and passes them to the lexer.
+
+* Lexing: The lex() function goes through the source only once, removing
+  comments, calculating tab sizes and splitting each line into tokens
+  (names, numbers, strings and operators). The tokens are plain strings,
+  the kind of a token is told by its first character. Note: a single tab
+  can be any amount of spaces, but then it has to be kept the same for
+  every single indent, or the parser will raise an IndentError which the
+  interpreter can catch and read.
+
+* Typing: After lexing, each line of code is passed to the type() method,
+  which defines the type and class of the code by looking at the first
+  tokens of the line. After that, each type is sent out to a different method
+  returning the parsed line. You can easily tell such a method as its name
+  starts with the 'parse_' prefix. The methods only read the tokens, the
+  text of the line is never scanned again, so parsing a line takes time
+  linear to its length.
 
 * Sorting: After typing, the lines are sorted and put into blocks depending
   on their indent size. All the different blocks can be found just scrolling
@@ -54,13 +60,20 @@ library.
   final result is the JSON-serializable code object represented as a list
   of statements (list of dicts).
 
+* Streaming: The parse_stream() function does the same work one line at a
+  time, yielding the header and then every top level statement as soon as
+  its block is closed, which is when the next top level line shows up.
+  Statements without a block are yielded right away. Only the block being
+  parsed is kept in memory, so a huge script can be executed while its
+  tail is still being read.
+
 """
 from asp import apt
 import datetime
 import re
 
 __author__ = 'bellrise'
-__version__ = '3.5.4'
+__version__ = '3.8.2'
 
 # This is the format version of the code object generated
 # by the parser, each new format is most probably incompatible
@@ -73,6 +86,71 @@ FORMAT = 'pax3'
 # blocks, that are executed depending on the conditions.
 BLOCKS = ['if', 'else', 'elif', 'try', 'while', 'function']
 
+# The code part of a line, up to a comment or a quote without a closing
+# pair. Strings are skipped as a whole, so the -- in "a--b" is kept.
+_CODE = re.compile(r'(?:[^"-]+|"[^"]*"|-(?!-))*')
+
+# The pattern used by the lexer, matching a single token: a string, a
+# number, a name, a 2 char operator or any other single char. The order
+# matters, the 2 char operators have to be matched before the single char
+# ones. Whitespace is skipped, comments & quotes without a closing pair
+# are cut off before the line is split into tokens.
+_TOKEN = re.compile(r'"[^"]*"|(?:[0-9]+(?:\.[0-9]*)?|\.[0-9]+)(?:[eE][+-]?[0-9]+)?|[^\W\d]\w*|==|!=|<=|>=|[^\s"]')
+
+# Brackets of arrays, maps & calls, the commas inside of them do not
+# split the arguments of a statement.
+OPENING = '([{'
+CLOSING = ')]}'
+BRACKETS = frozenset(OPENING + CLOSING)
+
+
+def lex(lines):
+    """ Goes through the source code once and returns a list of all
+    non-empty lines in the [line number, indent, tokens] format. The
+    tokens are the strings the line is made of, without any comments
+    and whitespace. """
+
+    return list(lex_lines(lines))
+
+
+def lex_lines(lines):
+    """ The generator behind lex(), yielding every line as soon as it
+    has been lexed. """
+
+    tabsize = 0
+    in_comment = False
+
+    for num, line in enumerate(lines, start=1):
+        line = line.strip('\n')
+        stripped = line.strip()
+
+        # Multi line comments, every line from the one starting with
+        # /-- up to the one ending with --/ is skipped.
+        if in_comment:
+            if stripped.endswith('--/'):
+                in_comment = False
+            continue
+        if stripped.startswith('/--'):
+            in_comment = not stripped.endswith('--/')
+            continue
+
+        # Everything after the first -- outside of a string is a comment
+        end = _CODE.match(line).end()
+        if end < len(line) and line[end] == '"':
+            raise SyntaxError(f'Incorrect string formatting @ line {num}')
+        text = line[:end].strip()
+        if not text:
+            continue
+
+        # Whitespace, the first indented line sets the tab size
+        spaces = len(line) - len(line.lstrip(' '))
+        if spaces and not tabsize:
+            tabsize = spaces
+        if spaces % (tabsize or 1) != 0:
+            raise IndentationError(f'Invalid tab size @ line {num}')
+
+        yield [num, spaces // (tabsize or 1), _TOKEN.findall(text)]
+
 
 class _Parser:
     # Internal class, do not use!
@@ -95,189 +173,93 @@ class _Parser:
                 raise apt.ParserError('opt: invalid assignment_kw type')
             self.OPT_ASSIGNMENT_KW = kw['assignment_kw']
 
-        # Execution
-        self.code = [s.strip('\n') for s in lines]
-        self.clean()
-        self.tabsize = self.init_whitespace()
-        self.count_whitespace()
-        self.code = self.type(self.code)
-
-    @staticmethod
-    def hash_strings(line, num):
-        """ Replaces all strings with hashes for commenting
-        purposes. """
-        matches = re.finditer('"[^"]*"', line)
-        for match in matches:
-            if match:
-                substr = line[match.start():match.end()]
-                line = line.replace(substr, '#' * len(substr))
-        if '"' in line:
-            raise SyntaxError(f'Incorrect string formatting @ line {num}')
-        return line
-
-    def clean(self):
-        """ Replaces all the comment lines with a double dash """
-        in_comment = False
-        commented = []
-
-        # Multi line comments
-        for index, line in enumerate(self.code):
-            if in_comment:
-                # In comment
-                commented.append(index)
-
-            if re.match('^/--', line.strip()):
-                # Start of comment
-                in_comment = True
-                commented.append(index)
-
-            if re.match('.*--/$', line.strip()):
-                # End of comment
-                if in_comment:
-                    in_comment = False
-                    commented.append(index)
-
-        for i in commented:
-            self.code[i] = ''
-
-        # Single line comments
-        for index, line in enumerate(self.code):
-            modified: str = self.hash_strings(line, index)
-            comment = modified.find('--')
-            if comment != -1:
-                chars = list(line)
-                del chars[comment:]
-                self.code[index] = ''.join(chars)
-
-    def init_whitespace(self):
-        """ Check the first occurring whitespace and return
-        the basic whitespace amount. """
-        for line in self.code:
-            match = re.match(r'^ *', str(line))
-            if match.end() != 0:
-                return len(line[0:match.end()])
-        return 4
-
-    def count_whitespace(self):
-        """ Take each line and present the tab size in an int. This also
-        places a line number in each line, to keep track of the lines. """
-        for index, line in enumerate(self.code):
-            match = re.match(r'^ *', line)
-            if match.end() == 0:
-                self.code[index] = [index + 1, 0, line.strip()]
-            # Size checking
-            if match.end() % self.tabsize != 0:
-                raise IndentationError(f'Invalid tab size @ line {index}')
-
-            self.code[index] = [index + 1, int(match.end() / self.tabsize), line.strip()]
+        # Execution, streaming parsers do the work in render_stream()
+        self.lines = lines
+        self.code = None if kw.get('stream') else self.type(lex_lines(lines))
+
+    # Statements starting with a keyword, mapped to the name
+    # of the method parsing them.
+    KEYWORDS = {
+        'import': 'parse_import',
+        'delete': 'parse_delete',
+        'if': 'parse_if',
+        'while': 'parse_while',
+        'for': 'parse_for',
+        'elif': 'parse_elif',
+        'else': 'parse_else',
+        'try': 'parse_try'
+    }
+
+    @classmethod
+    def typeof(cls, tokens):
+        """ Returns the name of the method used for parsing the line
+        with the given tokens, or None if the syntax is invalid. """
+        first = tokens[0]
+        second = tokens[1] if len(tokens) > 1 else None
+
+        if first.isidentifier():
+            # A bare import or delete is a statement of that name, like
+            # any other unknown statement
+            if first in cls.KEYWORDS and (second or first not in ('import', 'delete')):
+                # Block headers have to end with a colon, the bare
+                # ones (else, try) can't have a condition.
+                if first in ('else', 'try'):
+                    if second != ':':
+                        return None
+                elif first not in ('import', 'delete'):
+                    if ':' not in tokens[2:]:
+                        return None
+                return cls.KEYWORDS[first]
+
+            if second == '=':
+                return 'parse_assignment'
+            if second == '[' and ']' in tokens:
+                # An element on the left side, arr[0] = 1
+                end = tokens.index(']') + 1
+                if end < len(tokens) and tokens[end] == '=':
+                    return 'parse_assignment'
+            if second == '==':
+                return None
+            if second == '(' and ')' in tokens:
+                return 'parse_call'
+            return 'parse_statement'
+
+        if first == '#':
+            # Function header, #name(params):
+            if len(tokens) > 4 and tokens[1].isidentifier() and tokens[2] == '(' \
+                    and tokens[-1] == ':' and tokens[-2] == ')':
+                return 'parse_header'
+            return None
+
+        if first == '@' and second == 'mixin' and len(tokens) > 2:
+            return 'parse_mixin'
+
+        return None
 
     def type(self, lines):
         """ This is the main function for setting the types of the
         statements and parsing them into valid ASX Parsed code format.
-        This is called recursively because of the multiple functions. """
-
-        in_func = False
-        func_indent = 0
-        func = []
-        collected = []
-
-        # Functions
-        for pos, line in enumerate(lines):
-            indent = line[1]
-            text = line[2]
-
-            # Functions
-            if re.match(r'^#[_A-z][_A-z0-9]*\(.*\):', text) and not in_func:
-                in_func = True
-                func_indent = indent
-                func.append(line)
-                continue
-
-            # Inside of function
-            if in_func and (indent > func_indent) and text:
-                func.append(line)
-                continue
-
-            # Outside of function
-            if in_func and (indent <= func_indent):
-                in_func = False
-                func_indent = 0
-                collected.append(func)
-                func = []
-
-        # Statements / function calls
-        for pos, line in enumerate(lines):
-            text = line[2]
-
-            structures = {
-                # Module import
-                r'import .*': self.parse_import,
-
-                # Delete keyword
-                r'delete .*': self.parse_delete,
-
-                # If block header
-                r'^if .*:.*': self.parse_if,
-
-                # While block header
-                r'^while .+:.*': self.parse_while,
-
-                # For loop header
-                r'^for .+:.*': self.parse_for,
-
-                # Elif block header
-                r'^elif .*:.*': self.parse_elif,
-
-                # Else block header
-                r'^else:': self.parse_else,
-
-                # Try block header
-                r'^try:': self.parse_try,
-
-                # Function block header
-                r'^#[_A-z][_A-z0-9]*\(.*\):': self.parse_header,
-
-                # Assignment statement
-                r'^[_A-z][_A-z0-9]* *= *.*': self.parse_assignment,
-
-                # Function call statement
-                r'^[_A-z][_A-z0-9]*\(.*\)': self.parse_call,
-
-                # Regular base statement
-                r'^[_A-z][_A-z0-9]*.*': self.parse_statement,
-
-                # Mixin
-                r'^@mixin .*': self.parse_mixin,
-
-            }
-
-            unparsed = True
-            for regex, method in structures.items():
-                if re.match(regex, text):
-                    lines[pos] = method(line)
-                    unparsed = False
-                    break
-
-            if unparsed and line[2]:
+        The type is decided by the first tokens of each line. """
+
+        # Sorting the statements into blocks, this also turns the
+        # code object format to such one that the interpreter can
+        # understand.
+        return self.nest(self.typed(lines))
+
+    def typed(self, lines):
+        """ Yields the lines parsed by the method of their type. """
+        for line in lines:
+            method = self.typeof(line[2])
+            if not method:
                 raise SyntaxError(f'Invalid syntax @ {line[0]}')
 
-        # I have to add a phantom line or the whole indent sorter
-        # will crash and burn and die and stop working, and this
-        # is a lot easier then having to write a pusher which would
-        # take another 30 lines. Trust me, I know what im doing.
-        if lines:
-            index = lines[-1][0] + 1
-        else:
-            index = 0
-        lines.append([index, 0, ''])
-
-        # Recursive sorting to reach every level of statements,
-        # also turns the code object format to such one that the
-        # interpreter can understand. This also removes all empty
-        # lines that don't need to be interpreted.
-        lines = self.recursive_sort(lines)
-
-        return lines
+            # The statement parsers expect valid data, anything they
+            # can't make sense of is invalid syntax as well
+            try:
+                line = getattr(self, method)(line)
+            except (TypeError, ValueError, IndexError, KeyError):
+                raise SyntaxError(f'Invalid syntax @ line {line[0]}') from None
+            yield line
 
     @staticmethod
     def format(code):
@@ -287,281 +269,316 @@ class _Parser:
         b.update(code[2])
         return b
 
-    def recursive_sort(self, lines):
-        """ Recursively calls sort_code_blocks for each 'code' field
-        found in any line. """
-        lines = self.sort_code_blocks(lines)
-
-        master = []
-
-        for index, line_ in enumerate(lines):
-            index = line_[0]
-            indent = line_[1]
-            code = line_[2]
+    def nest(self, lines):
+        """ Puts every statement into the code block it belongs to,
+        depending on its indentation. The blocks that are still open are
+        kept on a stack together with the indent of their header, so every
+        statement ending up in the right 'code' field takes a single pass
+        over the lines. """
 
-            # Empty code lines, not important
-            if not code:
-                continue
-
-            if 'code' in code:
-                code_ = self.recursive_sort(code['code'])
-                b: dict = code
-                b['code'] = code_
-                new_block = [index, indent, b]
-                master.append(self.format(new_block))
-            else:
-                master.append(self.format(line_))
-
-        return master
-
-    @staticmethod
-    def sort_code_blocks(lines):
-        """ Sorts the code blocks into separate blocks, depending
-        on their indentation level. """
-        new = lines.copy()
-
-        map_ = []
-        for i in new:
-            map_.append(i[0])
+        return list(self.nest_stream(lines))
 
-        collected = []
+    def nest_stream(self, lines):
+        """ The generator behind nest(), yielding every top level
+        statement once nothing else can be put into it. """
 
-        cursor = 0
-        while cursor < len(lines) - 1:
+        stack = []
+        top = None  # top level block still taking statements
 
-            indent = new[cursor][1]
-            code = new[cursor][2]
-
-            if not code:
-                cursor += 1
-                continue
+        for line in lines:
+            indent = line[1]
 
-            block = []
+            # Close all blocks this line is not a part of
+            while stack and indent <= stack[-1][0]:
+                self.close(stack.pop())
 
-            # Basically checks if the type of the statement
-            # is a block type
-            if code['type'] in BLOCKS:
-                starting_indent = indent
-                block_header = new[cursor]
-                cursor += 1
-                while True:
-                    if cursor >= len(new):
-                        break
-
-                    if starting_indent != new[cursor][1]:
-                        block.append(new[cursor])
-                        collected.append(new[cursor][0])
-                    else:
-                        # Collect the statements into one pile
-                        pulled = new[map_.index(block_header[0])]
-                        d: dict = pulled[2]
-                        d.update({'code': block})
-                        new[map_.index(block_header[0])] = [pulled[0], pulled[1], d]
-                        block = []
-
-                        # Cleaning
-                        break
-
-                    cursor += 1
-
-                if block:
-                    pulled = new[map_.index(block_header[0])]
-                    d: dict = pulled[2]
-                    d.update({'code': block})
-                    new[map_.index(block_header[0])] = [pulled[0], pulled[1], d]
-
-                cursor -= 1
-
-            cursor += 1
-
-        cleared = []
-        for line in new:
-            if line[0] not in collected:
-                cleared.append(list(line))
+            statement = self.format(line)
+            if stack:
+                stack[-1][1].append(statement)
             else:
-                cleared.append([line[0], 0, ''])
+                if top is not None:
+                    yield top
+                    top = None
+                if statement['type'] not in BLOCKS:
+                    yield statement
+
+            if statement['type'] in BLOCKS:
+                statement['code'] = []
+                stack.append((indent, statement['code'], statement['line']))
+                if len(stack) == 1:
+                    top = statement
+
+        while stack:
+            self.close(stack.pop())
+        if top is not None:
+            yield top
 
-        another_cleared = []
-        for line in cleared:
-            if line[2]:
-                another_cleared.append(line)
-
-        return another_cleared
+    @staticmethod
+    def close(block):
+        """ Checks the (indent, code, line) of a block being closed, a
+        block has to hold at least one statement. """
+        if not block[1]:
+            raise SyntaxError(f'Expected an indented block @ line {block[2]}')
 
     # ------------------------------------------
     # Tools
     # ------------------------------------------
 
+    # Math operators, mapped to their names in the math tokens.
+    OPERATORS = {
+        '+': 'ADD',
+        '-': 'SUB',
+        '*': 'MUL',
+        '/': 'DIV',
+        '<': 'CSM',
+        '>': 'CLG',
+        '(': 'BRO',
+        ')': 'BRC',
+        '!=': 'NOT',
+        '==': 'CEQ',
+        '<=': 'CSE',
+        '>=': 'CLE'
+    }
+
+    # Escape codes of the string literals.
+    ESCAPES = {
+        '\\n': '\n',
+        '\\r': '\r',
+        '\\t': '\t',
+        '\\b': '\b',
+        '\\q': '"'
+    }
+
     @staticmethod
-    def parse_math(line, num):
-        """ Parses the mathematical thingy. As of fix 3.5.1, parse_math
-        can now parse multiple numbers at once, which it could not do
-        before because of it replacing the incorrect finds in the new
-        line, not the original one. """
-
-        keys = {
-            '+': 'ADD',
-            '-': 'SUB',
-            '*': 'MUL',
-            '/': 'DIV',
-            '<': 'CSM',
-            '>': 'CLG',
-            '(': 'BRO',
-            ')': 'BRC',
-            '!=': 'NOT',
-            '==': 'CEQ',
-            '<=': 'CSE',
-            '>=': 'CLE'
-        }
+    def number(text):
+        """ Returns the text as a number if it is one, else the text
+        itself. """
+        try:
+            return float(text)
+        except ValueError:
+            return text
 
-        origin = line.replace(' ', '')
-        line = line.replace(' ', '')
-        finds = re.finditer('(!=|==|>=|<=|\+|-|\*|/|<|>|\(|\))', origin)
-        for i in finds:
-            x = origin[i.start():i.end()]
-            try:
-                line = line.replace(x, '¶' + keys[x] + '¶')
-            except KeyError:
-                raise SyntaxError(f'Invalid equation @ line {num}')
+    @staticmethod
+    def word(token):
+        """ Returns True if the token is a name or a number. """
+        return token[0].isalnum() or token[0] == '_' or token[0] == '.' and len(token) > 1
+
+    def parse_math(self, tokens, num):
+        """ Parses the mathematical thingy. As of fix 3.5.1, parse_math
+        can now parse multiple numbers at once. Every operator token is
+        turned into its name, the tokens between two operators are joined
+        into a single operand, like Foo.bar or 1,2 in the parameters of
+        a call. String literals are always an operand of their own, kept
+        as a tagged ('str', text) value. """
 
-        temp = line.split('¶')
-        # Clearing empty stuff
+        operators = self.OPERATORS
         line = []
-        for i in temp:
-            if i:
-                line.append(i)
-        for index, i in enumerate(line):
-            try:
-                line[index] = float(i)
-            except ValueError:
-                pass
+        operand = []
+        for token in tokens:
+            name = operators.get(token)
+            if name is None:
+                # A string has to be separated from the other operands
+                # by an operator or a comma
+                after_string = not operand and line and isinstance(line[-1], tuple)
+                if token[0] != '"':
+                    if after_string and token != ',':
+                        raise SyntaxError(f'Invalid equation @ line {num}')
+                    if operand and self.word(operand[-1]) and self.word(token):
+                        # Two names or numbers only split by whitespace, like 1 2
+                        raise SyntaxError(f'Invalid equation @ line {num}')
+                    operand.append(token)
+                    continue
+                if operand and operand[-1] != ',' or after_string:
+                    raise SyntaxError(f'Invalid equation @ line {num}')
+                if operand:
+                    line.append(''.join(operand))
+                    operand = []
+                line.append(('str', self.string(token)))
+                continue
+            if operand:
+                line.append(self.number(''.join(operand)))
+                operand = []
+            line.append(name)
+        if operand:
+            line.append(self.number(''.join(operand)))
+
         if len(line) <= 1:
             raise SyntaxError(f'Invalid equation @ line {num}')
 
         return line
 
-    def parse_args(self, line, num):
-        """ Parses the text and returns a data collected argument
-        list. """
-
-        # Omitting commas in lists
-        levels = 0
-        omits = []
-        for i, c in enumerate(self.hash_strings(line, num)):
-            if c == '[':
-                levels += 1
-            if c == ']':
-                levels -= 1
-            if levels >= 1 and c == ',':
-                omits.append(i)
-
-        splits = []
-        for i, c in enumerate(self.hash_strings(line, num)):
-            if c == ',' and not omits:
-                splits.append(i)
-
-        if splits:
-            data = []
-            cursor = 0
-            for i in splits:
-                data.append(self.variable(line[cursor:i], num))
-                cursor = i + 1
-            data.append(self.variable(line[cursor:], num))
-
-            for i, s in enumerate(data):
-                try:
-                    data[i] = (s[0], s[1].replace(',', ' ').strip('"'))
-                except AttributeError:
-                    data[i] = s
+    @staticmethod
+    def balanced(tokens):
+        """ Checks if every bracket in the tokens is closed, and none
+        of them is closed before being opened. """
+        if BRACKETS.isdisjoint(tokens):
+            return True
+
+        depth = 0
+        for token in tokens:
+            if token in OPENING:
+                depth += 1
+            elif token in CLOSING:
+                depth -= 1
+                if depth < 0:
+                    return False
+        return not depth
 
+    @staticmethod
+    def split(tokens, char):
+        """ Splits the tokens on the char, skipping the ones found in
+        nested arrays & maps and in the parameters of calls. """
+
+        if char not in tokens:
+            return [tokens]
+
+        parts = []
+        start = 0
+        if BRACKETS.isdisjoint(tokens):
+            # Nothing is nested, every char is a separator
+            index = tokens.index
+            try:
+                while True:
+                    end = index(char, start)
+                    parts.append(tokens[start:end])
+                    start = end + 1
+            except ValueError:
+                pass
         else:
-            data = [self.variable(line, num)]
-
-        return data
-
-    def parse_array(self, line, num):
-        """ Parses the array """
+            depth = 0
+            for i, token in enumerate(tokens):
+                if token in OPENING:
+                    depth += 1
+                elif token in CLOSING:
+                    depth -= 1
+                elif token == char and not depth:
+                    parts.append(tokens[start:i])
+                    start = i + 1
+        parts.append(tokens[start:])
+        return parts
+
+    def parse_args(self, tokens, num):
+        """ Parses the tokens and returns a data collected argument
+        list. """
 
-        elements = self.parse_args(line[1:-1], num)
-        return 'array', elements
+        if not tokens:
+            return []
+        if len(tokens) % 2 and tokens[1::2].count(',') == len(tokens) // 2:
+            # Every other token is a comma, so every value is a single
+            # token, like in most of the arrays
+            single = self.single
+            return [single(token, num) for token in tokens[::2]]
+        if not self.balanced(tokens):
+            raise SyntaxError(f'Unmatched bracket @ line {num}')
+
+        # Commas in nested arrays & maps are omitted
+        return [self.variable(part, num) for part in self.split(tokens, ',')]
+
+    def parse_array(self, tokens, num):
+        """ Parses the tokens between the brackets of an array. """
+
+        return 'array', self.parse_args(tokens, num)
+
+    def parse_map(self, tokens, num):
+        """ Parses the tokens between the braces of a map literal,
+        {key: value, ...}. The pairs are kept as [key, value] lists,
+        both parsed like any other variable. """
+
+        if not tokens:
+            return 'map', []
+
+        pairs = []
+        for item in self.split(tokens, ','):
+            pair = self.split(item, ':')
+            if len(pair) != 2 or not pair[0] or not pair[1]:
+                raise SyntaxError(f'Invalid map item @ line {num}')
+            pairs.append([self.variable(pair[0], num),
+                          self.variable(pair[1], num)])
+        return 'map', pairs
+
+    def string(self, token):
+        """ Returns the text of a string literal, with the escape codes
+        replaced. """
+        string = token[1:-1]
+        if '\\' in string:
+            for k, v in self.ESCAPES.items():
+                string = string.replace(k, v)
+        return string
+
+    def single(self, token, num):
+        """ Returns the variable made of a single token, which is most of
+        them. """
+        c = token[0]
+        if c == '"':
+            # str - String
+            return 'str', self.string(token)
+        if c in '0123456789' or c == '.' and len(token) > 1:
+            # num - Number
+            return 'num', float(token)
 
-    def variable(self, data, num):
-        """ Returns the proper version of the variable. The current
-        types of variables this can return are: """
         # bool - booleans
-
-        if data == 'True':
+        if token == 'True':
             return 'bool', True
-        if data == 'False':
+        if token == 'False':
             return 'bool', False
 
-        try:
-            # num - Number
-            data = float(data)
-            data = ('num', data)
-        except ValueError:
-
-            if re.match(r'\[.*,.*\]', data):
-                # Array
-                elements = self.parse_args(data[1:-1], num)
-                data = ('array', elements)
-                return data
-
-            if re.match(r'\w+\.\w+', data):
-                call = data.split('.')[1]
-                if re.match(r'\w+\.\w+\(.*\)', data):
-                    # Function call
-                    call = self.parse_call((num, 0, data.split('.', maxsplit=1)[1]))
-                    call = call[2]
-                return ('call', {
-                    'module': data.split('.')[0],
-                    'name': call['name'],
-                    'params': call['params']
-                })
-
-            if '"' not in data:
-                data = data.strip()
-                if re.match(r'.*\[[0-9]+\]', data):
-                    # elm - Element access
-                    var = data.split('[')[0]
-                    element = int(data.strip(']').strip().split('[')[1])
-                    data = ('elm', {'var': var, 'element': element})
-
-                else:
-                    # Check for invalid chars in var name
-                    data = data.strip()
-                    if re.match('.*\W.*', data):
-                        try:
-                            data = self.parse_math(data, num)
-                            return 'math', data
-                        except SyntaxError:
-                            raise SyntaxError(f'Invalid variable name @ line {num}')
-
-                    # var - Variable
-                    data = ('var', data)
-
-            else:
-                # Variable pre-check
-
-                if re.match(r'[^#]', self.hash_strings(data.strip(), num)):
-                    raise SyntaxError(f'Invalid variable format @ line {num}')
+        if token.isidentifier():
+            if token.lower() in ('inf', 'nan', 'infinity'):
+                return 'num', float(token)
+            # var - Variable
+            return 'var', token
+
+        raise SyntaxError(f'Invalid variable name @ line {num}')
+
+    def variable(self, tokens, num):
+        """ Returns the proper version of the variable, told by the
+        tokens it is made of. The current types of variables this can
+        return are: """
+        # bool, num, str & var - a single token, see single()
+
+        if len(tokens) == 1:
+            return self.single(tokens[0], num)
+        if not tokens:
+            raise SyntaxError(f'Missing value @ line {num}')
+
+        first = tokens[0]
+        last = tokens[-1]
+
+        if first == '[' and last == ']' and self.balanced(tokens[1:-1]):
+            # array - Array
+            return self.parse_array(tokens[1:-1], num)
+
+        if first == '{' and last == '}' and self.balanced(tokens[1:-1]):
+            # map - Map
+            return self.parse_map(tokens[1:-1], num)
+
+        if last == ')' and len(tokens) > 4 and tokens[1] == '.' and tokens[3] == '(' \
+                and first.isidentifier() and tokens[2].isidentifier() \
+                and self.balanced(tokens[4:-1]):
+            # call - Function call
+            return 'call', {
+                'module': first,
+                'name': tokens[2],
+                'params': self.parse_args(tokens[4:-1], num)
+            }
 
-                # str - String
-                escape_codes = {
-                    '\\n': '\n',
-                    '\\r': '\r',
-                    '\\t': '\t',
-                    '\\b': '\b',
-                    '\\q': '"'
-                }
+        if len(tokens) == 4 and tokens[1] == '[' and last == ']' \
+                and first.isidentifier() and tokens[2].isdigit():
+            # elm - Element access
+            return 'elm', {'var': first, 'element': int(tokens[2])}
 
-                string = data.strip()[1:-1]
-                for k, v in escape_codes.items():
-                    string = string.replace(k, v)
+        if len(tokens) == 2 and first in '+-' and tokens[1][0] in '0123456789.':
+            # num - Number with a sign, like -1 or -1e5
+            return 'num', float(first + tokens[1])
 
-                data = ('str', string)
+        if not self.balanced(tokens):
+            raise SyntaxError(f'Unmatched bracket @ line {num}')
 
-        return data
+        # math - Equation
+        try:
+            return 'math', self.parse_math(tokens, num)
+        except SyntaxError:
+            raise SyntaxError(f'Invalid variable name @ line {num}') from None
 
     # ------------------------------------------
     # Statement types
@@ -571,12 +588,21 @@ class _Parser:
         """ Parses an if statement header. """
         index = line[0]
         indent = line[1]
-        text = line[2]
+        tokens = line[2]
+
+        # The tokens between the keyword and the colon
+        condition = tokens[1:-1]
+        if len(condition) == 1 and (condition[0].isidentifier() or condition[0].isdigit()) \
+                or len(condition) == 4 and condition[1] == '[' and condition[3] == ']' \
+                and condition[0].isidentifier() and condition[2].isdigit():
+            # A single value, like while True:
+            condition = [self.number(''.join(condition))]
+        else:
+            condition = self.parse_math(condition, index)
 
-        text = text.replace(kw, '')[:-1].strip()
         return [
             index, indent,
-            {'type': kw, 'condition': self.parse_math(text, index)}
+            {'type': kw, 'condition': condition}
         ]
 
     def parse_elif(self, line):
@@ -611,10 +637,12 @@ class _Parser:
         """ Parses a function call. """
         index = line[0]
         indent = line[1]
-        text = line[2]
+        tokens = line[2]
 
-        name = text.split('(', maxsplit=1)[0]
-        params = self.parse_args(text.split('(', maxsplit=1)[1][:-1], index)
+        if tokens[-1] != ')':
+            raise SyntaxError(f'Invalid syntax @ line {index}')
+        name = tokens[0]
+        params = self.parse_args(tokens[2:-1], index)
 
         return [
             index, indent,
@@ -626,30 +654,26 @@ class _Parser:
         """ Parses a mixin statement """
         index = line[0]
         indent = line[1]
-        text = line[2]
+        tokens = line[2]
 
         return [
             index, indent,
-            {'type': 'mixin', 'value': text.split(' ', maxsplit=1)[1]}
+            {'type': 'mixin', 'value': ''.join(tokens[2:])}
         ]
 
-    @staticmethod
-    def parse_header(line: tuple):
+    def parse_header(self, line: tuple):
         """ Parses a function header. """
         index = line[0]
         indent = line[1]
-        text = line[2]
-
-        for c in ['#', ':', ')']:
-            text = text.strip(c)
-        name, params = text.split('(')
-        a = re.finditer('[^A-z0-9_, ]', params)
-        for find in a:
-            if find:
-                raise SyntaxError(f'Invalid function parameters @ line {index}')
+        tokens = line[2]
 
-        # Parameters
-        params = [s.strip() for s in params.split(',')]
+        # The tokens are #, the name, the parameters in brackets & a colon
+        name = tokens[1]
+        params = []
+        for param in self.split(tokens[3:-2], ','):
+            if len(param) > 1 or param and not param[0].isidentifier():
+                raise SyntaxError(f'Invalid function parameters @ line {index}')
+            params.append(''.join(param))
 
         return [
             index, indent,
@@ -659,9 +683,8 @@ class _Parser:
     @staticmethod
     def parse_import(line: tuple):
         """ Parses an import statement. """
-        try:
-            import_ = line[2].split()[1]
-        except IndexError:
+        import_ = ''.join(line[2][1:])
+        if not import_:
             raise SyntaxError(f'Import statement cannot be empty @ line {line[0]}')
         return [
             line[0],
@@ -672,9 +695,8 @@ class _Parser:
     @staticmethod
     def parse_delete(line: tuple):
         """ Parses a delete statement """
-        try:
-            delete_ = line[2].split()[1]
-        except IndexError:
+        delete_ = ''.join(line[2][1:])
+        if not delete_:
             raise SyntaxError(f'Delete statement cannot be empty @ line {line[0]}')
         return [
             line[0],
@@ -686,14 +708,11 @@ class _Parser:
         """ Parses a regular base statement. """
         index = line[0]
         indent = line[1]
-        text = line[2]
+        tokens = line[2]
 
-        if len(text.split()) > 1:
-            ins, params = text.split(maxsplit=1)
-            # Parameter parsing
-            params = self.parse_args(params, index)
-        else:
-            ins, params = text, []
+        # The name & the parameters
+        ins = tokens[0]
+        params = self.parse_args(tokens[1:], index)
 
         return [
             index, indent,
@@ -704,15 +723,13 @@ class _Parser:
         """ Parses an assignment. """
         index = line[0]
         indent = line[1]
-        text = line[2]
+        tokens = line[2]
 
-        var, data = (s.strip() for s in text.split('='))
-
-        params = self.hash_strings(data, index)
-        if '#' in params and '[' not in params and ']' not in params:
-            for c in params:
-                if c != '#':
-                    raise SyntaxError(f'Invalid syntax @ line {index}')
+        equals = tokens.index('=')
+        var = ''.join(tokens[:equals])
+        data = tokens[equals + 1:]
+        if '=' in data:
+            raise SyntaxError(f'Invalid syntax @ line {index}')
 
         data = self.variable(data, index)
 
@@ -725,21 +742,32 @@ class _Parser:
     # Final
     # ------------------------------------------
 
-    def render(self):
-        """ Returns the code object from the class. Also places
-        the header as the first element. """
+    def header(self):
+        """ Returns the header placed before the code. """
 
         time_ = datetime.datetime.utcnow().strftime('%d-%M-%Y %H:%M:%S')
-        header = {
+        return {
             "line": 0,
             "type": self.OPT_HEADER_TITLE,
             "format": FORMAT,
             "info": f"Parsed by asp3 version {__version__}, {time_}"
         }
-        self.code.insert(0, header)
+
+    def render(self):
+        """ Returns the code object from the class. Also places
+        the header as the first element. """
+
+        self.code.insert(0, self.header())
 
         return self.code
 
+    def render_stream(self):
+        """ Yields the header and then the top level statements,
+        parsing the lines only as far as needed for each one. """
+
+        yield self.header()
+        yield from self.nest_stream(self.typed(lex_lines(self.lines)))
+
 
 def parse(lines: list, **kw):
     """ Parses the code and returns a JSON serializable data
@@ -748,3 +776,13 @@ def parse(lines: list, **kw):
     f.readlines() """
 
     return _Parser(lines, **kw).render()
+
+
+def parse_stream(lines, **kw):
+    """ Parses the code lazily, yielding the header and then every
+    top level statement as soon as it's complete. Takes the same
+    options as parse().
+    :param lines: Any iterable of lines, like an open file, which
+                  is only read as far as the statements are taken """
+
+    return _Parser(lines, stream=True, **kw).render_stream()
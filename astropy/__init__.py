@@ -9,12 +9,14 @@ the current data in the scope.
 import re
 
 __author__  = 'bellrise'
-__version__ = '0.2.9'
+__version__ = '0.5.0'
 
 # Interface imports
-from .objects import Scope, Mixin
+from .objects import Scope, Mixin, NativeMixin, throw
+from .arrays import NumArray
 from . import errors
 from . import models
+from . import objects
 
 
 def render(func, lib: str, name: str):
@@ -25,9 +27,36 @@ def render(func, lib: str, name: str):
         if not re.match('[A-z].+', i):
             raise RuntimeError('Invalid mixin name')
 
+    if hasattr(func, '__native__'):
+        return NativeMixin(func, lib, name)
     return Mixin(func, lib, name)
 
 
+def native(returns: str, **params):
+    """ Decorator for mixins using the native calling convention. The
+    function does not get the scope, only the declared parameters as
+    keyword arguments, already turned into python values. The returned
+    python value is set to the 'returns' variable. The parameter types
+    are astro type names (num, str, bool, array, map) or any, which passes
+    the raw variable tuple. Arrays are passed as the list used by the
+    interpreter, containing variable tuples, so they are never copied
+    and must not be modified. Arrays of numbers can also be a NumArray,
+    acting like such a list. Maps are passed as the dict of the
+    interpreter, the keys being the variable tuples of models.Map.key().
+    Errors are raised with throw().
+    :param returns: name of the variable the result is set to
+    :param params: names & types of the parameters """
+
+    for name, type_ in params.items():
+        if type_ not in objects.native_types:
+            raise RuntimeError(f"Invalid type '{type_}' of parameter '{name}'")
+
+    def decorator(func):
+        func.__native__ = (returns, params)
+        return func
+    return decorator
+
+
 def void(*r):
     # ! Pulled from llx
     """ This function is used for voiding variables (basically
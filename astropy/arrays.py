@@ -0,0 +1,135 @@
+""" This contains the compact array type used for arrays holding only
+numbers. A normal astro array is a python list of ('num', 1.0) tuples,
+which takes up more than 80 bytes for every number. The NumArray keeps
+the numbers in an array('d') instead (8 bytes each), while still acting
+like the list of tuples, so the interpreter and the mixins not knowing
+about it keep working. Mixins that do know about it can work on the
+numbers directly, see numeric, numbers() and view().
+
+Anything else than a number written into a NumArray turns it into the
+normal list of tuples, from then on it just wraps that list.
+"""
+from itertools import repeat
+from array import array
+
+
+class NumArray:
+    """ An astro array of numbers stored as C doubles. """
+
+    __slots__ = ('data', )
+
+    def __init__(self, numbers=()):
+        """ Creates the array from an iterable of python numbers. An
+        array('d') is used as it is, without copying it. """
+        if isinstance(numbers, array) and numbers.typecode == 'd':
+            self.data = numbers
+        else:
+            self.data = array('d', numbers)
+
+    @classmethod
+    def pack(cls, items):
+        """ Returns a NumArray of the variable tuples if all of them are
+        numbers, or None if they are not. """
+        numbers = array('d')
+        append = numbers.append
+        for item in items:
+            if item[0] != 'num':
+                return None
+            append(item[1])
+        return cls(numbers)
+
+    @property
+    def numeric(self) -> bool:
+        """ True until something else than a number is written in. """
+        return type(self.data) is array
+
+    def numbers(self) -> array:
+        """ Returns the array('d') holding the numbers, it's not copied. """
+        if not self.numeric:
+            raise TypeError('the array does not only hold numbers anymore')
+        return self.data
+
+    def view(self) -> memoryview:
+        """ Returns a memoryview of the numbers, without copying them. """
+        return memoryview(self.numbers())
+
+    def tolist(self) -> list:
+        """ Returns the normal astro array, a list of variable tuples. """
+        if self.numeric:
+            return list(zip(repeat('num'), self.data))
+        return list(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        if self.numeric:
+            return zip(repeat('num'), self.data)
+        return iter(self.data)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if self.numeric:
+                return NumArray(self.data[index])
+            return self.data[index]
+        if self.numeric:
+            return 'num', self.data[index]
+        return self.data[index]
+
+    def __setitem__(self, index, value):
+        if self.numeric:
+            if value[0] == 'num':
+                self.data[index] = value[1]
+                return
+            self.data = self.tolist()   # Falling back to the list of tuples
+        self.data[index] = value
+
+    def __contains__(self, item):
+        if self.numeric:
+            return item[0] == 'num' and item[1] in self.data
+        return item in self.data
+
+    def index(self, item) -> int:
+        """ Returns the index of the first equal item, raises
+        ValueError if there is none. """
+        if self.numeric:
+            if item[0] != 'num':
+                raise ValueError('the item is not in the array')
+            return self.data.index(item[1])
+        return self.data.index(item)
+
+    def __add__(self, other):
+        if not isinstance(other, (NumArray, list)):
+            return NotImplemented
+        if self.numeric:
+            if not isinstance(other, NumArray):
+                other = NumArray.pack(other) or other
+            if isinstance(other, NumArray) and other.numeric:
+                return NumArray(self.data + other.data)
+        return self.tolist() + list(other)
+
+    def __radd__(self, other):
+        if not isinstance(other, list):
+            return NotImplemented
+        packed = NumArray.pack(other)
+        if packed is not None and self.numeric:
+            return NumArray(packed.data + self.data)
+        return other + self.tolist()
+
+    def __eq__(self, other):
+        if isinstance(other, NumArray):
+            if self.numeric and other.numeric:
+                return self.data == other.data
+            return self.tolist() == other.tolist()
+        if isinstance(other, list):
+            return self.tolist() == other
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.tolist())
@@ -7,3 +7,5 @@ undef_function = 'UndefinedFunction'
 type_error = 'TypeError'
 file_error = 'FileError'
 index_error = 'IndexError'
+zero_division = 'ZeroDivisionError'
+recursion_error = 'RecursionError'
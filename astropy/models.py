@@ -3,6 +3,8 @@ referred to as "models" in astropy. """
 from typing import Union
 from abc import ABC, abstractmethod
 
+from .arrays import NumArray
+
 
 class Variable(ABC):
     """ This represents a single astro variable, it is the top level
@@ -143,15 +145,18 @@ class Num(Variable):
 
 
 class Array(Variable):
-    """ A multi-type array. """
+    """ A multi-type array. Arrays of numbers can be backed by a
+    NumArray instead of a list, holding the numbers themselves. """
 
     _length: int = 0
 
     @classmethod
     def new(cls, name: str, data: list):
         """ Creates a new array from the variable arra"""
+        if isinstance(data, NumArray):
+            return Array(name, data)
         for i in data:
-            if not isinstance(i, (Array, Num, String, Bool)):
+            if not isinstance(i, (Array, Num, String, Bool, Map)):
                 raise TypeError('non-astro data type in array')
         return Array(name, data)
 
@@ -166,12 +171,17 @@ class Array(Variable):
         """ Returns the length of the saved array. """
         return self._length
 
+    def numeric(self) -> bool:
+        """ Returns True if the array is a NumArray of numbers. """
+        return isinstance(self._data, NumArray) and self._data.numeric
+
     def set(self, array: list):
         """ Sets the astro array to the python array. """
-        # Type checks
-        for i in array:
-            if not isinstance(i, (Array, Num, String, Bool)):
-                raise TypeError(f'non-astro data type in array')
+        # Type checks, a NumArray can only hold numbers
+        if not isinstance(array, NumArray):
+            for i in array:
+                if not isinstance(i, (Array, Num, String, Bool, Map)):
+                    raise TypeError(f'non-astro data type in array')
         self._data = array
         self._length = len(array)
 
@@ -205,39 +215,79 @@ class Bool(Variable):
         return self._data
 
 
-# FOR THE FUTURE, NOT IMPLEMENTED IN CODE YET.
 class Map(Variable):
-    """ An array of key-value pairs. Dynamicaly typed. """
+    """ A map of keys to values, both stored in the astro variable
+    format. The keys are hashed, so finding a key takes the same time
+    however big the map is. Only numbers, strings & bools can be keys. """
 
-    _length: int = 0
+    # Types of the variables which can be used as keys
+    KEY_TYPES = ('num', 'str', 'bool')
 
     @classmethod
-    def new(cls, name: str, data):
-        pass
-
-    def __init__(self, name: str, data):
+    def new(cls, name: str, data: dict):
+        """ Creates a new Map object from a dict of astro variables. """
+        if not isinstance(data, dict):
+            raise TypeError('the passed object is not a dict')
+        for key in data:
+            cls.key(key)
+        return Map(name, data)
+
+    def __init__(self, name: str, data: dict):
         """ Constructor """
-        pass
+        self._name = name
+        self._data = data
+        self._type = 'map'
+
+    @classmethod
+    def key(cls, var) -> tuple:
+        """ Returns the hashable key of the variable, which is its astro
+        format. The type is a part of the key, so 1 and True are two
+        different keys. """
+        if isinstance(var, Variable):
+            var = var.raw()
+        if var[0] not in cls.KEY_TYPES:
+            raise TypeError(f"'{var[0]}' cannot be used as a map key")
+        return var[0], var[1]
 
     def __len__(self):
         """ Returns the length of the map. """
-        pass
+        return len(self._data)
 
     def valueof(self, key):
-        """ Returns the value of the key. """
-        pass
+        """ Returns the value of the key, None if there is no such key. """
+        return self._data.get(self.key(key))
 
     def keyof(self, value):
-        """ Returns the key of the value. """
-        pass
+        """ Returns the first key with the value, None if there is no
+        such value. This has to look at every value. """
+        if isinstance(value, Variable):
+            value = value.raw()
+        for key, other in self._data.items():
+            if other == value:
+                return key
+        return None
 
     def __contains__(self, item):
         """ Returns true if the key exists in the Map. """
-        pass
+        return self.key(item) in self._data
 
     def set(self, key, value):
         """ Set the value at the current key. """
-        pass
+        if isinstance(value, Variable):
+            value = value.raw()
+        self._data[self.key(key)] = value
+
+    def delete(self, key):
+        """ Removes the key, raises KeyError if there is no such key. """
+        del self._data[self.key(key)]
+
+    def keys(self) -> list:
+        """ Returns the keys, in the order they were added. """
+        return list(self._data)
+
+    def values(self) -> list:
+        """ Returns the values, in the order their keys were added. """
+        return list(self._data.values())
 
 
 def create(name, value):
@@ -250,4 +300,6 @@ def create(name, value):
         return Array(name, value[1])
     if value[0] == 'bool':
         return Bool(name, value[1])
+    if value[0] == 'map':
+        return Map(name, value[1])
     raise TypeError('astropy does not support the %s data type' % value[0])
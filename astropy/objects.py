@@ -1,27 +1,60 @@
 """ This contains the objects for the astropy package, they are mostly for
 an abstraction layer on top of the raw data passed around by the interpreter,
 and for more convinience. """
-from typing import Union, Dict
+from typing import Union
 
+from .arrays import NumArray
 from . import models
+from . import errors
 
 # The Variable type
-var_t = Union[models.Num, models.Array, models.String, models.Bool]
-var_tuple = (models.Num, models.Array, models.String, models.Bool)
+var_t = Union[models.Num, models.Array, models.String, models.Bool, models.Map]
+var_tuple = (models.Num, models.Array, models.String, models.Bool, models.Map)
+
+# Parameter types of native mixins, 'any' passes the raw variable tuple.
+native_types = ('num', 'str', 'bool', 'array', 'map', 'any')
+
+
+def throw(err, why):
+    """ Throws an error for the interpreter to catch. """
+    raise RuntimeError(f'{err}::{why}')
+
+
+def wrap(value):
+    """ Returns the astro variable tuple of the python value returned
+    by a native mixin. Tuples are expected to be astro variables already,
+    so they are returned as they are. """
+    if isinstance(value, tuple):
+        return value
+    if isinstance(value, bool):
+        return 'bool', value
+    if isinstance(value, (int, float)):
+        return 'num', value
+    if isinstance(value, str):
+        return 'str', value
+    if isinstance(value, (list, NumArray)):
+        return 'array', value
+    if isinstance(value, dict):
+        return 'map', value
+    if value is None:
+        return 'null', None
+    raise TypeError(f'native mixins cannot return {type(value).__name__}')
 
 
 class Scope:
     """ This class defines the variable scope and contains methods used
-    to get and put variable data to modify the scope. """
+    to get and put variable data to modify the scope. A new scope is
+    created for every mixin call, and the models are only created for
+    the variables the mixin actually uses. """
 
-    __vars: Dict[str, var_t] = {}  # Variable container
+    __slots__ = ('__data', '__vars')
 
     def __init__(self, scope: dict):
-        """ Contructor. Unpacks the scope dict and collects the variables
-        into the __vars container. """
+        """ Contructor. The scope dict is not copied or converted, the
+        variables are turned into models when they are first accessed. """
 
-        for name, value in scope.items():
-            self.__vars[name] = models.create(name, value)
+        self.__data = scope     # Raw interpreter variables
+        self.__vars = {}        # Variable container, only used variables
 
     def get(self, name: str, default=None):
         """ Returns the variable with the given name, else returns
@@ -29,7 +62,13 @@ class Scope:
         try:
             return self.__vars[name]
         except KeyError:
+            pass
+
+        value = self.__data.get(name)
+        if value is None:
             return default
+        var = self.__vars[name] = models.create(name, value)
+        return var
 
     def place(self, var: var_t):
         """ Place the variable onto the scope, without needing its name. """
@@ -40,7 +79,7 @@ class Scope:
         if not isinstance(var, var_tuple):
             raise TypeError('this only accepts astropy models')
 
-        if isinstance(var, models.Array):
+        if isinstance(var, models.Array) and not isinstance(var.get(), NumArray):
             # Convert each item into a astro version of it
             for i, e in enumerate(var):
                 var[i] = (e.typeof(), e.get())
@@ -49,10 +88,12 @@ class Scope:
 
     def throw(self, err, why):
         """ Throws an error for the interpreter to catch. """
-        raise RuntimeError(f'{err}::{why}')
+        throw(err, why)
 
     def format(self):
-        """ Returns a data format that the interpreter can understand. """
+        """ Returns a data format that the interpreter can understand.
+        Only the variables that were accessed or set are returned, the
+        rest of the scope stays the same. """
         container = {}
         for name, value in self.__vars.items():
             name: str
@@ -80,3 +121,36 @@ class Mixin:
         data), and return any data from the function. """
 
         return self.func(Scope(data))
+
+
+class NativeMixin(Mixin):
+    """ A mixin using the native calling convention, see native(). The
+    scope is never converted into models, only the declared parameters
+    are taken out of it. """
+
+    __slots__ = ('params', 'result')
+
+    def __init__(self, func, lib: str, name: str):
+        """ Constructor, the parameters & the result variable are
+        taken from the native() decorator. """
+
+        super().__init__(func, lib, name)
+        self.result, self.params = func.__native__
+
+    def execute(self, data):
+        """ Execute the function with the declared parameters, and
+        return the result variable for the interpreter to set. """
+
+        args = {}
+        for name, type_ in self.params.items():
+            value = data.get(name)
+            if value is None:
+                throw(errors.undef_parameter, f"'{name}' is not defined")
+            if type_ == 'any':
+                args[name] = value
+            elif value[0] == type_:
+                args[name] = value[1]
+            else:
+                throw(errors.type_error, f"'{name}' parameter has to be of type {type_}")
+
+        return {self.result: wrap(self.func(**args))}
@@ -3,5 +3,10 @@
 # This is a simple way of executing the python script on Linux
 # systems without needing to use 'python3 interpreter.py' before
 # the filename itself. This is just a quality of life thing,
-# no functionality will actually be found here. 
-python3 interpreter.py $1
+# no functionality will actually be found here. If ASX_SOCKET is
+# set, the scripts are sent to a running server instead.
+if [ -n "$ASX_SOCKET" ]; then
+    python3 "$(dirname "$0")/client.py" "$@"
+else
+    python3 interpreter.py $1
+fi
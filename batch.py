@@ -0,0 +1,126 @@
+''' ASX Batch Runner '''
+# Runs a lot of scripts at once, spread over a pool of worker processes (or
+# threads), and reports the time of every script & the total throughput.
+# The mixins and the standard library are loaded before the workers start,
+# so on systems with fork() every worker gets them for free.
+
+__version__ = '0.1'
+
+import concurrent.futures
+import multiprocessing
+import argparse
+import glob
+import time
+import sys
+import os
+import io
+
+import interpreter as asx
+
+
+options = {}    # Set by warm_up() in every worker
+
+
+def find_scripts(paths: list):  # Directories (searched recursively), glob patterns & files -> list of scripts
+    scripts = []
+    for path in paths:
+        if os.path.isdir(path):
+            scripts.extend(sorted(glob.glob(os.path.join(path, '**', '*.asx'), recursive=True)))
+        elif os.path.isfile(path):
+            scripts.append(path)
+        else:
+            scripts.extend(sorted(glob.glob(path, recursive=True)))
+    return scripts
+
+
+def warm_up(ignore_errors: bool, use_cache: bool, output: str):
+    options.update(ignore_errors=ignore_errors, use_cache=use_cache, output=output)
+
+    # Everything shared by the interpreters is loaded once, so the scripts don't have to
+    asx.mixins.load_all()
+    if use_cache:
+        for lib in glob.glob(os.path.join(asx.lib_path, '*.asx')):
+            try:
+                asx.apc.load(lib, assignment_kw='params')
+            except SyntaxError:
+                pass    # Reported by the script importing it
+
+
+def output_path(directory: str, script: str):  # The output of a/b.asx goes to <directory>/a/b.asx.out
+    script = os.path.abspath(script)
+    relative = os.path.relpath(script)
+    if relative.startswith(os.pardir):
+        relative = os.path.splitdrive(script)[1].lstrip(os.sep)
+    return os.path.join(directory, relative + '.out')
+
+
+def run_script(script: str):   # Runs in a worker, returns (script, status, seconds)
+    out = io.StringIO()
+    interpreter = asx.Interpreter(ignore_errors=options['ignore_errors'], use_cache=options['use_cache'], out=out)
+    status = 0
+    start = time.perf_counter()
+    try:
+        interpreter.run_file(script)
+    except asx.ScriptError:
+        status = 1
+    except Exception as E:  # Parser & internal errors only fail the script, not the whole batch
+        print(f'[{E.__class__.__name__}] | {E}', file=out)
+        status = 1
+    seconds = time.perf_counter() - start
+
+    if options['output']:
+        path = output_path(options['output'], script)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(out.getvalue())
+    return script, status, seconds
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('paths', nargs='+', help='Scripts, directories or glob patterns')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help="Number of workers, the CPU count by default")
+    parser.add_argument('-t', '--threads', action='store_true', help="Uses threads instead of processes, for scripts mostly waiting")
+    parser.add_argument('-o', '--ignoreErrors', action='store_true', help="Ignores Program Errors")
+    parser.add_argument('-n', '--noCache', action='store_true', help="Always parses the code, without using __asxcache__")
+    parser.add_argument('--output', metavar='DIR', help="Saves the output of every script in this directory")
+    parser.add_argument('-q', '--quiet', action='store_true', help="Only reports failed scripts & the summary")
+    args = parser.parse_args(argv)
+
+    scripts = find_scripts(args.paths)
+    if not scripts:
+        parser.error('no scripts found')
+    jobs = max(1, min(args.jobs, len(scripts)))
+    settings = (args.ignoreErrors, not args.noCache, args.output)
+
+    warm_up(*settings)
+    if args.threads:
+        pool = concurrent.futures.ThreadPoolExecutor(jobs)
+        chunksize = 1
+    else:
+        # With fork the workers start with everything warm_up() loaded, other start methods call it again
+        context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+        if context.get_start_method() == 'fork':
+            pool = concurrent.futures.ProcessPoolExecutor(jobs, mp_context=context)
+        else:
+            pool = concurrent.futures.ProcessPoolExecutor(jobs, mp_context=context, initializer=warm_up, initargs=settings)
+        chunksize = max(1, min(64, len(scripts) // (jobs * 4)))
+
+    failed = 0
+    busy = 0.0
+    start = time.perf_counter()
+    with pool:
+        for script, status, seconds in pool.map(run_script, scripts, chunksize=chunksize):
+            busy += seconds
+            failed += status != 0
+            if status or not args.quiet:
+                print(f'{seconds:9.4f}s  {"ok" if status == 0 else "FAIL":4}  {script}')
+    wall = time.perf_counter() - start
+
+    print(f'\n{len(scripts)} scripts, {failed} failed, {jobs} {"threads" if args.threads else "processes"}')
+    print(f'{wall:.3f}s wall time, {busy:.3f}s in scripts -> {len(scripts) / wall:,.1f} scripts/sec')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# python >= 3.6
+""" Micro-benchmark for the statement dispatch of the interpreter. It
+generates a script calling a function with a body of simple statements
+many times and reports how many statements were executed per second.
+Only the interpret() call is timed, parsing and start-up are not.
+
+Usage: python bench/dispatch.py [--calls N] [--interpreter path]
+The --interpreter option can point to the interpreter.py of an older
+checkout, so the numbers can be compared before & after a change.
+"""
+import importlib.util
+import contextlib
+import inspect
+import argparse
+import tempfile
+import time
+import sys
+import os
+import io
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The body of the benchmarked function, only statements every version
+# of the interpreter can execute.
+BODY = [
+    'a = 1',
+    'b = "text"',
+    'c = [1, 2, 3]',
+    'd = c[1]',
+    'e = a',
+    'f = b',
+    'g = True',
+    'h = d',
+]
+
+
+def generate(calls: int) -> str:
+    """ Returns the source of the benchmark script. """
+    lines = ['#bench(x):'] + ['    ' + s for s in BODY]
+    lines += ['bench(1)'] * calls
+    return '\n'.join(lines) + '\n'
+
+
+def load(interpreter: str, script: str):
+    """ Imports the interpreter module. Older versions run the passed
+    script on import. Returns the module. """
+    argv, cwd = sys.argv, os.getcwd()
+    sys.argv = [interpreter, script]
+    sys.path.insert(0, os.path.dirname(interpreter))
+    os.chdir(os.path.dirname(interpreter))
+    try:
+        spec = importlib.util.spec_from_file_location('interpreter', interpreter)
+        module = importlib.util.module_from_spec(spec)
+        with contextlib.redirect_stdout(io.StringIO()):
+            spec.loader.exec_module(module)
+    finally:
+        sys.argv = argv
+        os.chdir(cwd)
+    return module
+
+
+def prepare(module, script: str):
+    """ Returns the interpret function of the module and the parsed
+    script. Older versions have a single, module level interpreter. """
+    if isinstance(module.Interpreter, type):
+        interpreter = module.Interpreter()
+        return interpreter.interpret, interpreter.parse_file(script)
+    return module.Interpreter.interpret, module._get_parse(script)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=20000, help='Number of function calls')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs, the best is taken')
+    parser.add_argument('--interpreter', default=os.path.join(ROOT, 'interpreter.py'))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.asx')
+        with open(path, 'w') as f:
+            f.write(generate(args.calls))
+        module = load(os.path.abspath(args.interpreter), path)
+        interpret, code = prepare(module, path)
+
+    # Older versions of the interpreter need to be told they are not
+    # running a function
+    kw = {}
+    if 'in_function' in inspect.signature(interpret).parameters:
+        kw['in_function'] = False
+
+    # Anything printed by the script is discarded
+    best = float('inf')
+    with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null):
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            interpret(source=code, **kw)
+            best = min(best, time.perf_counter() - start)
+
+    statements = args.calls * (len(BODY) + 1)
+    print(f'{statements} statements in {best:.3f}s '
+          f'-> {statements / best:,.0f} statements/sec')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+# python >= 3.6
+""" Benchmark suite for the execution of scripts by the interpreter. Each
+workload is a generated script doing one kind of work over and over:
+assignments, function calls, recursion, Array, String & Map library
+calls and Serialize round-trips. For every workload it reports the executed
+statements per second and the memory high-water mark, so worker hosts
+can be sized and regressions caught.
+
+Every workload runs in its own Python process, so the maximum resident
+set size (ru_maxrss) belongs to that workload only. The process parses
+the script, times the best of --repeat runs of interpret(), counts the
+executed statements in another run (the LINE events of the profiler)
+and measures the peak of the Python allocations with tracemalloc in a
+last one. Only the timed runs are free of any measuring overhead.
+
+Usage: python bench/execution.py [--scale 1.0] [--output FILE]
+The results are printed as JSON (or saved to FILE), a readable summary
+goes to stderr. --baseline takes the JSON of an earlier run and shows the
+speed compared to it. --interpreter can point to the interpreter.py of
+another checkout (0.3.3 or newer, the statements are counted with the
+profiler hooks).
+"""
+import subprocess
+import tracemalloc
+import contextlib
+import importlib
+import argparse
+import tempfile
+import resource
+import json
+import math
+import time
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The workloads, {n} is replaced by the iteration count: the default
+# count times --scale. String arguments are assigned to variables first
+# and library calls are always assigned, the parser needs both.
+WORKLOADS = {
+    'assignments': (200000, [
+        'i = 0',
+        'while i < {n}:',
+        '    a = i',
+        '    b = a + 1',
+        '    c = b * 2 - a',
+        '    d = "text"',
+        '    e = [a, b, c]',
+        '    f = e[1]',
+        '    i = i + 1',
+    ]),
+    'calls': (100000, [
+        '#add(a, b):',
+        '    return a + b',
+        'i = 0',
+        'x = 0',
+        'while i < {n}:',
+        '    x = add(x, i)',
+        '    i = i + 1',
+    ]),
+    'recursion': (18, [
+        '#fib(n):',
+        '    if n < 2:',
+        '        return n',
+        '    return fib(n - 1) + fib(n - 2)',
+        'x = fib({n})',
+    ]),
+    'deep_recursion': (200, [
+        '#down(n):',
+        '    if n < 1:',
+        '        return 0',
+        '    return down(n - 1) + 1',
+        'i = 0',
+        'while i < {n}:',
+        '    x = down(150)',
+        '    i = i + 1',
+    ]),
+    'arrays': (2000, [
+        'import Array',
+        'buf = [' + ', '.join(str((n * 7919) % 1000) for n in range(500)) + ']',
+        'item = 999',
+        'i = 0',
+        'while i < {n}:',
+        '    s = Array.sum(buf)',
+        '    t = Array.sort(buf)',
+        '    c = Array.contains(buf, item)',
+        '    i = i + 1',
+    ]),
+    'strings': (5000, [
+        'import String',
+        'text = "The Quick Brown Fox Jumps Over The Lazy Dog"',
+        'old = "Fox"',
+        'new = "Cat"',
+        'space = " "',
+        'i = 0',
+        'while i < {n}:',
+        '    u = String.upper(text)',
+        '    l = String.lower(text)',
+        '    r = String.replace(text, old, new)',
+        '    p = String.split(text, space)',
+        '    f = String.find(text, old)',
+        '    i = i + 1',
+    ]),
+    'maps': (20000, [
+        'import Map',
+        'seen = {{}}',
+        'yes = True',
+        'i = 0',
+        'while i < {n}:',
+        '    h = Map.has(seen, i)',
+        '    seen = Map.set(seen, i, yes)',
+        '    v = Map.get(seen, i)',
+        '    i = i + 1',
+    ]),
+    'serialize': (500, [
+        'import Serialize',
+        'buf = [' + ', '.join(str(n) for n in range(500)) + ']',
+        'name = "bench.bin"',
+        'i = 0',
+        'while i < {n}:',
+        '    done = Serialize.serialize(buf, name)',
+        '    back = Serialize.deserialize(name)',
+        '    i = i + 1',
+    ]),
+}
+
+
+class StatementCounter:
+    """ Takes the place of the profiler, only counting the statements
+    (LINE instructions) without timing anything. """
+
+    def __init__(self):
+        self.statements = 0
+
+    def line(self, code, line: int):
+        self.statements += 1
+
+    def function(self, execute, code, frame=None):
+        return execute(code, frame)
+
+    def mixin(self, mixin, scope: dict):
+        return mixin.execute(scope)
+
+
+def run_workload(module, name: str, n: int, repeat: int) -> dict:
+    """ Runs a single workload in this process, in a temporary working
+    directory for the files it writes. """
+    source = '\n'.join(WORKLOADS[name][1]).format(n=n) + '\n'
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, 'w') as null:
+        os.chdir(tmp)
+        try:
+            def interpret(**kw):
+                # Every run gets an interpreter with empty memory, parsing isn't timed
+                interpreter = module.Interpreter(out=null, **kw)
+                code = interpreter.parse(source)
+                start = time.perf_counter()
+                interpreter.interpret(code)
+                seconds = time.perf_counter() - start
+                interpreter.flush()
+                return seconds
+
+            with contextlib.redirect_stdout(null):
+                interpret()     # Warm up, loading the libraries & mixins
+                best = min(interpret() for _ in range(repeat))
+
+                counter = StatementCounter()
+                interpret(profiler=counter)
+
+                tracemalloc.start()
+                try:
+                    interpret()
+                    peak = tracemalloc.get_traced_memory()[1]
+                finally:
+                    tracemalloc.stop()
+        finally:
+            os.chdir(cwd)
+
+    # ru_maxrss is in kilobytes on Linux, in bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != 'darwin':
+        maxrss *= 1024
+    return {
+        'workload': name,
+        'n': n,
+        'seconds': best,
+        'statements': counter.statements,
+        'statements_per_second': counter.statements / best,
+        'peak_memory': peak,
+        'max_rss': maxrss
+    }
+
+
+def load_interpreter(path: str):
+    sys.path.insert(0, os.path.dirname(os.path.abspath(path)))
+    return importlib.import_module('interpreter')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workloads', nargs='+', choices=list(WORKLOADS), default=list(WORKLOADS))
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiplies the iteration count of every workload (> 0)')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs, the best is taken')
+    parser.add_argument('--interpreter', default=os.path.join(ROOT, 'interpreter.py'))
+    parser.add_argument('--output', help='Saves the JSON results to this file instead of printing them')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare with')
+    parser.add_argument('--run', choices=list(WORKLOADS), help=argparse.SUPPRESS)    # Used by the worker processes
+    parser.add_argument('-n', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        result = run_workload(load_interpreter(args.interpreter), args.run, args.n, args.repeat)
+        print(json.dumps(result))
+        return
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {r['workload']: r for r in json.load(f)['results']}
+
+    results = []
+    failed = False
+    for name in args.workloads:
+        if name == 'recursion':     # fib(n) makes about 1.618^n calls, the scale is applied to the calls
+            n = max(1, WORKLOADS[name][0] + round(math.log(args.scale, 1.618)))
+        else:
+            n = max(1, int(WORKLOADS[name][0] * args.scale))
+        worker = subprocess.run([sys.executable, os.path.abspath(__file__), '--run', name, '-n', str(n),
+                                 '--repeat', str(args.repeat), '--interpreter', args.interpreter],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        if worker.returncode != 0:
+            failed = True
+            error = worker.stderr.strip().splitlines()[-1] if worker.stderr.strip() else f'exit status {worker.returncode}'
+            results.append({'workload': name, 'n': n, 'error': error})
+            print(f'{name:>15}: {error}', file=sys.stderr)
+            continue
+
+        result = json.loads(worker.stdout.strip().splitlines()[-1])
+        results.append(result)
+        line = (f'{name:>15}: {result["statements"]:>9} statements in {result["seconds"]:.3f}s '
+                f'-> {result["statements_per_second"]:>10,.0f} statements/sec, '
+                f'peak {result["peak_memory"] / 1024:>8,.0f} KiB, max rss {result["max_rss"] / 1048576:,.1f} MiB')
+        old = baseline.get(name)
+        if old and 'statements_per_second' in old:
+            line += f'  {result["statements_per_second"] / old["statements_per_second"]:.2f}x the speed of the baseline'
+        print(line, file=sys.stderr)
+
+    report = {
+        'interpreter': load_interpreter(args.interpreter).__version__,
+        'python': sys.version.split()[0],
+        'repeat': args.repeat,
+        'scale': args.scale,
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+        print()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# python >= 3.6
+""" Benchmark for the control flow of the interpreter. It runs a while
+loop counting up to the given number, both at the module level (global
+variables) and inside of a function (local variables), and reports the
+time each loop took. Only the interpret() call is timed.
+
+Usage: python bench/loop.py [--iterations N] [--limit SECONDS]
+If the --limit option is given, the benchmark exits with status 1 when
+one of the loops takes longer than that, so it can be used as a check.
+"""
+from dispatch import load, prepare, ROOT
+import contextlib
+import argparse
+import tempfile
+import time
+import sys
+import os
+
+# The benchmarked scripts, {n} is replaced by the iteration count.
+SCRIPTS = {
+    'module': [
+        'i = 0',
+        'while i < {n}:',
+        '    i = i + 1',
+    ],
+    'function': [
+        '#count(n):',
+        '    i = 0',
+        '    while i < n:',
+        '        i = i + 1',
+        '    return i',
+        'count({n})',
+    ]
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=1000000, help='Number of loop iterations')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs, the best is taken')
+    parser.add_argument('--limit', type=float, default=None, help='Maximum time of a single loop in seconds')
+    parser.add_argument('--interpreter', default=os.path.join(ROOT, 'interpreter.py'))
+    args = parser.parse_args()
+
+    failed = False
+    for name, lines in SCRIPTS.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.asx')
+            with open(path, 'w') as f:
+                f.write('\n'.join(lines).format(n=args.iterations) + '\n')
+            module = load(os.path.abspath(args.interpreter), path)
+            interpret, code = prepare(module, path)
+
+        best = float('inf')
+        with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null):
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                interpret(source=code)
+                best = min(best, time.perf_counter() - start)
+
+        print(f'{name:>8}: {args.iterations} iterations in {best:.3f}s '
+              f'-> {args.iterations / best:,.0f} iterations/sec')
+        if args.limit is not None and best > args.limit:
+            print(f'{name:>8}: over the limit of {args.limit}s')
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
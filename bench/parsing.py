@@ -0,0 +1,298 @@
+# python >= 3.6
+""" Benchmark for the asp3 parser. It generates synthetic scripts of a
+few kinds (deep nesting, long strings, lots of comments, huge array
+literals, many functions) at several sizes, parses each one and reports
+the time & peak memory of the whole parse and of every parser phase.
+
+The phases are the parser functions & methods listed in PHASES, every
+one the loaded asp3 version has gets wrapped and timed, so older versions
+(clean, count_whitespace, recursive_sort) and newer ones (lex, nest) can
+both be measured. A phase called by another one is included in its time,
+the self time leaves it out. The generator phases (lex_lines, typed,
+nest_stream) are timed every time the next item is taken from them, so
+their work is not counted as the self time of the phase consuming them.
+Time is measured first without tracemalloc, memory in a separate run,
+because tracing slows everything down.
+
+Usage: python bench/parsing.py [--sizes 1000 5000] [--output FILE]
+The results are printed as JSON (or saved to FILE), a readable summary
+goes to stderr. --baseline takes the JSON of an earlier run and shows how
+much faster or slower each corpus got, --parser can point to the asp3.py
+of an older checkout.
+"""
+import importlib
+import inspect
+import tracemalloc
+import argparse
+import json
+import time
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Parser phases, module functions or _Parser methods of any asp3 version.
+PHASES = ['lex', 'lex_lines', 'clean', 'count_whitespace', 'type', 'typed',
+          'recursive_sort', 'nest', 'nest_stream', 'render']
+
+
+# ------------------------------------------
+# Corpora, each generator returns about `size` lines of code
+# ------------------------------------------
+
+def nesting(size: int) -> list:
+    """ Blocks nested 16 levels deep, over and over again. """
+    lines = ['x = 0']
+    while len(lines) < size:
+        for depth in range(16):
+            lines.append('    ' * depth + f'if x < {depth + 100}:')
+        lines.append('    ' * 16 + 'x = x + 1')
+        lines.append('    ' * 15 + 'else:')
+        lines.append('    ' * 16 + 'x = x - 1')
+    return lines
+
+
+def strings(size: int) -> list:
+    """ Assignments & says of long string literals. """
+    text = 'The quick brown fox jumps over the lazy dog. ' * 8
+    lines = []
+    for i in range(size // 2):
+        lines.append(f's{i % 50} = "{text}{i}"')
+        lines.append(f'say "{text}", s{i % 50}')
+    return lines
+
+
+def comments(size: int) -> list:
+    """ Mostly comments, single & multi line, with some code between. """
+    lines = []
+    while len(lines) < size:
+        lines.append('-- A single line comment explaining the code below it')
+        lines.append('x = 1  -- and a comment after the code')
+        lines.append('/-- A multi line comment')
+        lines.extend('    describing something at length, line by line' for _ in range(5))
+        lines.append('--/')
+    return lines
+
+
+def arrays(size: int) -> list:
+    """ Assignments of array literals with 200 elements each. """
+    numbers = ', '.join(str(n) for n in range(200))
+    mixed = ', '.join(f'"item {n}"' if n % 2 else str(n) for n in range(200))
+    lines = []
+    for i in range(size // 2):
+        lines.append(f'a{i % 50} = [{numbers}]')
+        lines.append(f'b{i % 50} = [{mixed}]')
+    return lines
+
+
+def functions(size: int) -> list:
+    """ Many small functions, each one called once. """
+    lines = []
+    i = 0
+    while len(lines) < size:
+        lines += [f'#function{i}(a, b):',
+                  '    c = a + b * 2',
+                  '    if c > 10:',
+                  '        return c - 10',
+                  '    return c',
+                  f'x{i % 50} = function{i}({i}, 2)']
+        i += 1
+    return lines
+
+
+CORPORA = {
+    'nesting': nesting,
+    'strings': strings,
+    'comments': comments,
+    'arrays': arrays,
+    'functions': functions
+}
+
+
+# ------------------------------------------
+# Measuring
+# ------------------------------------------
+
+class Phases:
+    """ Wraps the phases of the parser module, collecting the time (or
+    the peak memory) of each call. """
+
+    def __init__(self, module):
+        self.module = module
+        self.originals = {}
+        self.stack = []
+        self.reset()
+
+        for name in PHASES:
+            for owner in (module, module._Parser):
+                function = owner.__dict__.get(name)
+                if function is None:
+                    continue
+                self.originals[(owner, name)] = function
+                setattr(owner, name, self.wrap(name, function))
+
+    def reset(self):
+        self.times = {}     # phase -> [calls, total time, self time]
+        self.peaks = {}     # phase -> peak memory above the start of the phase
+        self.peak = 0       # overall peak, tracemalloc's own is reset by every phase
+
+    def enter(self):
+        """ Starts timing a phase, on top of the ones it is called by. """
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            for entry in self.stack:    # The peak is reset below, the outer phases keep theirs
+                entry[2] = max(entry[2], peak)
+            self.peak = max(self.peak, peak)
+            tracemalloc.reset_peak()
+        self.stack.append([time.perf_counter(), 0.0, 0, tracemalloc.get_traced_memory()[0] if tracing else 0])
+
+    def leave(self, name: str, calls: int = 1):
+        """ Stops timing the phase on the top of the stack. """
+        start, children, peak, base = self.stack.pop()
+        elapsed = time.perf_counter() - start
+        stats = self.times.setdefault(name, [0, 0.0, 0.0])
+        stats[0] += calls
+        stats[1] += elapsed
+        stats[2] += elapsed - children
+        if self.stack:
+            self.stack[-1][1] += elapsed
+        if tracemalloc.is_tracing():
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            self.peaks[name] = max(self.peaks.get(name, 0), peak - base)
+            for entry in self.stack:
+                entry[2] = max(entry[2], peak)
+
+    def wrap(self, name: str, function):
+        # Static & class methods are unwrapped and wrapped again
+        kind = type(function) if isinstance(function, (staticmethod, classmethod)) else None
+        inner = function.__func__ if kind else function
+
+        def timed(*args, **kw):
+            self.enter()
+            try:
+                return inner(*args, **kw)
+            finally:
+                self.leave(name)
+
+        def stepped(*args, **kw):
+            # A generator does its work whenever the next item is taken,
+            # inside of whatever phase takes it, so every step is timed
+            # as a part of the generator's phase instead.
+            generator = inner(*args, **kw)
+            calls = 1
+            while True:
+                self.enter()
+                try:
+                    item = next(generator)
+                except StopIteration:
+                    return
+                finally:
+                    self.leave(name, calls)
+                    calls = 0
+                yield item
+
+        wrapper = stepped if inspect.isgeneratorfunction(inner) else timed
+        return kind(wrapper) if kind else wrapper
+
+    def restore(self):
+        for (owner, name), function in self.originals.items():
+            setattr(owner, name, function)
+
+
+def measure(module, phases: Phases, lines: list, repeat: int) -> dict:
+    """ Parses the lines `repeat` times for the timing, the best run is
+    taken, and once more with tracemalloc for the memory. """
+    best = None
+    for _ in range(repeat):
+        phases.reset()
+        start = time.perf_counter()
+        module.parse(lines, assignment_kw='params')
+        total = time.perf_counter() - start
+        if best is None or total < best[0]:
+            best = (total, phases.times)
+
+    phases.reset()
+    tracemalloc.start()
+    try:
+        module.parse(lines, assignment_kw='params')
+        peak = max(phases.peak, tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+
+    total, times = best
+    return {
+        'seconds': total,
+        'lines_per_second': len(lines) / total,
+        'peak_memory': peak,
+        'phases': {
+            name: {'calls': calls, 'seconds': seconds, 'self_seconds': self_seconds,
+                   'peak_memory': phases.peaks.get(name, 0)}
+            for name, (calls, seconds, self_seconds) in times.items()
+        }
+    }
+
+
+def load_parser(path: str):
+    """ Imports asp.asp3 from the checkout the given asp3.py is in. """
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(path))))
+    return importlib.import_module('asp.asp3')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000], help='Lines of every corpus')
+    parser.add_argument('--corpora', nargs='+', choices=list(CORPORA), default=list(CORPORA))
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs, the best is taken')
+    parser.add_argument('--parser', default=os.path.join(ROOT, 'asp', 'asp3.py'), help='asp3.py of the measured checkout')
+    parser.add_argument('--output', help='Saves the JSON results to this file instead of printing them')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare with')
+    args = parser.parse_args()
+
+    module = load_parser(args.parser)
+    phases = Phases(module)
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {(r['corpus'], r['size']): r for r in json.load(f)['results']}
+
+    results = []
+    for name in args.corpora:
+        for size in args.sizes:
+            lines = [line + '\n' for line in CORPORA[name](size)]
+            result = {'corpus': name, 'size': size, 'lines': len(lines)}
+            try:
+                result.update(measure(module, phases, lines, args.repeat))
+            except (SyntaxError, RecursionError, module.apt.ParserError) as E:
+                result['error'] = f'{E.__class__.__name__}: {E}'
+                print(f'{name:>10} {size:>7}: {result["error"]}', file=sys.stderr)
+                continue
+            finally:
+                results.append(result)
+
+            summary = ', '.join(f'{phase} {p["self_seconds"]:.3f}s/{p["peak_memory"] / 1024:,.0f} KiB'
+                                for phase, p in result['phases'].items())
+            line = (f'{name:>10} {size:>7}: {result["seconds"]:.3f}s, {result["lines_per_second"]:>10,.0f} lines/sec, '
+                    f'peak {result["peak_memory"] / 1024:>9,.0f} KiB  [{summary}]')
+            old = baseline.get((name, size))
+            if old and 'seconds' in old:
+                line += f'  {old["seconds"] / result["seconds"]:.2f}x the speed of the baseline'
+            print(line, file=sys.stderr)
+    phases.restore()
+
+    report = {
+        'parser': module.__version__,
+        'python': sys.version.split()[0],
+        'repeat': args.repeat,
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+        print()
+
+
+if __name__ == '__main__':
+    main()
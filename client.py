@@ -0,0 +1,56 @@
+''' ASX Server Client '''
+# Sends scripts to an interpreter started with `interpreter.py --serve SOCKET`,
+# so running many small scripts doesn't pay the Python start-up for each one.
+
+__version__ = '0.1'
+
+import argparse
+import socket
+import json
+import sys
+import os
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('asx', nargs='+', help='Names of the files')
+    parser.add_argument('-s', '--socket', default=os.environ.get('ASX_SOCKET'), help="Socket of the server, $ASX_SOCKET by default")
+    parser.add_argument('-o', '--ignoreErrors', action='store_true', help="Ignores Program Errors")
+    args = parser.parse_args(argv)
+
+    if not args.socket:
+        parser.error('no server socket given, use --socket or $ASX_SOCKET')
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(args.socket)
+    except OSError as OE:
+        print(f'[ServerError] | Cannot connect to {args.socket} -> {OE}')
+        return 2
+
+    responses = client.makefile('r', encoding='utf8')
+    exit_status = 0
+    for script in args.asx:
+        request = {'path': os.path.abspath(script), 'cwd': os.getcwd(), 'ignoreErrors': args.ignoreErrors}
+        client.sendall((json.dumps(request) + '\n').encode('utf8'))
+
+        # Printing the output until the status of the script arrives
+        for line in responses:
+            message = json.loads(line)
+            if 'out' in message:
+                sys.stdout.write(message['out'])
+                sys.stdout.flush()
+            elif 'status' in message:
+                exit_status = max(exit_status, message['status'])
+                break
+        else:
+            print('[ServerError] | Connection closed by the server')
+            client.close()
+            return 2
+
+    client.close()
+    return exit_status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,97 +1,130 @@
 ''' ASX Interpreting / Execution '''
 
 __author__ = 'Lotus'
-__version__ = '0.1.6'
+__version__ = '0.3.10'
 
 try:
     # Core Imports
     import asp.asp3 as asp          # Parser import
+    import asp.apc as apc           # Parse cache
+    import asc                      # Compiler import
+    from profiler import Profiler   # --profile
+    from asc import operators       # Expression operators
+    from asc.opcodes import *       # Instruction set
     from time import sleep          # Pausing the program
     import sys                      # PATH
     import argparse                 # argument parsing
     from astropy.errors import *    # Error Handling
+    from astropy.arrays import NumArray     # Arrays of numbers
+    from astropy.models import Map          # Map keys
+    from array import array
+    import json                     # Mixin index & server messages
+    import socketserver             # Server mode
+    import threading                # Mixin loading lock
+    import importlib.util           # Mixin modules
     import os
 except ImportError as ImportErr:
-    error_out(f'Critical Import Error -> {ImportErr}')
-
-
-# --------------------------------------- 
-# Argument parsing
-# ---------------------------------------
-
-parser = argparse.ArgumentParser() # Initializing the ArgumentParser
-
-# Adding arguments
-parser.add_argument('asx', help='Name of the file')
-parser.add_argument('-o', '--ignoreErrors', action='store_true', help="Ignores Program Errors")
-
-args = parser.parse_args()
-
-script_name = args.asx
-if args.ignoreErrors: 
-    ignore_errors: bool = True
-else: 
-    ignore_errors: bool = False
+    raise SystemExit(f'Critical Import Error -> {ImportErr}')
 
 
 # --------------------------------------- 
 # Mixin importing & building
 # ---------------------------------------
 
-def load_mixins():
-    # This is put into a function to keep variables
-    # local so they don't trash the global scope. 
-    
-    # Loading the mixins
-    files = os.listdir('mixins')
-    m_modules = []
-    for mixin in files:
-        if mixin.startswith('__'):
-            continue
-        m_ = __import__(f'mixins.{mixin[:-3]}', globals(), locals(), [mixin[:-3]])
-        m_modules.append(m_)
-
-    # Building the mixins
-    mixins = {}
-    for m in m_modules:
+class Mixins:   # Lazy mixin loading, the mixin modules are only imported when a @mixin needs them
+    INDEX_FILE = os.path.join('__asxcache__', 'mixins.json')    # Mixin name -> module name, next to the mixins
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index = None   # Read on the first @mixin, so scripts without mixins never touch the mixins folder
+        self.loaded = {}    # Mixin name -> Mixin object
+        self.built = set()  # Names of the already built modules
+        self.lock = threading.Lock()    # Shared by all interpreters, the modules are only built by one thread
+
+    def get(self, mixin_name: str):
+        mixin = self.loaded.get(mixin_name)
+        if mixin is None:
+            with self.lock:
+                if self.index is None:
+                    self.index = self.read_index()
+                module = self.index.get(mixin_name)
+                if module is not None and module not in self.built:
+                    self.build(module)
+                mixin = self.loaded.get(mixin_name)
+        return mixin
+
+    def load_all(self):     # Builds every mixin module right away, used before forking worker processes
+        with self.lock:
+            if self.index is None:
+                self.index = self.read_index()
+            for module in set(self.index.values()) - self.built:
+                self.build(module)
+
+    def build(self, module: str):   # Executing the module from the mixins folder & registering all of its mixins
+        # Loaded from the file every time, so a module changed since the last build is not taken from sys.modules
+        spec = importlib.util.spec_from_file_location(f'mixins.{module}', os.path.join(self.path, f'{module}.py'))
+        m_ = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(m_)
         try:
-            funcs = m.__build__()
+            funcs = m_.__build__()
             if not isinstance(funcs, list):
                 raise ReferenceError('__build__ function must return a list of Mixin objects')
         except AttributeError:
             # __build__ function not found
             raise ReferenceError('__build__ function was not found in mixin')
-        
+
+        self.built.add(module)
         for func in funcs:
-            mixins[func.name] = func
-        
-    return mixins
-
-mixins = load_mixins()
-mixin_names = [str(y) for x, y in enumerate(mixins)]
-
-# Error Output Function
-def error_out(error_message: str, ErrorType: str = 'ERROR'): 
-    if not ignore_errors:
-        print(f'[{ErrorType}] | {error_message}')
-        exit()
-    else: 
-        print(f'[{ErrorType}] | {error_message}')
-
-# AMM - Astro Memory Management
-variable_storage = {}                   # Global Scope  |   Variable Names & Values         | Main Storage
-function_variable_storage = {}          # Local Scope   |   Function Var Storage            | Main Storage ### TODO MERGE with function function_parameter_val_storage
-function_storage = {}                   # Global-Local  |   Function Content                | Sub-Storage
-function_parameter_storage = {}         # Global-Local  |   Parameter Names                 | Sub-Storage
-
-def _get_parse(src_file: str):  # Getting Parsed Code (ASP Module)
-    try: 
-        with open(src_file, 'r') as file:
-            code = asp.parse(file, assignment_kw='params')
-            return code
-    except FileNotFoundError as FNF: 
-        error_out(FNF)
-        
+            self.loaded[func.name] = func
+        return funcs
+
+    def key(self):  # Name, modification time & size of every mixin module, the index is rebuilt if any of them changes
+        key = []
+        for entry in os.scandir(self.path):
+            if entry.name.startswith('__') or not entry.name.endswith('.py'):
+                continue
+            stat = entry.stat()
+            key.append([entry.name, stat.st_mtime_ns, stat.st_size])
+        return sorted(key)
+
+    def read_index(self):
+        key = self.key()
+        index_path = os.path.join(self.path, self.INDEX_FILE)
+        try:
+            with open(index_path, 'r') as f:
+                cached = json.load(f)
+            if cached['key'] == key:
+                return cached['mixins']
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+        # The index is missing or outdated, all of the modules are built to create it again
+        index = {}
+        for name, _, _ in key:
+            for func in self.build(name[:-3]):
+                index[func.name] = name[:-3]
+        try:
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+            temp = f'{index_path}.{os.getpid()}.{threading.get_ident()}.tmp'   # Unique for every thread of the server
+            with open(temp, 'w') as f:
+                json.dump({'key': key, 'mixins': index}, f)
+            os.replace(temp, index_path)
+        except OSError:
+            pass    # The index is only an optimization
+        return index
+
+mixins = Mixins(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mixins'))      # Shared by all interpreters, stays loaded
+lib_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lib')     # Standard Library Location
+
+
+CONTINUE = ('continue', None)    # Returned by every streamed chunk of code without a return statement
+
+
+class ScriptError(Exception):   # Raised by error_out() to stop the script, unless errors are ignored
+    def __init__(self, error_message: str, ErrorType: str):
+        super().__init__(f'[{ErrorType}] | {error_message}')
+        self.error_message = error_message
+        self.ErrorType = ErrorType
 
 
 class Dev:
@@ -107,197 +140,209 @@ class Dev:
         print(f'Memory: {mem_type}')
 
 
-dev = Dev()     # Dev Tool Instance Initialization
+class Output:   # Buffered writer for say statements & error messages, one write() call on the stream per buffer
+    BUFFER_SIZE = 65536     # Default buffer size in characters, when the output is not a terminal
+
+    def __init__(self, stream=None, buffer_size: int = None):
+        self.stream = stream    # sys.stdout if None, looked up on every flush so redirecting stdout still works
+        if buffer_size is None:
+            # Terminals get every line right away, files & pipes get the big buffer
+            isatty = getattr(stream or sys.stdout, 'isatty', None)
+            buffer_size = 0 if isatty and isatty() else self.BUFFER_SIZE
+        self.buffer_size = buffer_size
+        self.parts = []
+        self.size = 0
+
+    def write(self, text: str):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.parts:
+            stream = self.stream or sys.stdout
+            stream.write(''.join(self.parts))
+            stream.flush()
+            self.parts.clear()
+            self.size = 0
 
-class Memory: 
+
+class Memory:     # AMM - Astro Memory Management, every interpreter owns its memory
     def __init__(self): 
-        pass
+        self.variable_storage = {}              # Global Scope  |   Variable Names & Values         | Main Storage
+        self.function_storage = {}              # Global-Local  |   Function Content                | Sub-Storage
+        self.function_parameter_storage = {}    # Global-Local  |   Parameter Names                 | Sub-Storage
+        self.module_storage = {}                # Global        |   Imported Library Code           | Sub-Storage
 
     def count_parameters(self, function_name: str): # Parameter Inconsistency Fix
         pass
 
     def store_variable(self, variable: str, value): # AMM | Storing Variables in Var Storage
-        variable_storage[variable] = value
+        self.variable_storage[variable] = value
 
     def store_function_content(self, function: str, content): # AMM | Storing Function Content in Func Storage
-        function_storage[function] = content
+        self.function_storage[function] = content
 
     def store_function_parameter(self, function: str, parameters: list): # AMM | Storing Func Param Names in Func Param Storage
-        function_parameter_storage[function] = parameters
+        self.function_parameter_storage[function] = parameters
 
-    def store_func_variable(self, function_name: str, variable: str, value: str):   # AMM | Storing Func Vars in Func Var Storage  
-        try:
-            function_variable_storage[function_name].update({variable: value})
-        except KeyError:
-            function_variable_storage[function_name] = {variable: value}
+    def store_module(self, lib_name: str, code): # AMM | Storing Compiled Library Code in Module Storage
+        self.module_storage[lib_name] = code
 
-    def assign_parameter_mem(self, values, params, name):   # AMM | Storing Func Param Vals in FuncParamVal Storage
-        args = {}
-        for value, param in zip(values, params):
-            args[param] = value             
 
-        function_variable_storage[name] = args
+class Frame:    # AMM | Local Scope of a single function call
+    __slots__ = ('code', 'fast')
 
+    def __init__(self, code, values: list):
+        self.code = code
+        # One slot per local variable (See asc varnames), parameters first, None if not assigned
+        params = min(len(values), len(code.params))
+        self.fast = values[:params] + [None] * (len(code.varnames) - params)
 
-class Math:
-    def __init__(self): 
-        pass
+    def scope(self):    # Local variables as a dict, for mixins
+        return {name: value for name, value in zip(self.code.varnames, self.fast) if value is not None}
 
-    def prioritise(self):
-        pass
+    def update(self, scope: dict):  # Writing mixin results back into the slots, only the returned variables change
+        for name, value in scope.items():
+            slot = self.code.local(name)
+            if slot is not None:
+                self.fast[slot] = value
 
 
 class Interpreter:
-    def __init__(self, memory, dev, src_path):
-        self.dev = dev
-        self.memory = memory
-        self.content = _get_parse(src_path)
-        
-    def _exec_function(self, func_name: str):   # executes function | used @ interpret method
-            self.interpret(source=function_storage[func_name], in_function=True, function_name=func_name)
-
-    def call_out(self, out, type_str: str, statement: dict, variable_name: str):   # say statement execution function
-        if type_str == 'array':
-            out = out[1]
-            print('[', end='')
-            item_count = 0
-            for item in out:
-                if item[0] == 'str':
-                    if item_count == len(out)-1:
-                        print(f'"{item[1]}"', end='')
-                    else:
-                        print(f'"{item[1]}",', end=' ')
-                else:
-                    if item_count == len(out)-1:
-                        print(f'{item[1]}', end='')
-                    else:
-                        print(f'{item[1]},', end=' ')
-                    
-                item_count += 1
-            print(']')
-        elif type_str == 'elm':
-            try:
-                print(out[1][statement['params'][0][1]['element']][1])
-            except IndexError:
-                error_out(f'Index given in variable "{variable_name}" is out of range', index_error)
-        else:
-            try:
-                print(out[1])
-            except TypeError:
-                pass
+    # Every instance has its own memory, so any number of them can run (also in different threads) in one process
+    def __init__(self, ignore_errors: bool = False, use_cache: bool = True, out=None, buffer_size: int = None,
+                 profiler: Profiler = None):
+        self.ignore_errors = ignore_errors
+        self.use_cache = use_cache  # Parsed code from __asxcache__
+        self.out = out              # Output stream, sys.stdout if None
+        self.output = Output(out, buffer_size)  # Buffer size in characters, 0 writes every line right away
+        self.dev = Dev()            # Dev Tools
+        self.profiler = profiler    # Times every line, function & mixin if set
+        self.memory = Memory()      # AMM | Memory Handling
+
+    def error_out(self, error_message: str, ErrorType: str = 'ERROR'):    # Error Output Function
+        self.output.write(f'[{ErrorType}] | {error_message}\n')
+        if not self.ignore_errors:
+            self.output.flush()
+            raise ScriptError(error_message, ErrorType)
+
+    def flush(self):    # Writes out the buffered output
+        self.output.flush()
+
+    def run(self, source: str):    # Main Method - Runs the source code, returns the value of a top level return
+        try:
+            return self.interpret(self.parse(source), filename='<string>')
+        finally:
+            self.output.flush()
 
-    def _exec_wait(self, time): # wait statement execution function
-        sleep(time)
+    def run_file(self, src_file: str):
+        try:
+            return self.interpret(self.parse_file(src_file), filename=src_file)
+        finally:
+            self.output.flush()
 
-    def assign_variable(self, statement: dict, inside_function: bool, func_name: str, elm_spec: bool = False): # Variable AMM Snippet used @ Interpret Method
-        if inside_function:
-            variable_name = statement["var"]
-            print(variable_name, ' <- var name')
-            if elm_spec:
-                variable_spec = statement['params'][1]['var']
-                _location = statement['params'][1]['element']
-                try:
-                    variable_value = function_variable_storage[func_name][variable_spec][1][_location]
-                except Exception as e:
-                    error_out(f'Variable "{variable_name}" is not defined', undef_var)
-                    try:
-                        variable_value = variable_storage[variable_spec][1][_location]
-                    except Exception as ex:
-                        error_out(f'Variable "{variable_name}" is not defined', undef_var)
+    def run_stream(self, src_file: str):  # Executes every top level statement as soon as it's parsed, for huge scripts
+        # No parse cache here, the cached code is always complete. A syntax error
+        # further down only shows up after the statements above it have run.
+        try:
+            with open(src_file, 'r') as file:
+                for chunk in self.chunks(asp.parse_stream(file, assignment_kw='params')):
+                    code = self.compile(chunk, filename=src_file)
+                    code.emit(LOAD_CONST, code.add_const(CONTINUE))
+                    code.emit(RETURN_VALUE)
+                    value = self.run_code(code)
+                    if value is not CONTINUE:
+                        return value    # Top level return
+            return asc.NULL
+        except FileNotFoundError as FNF:
+            self.error_out(FNF, file_error)
+        except SyntaxError as SE:
+            self.error_out(SE, syntax_error)
+        finally:
+            self.output.flush()
+
+    @staticmethod
+    def chunks(statements):    # Groups the streamed statements, an if is compiled together with its elif & else blocks
+        next(statements)    # Header
+        chain = []
+        for statement in statements:
+            if chain and statement['type'] in ('elif', 'else'):
+                chain.append(statement)
+                if statement['type'] == 'else':
+                    yield chain
+                    chain = []
+                continue
+            if chain:
+                yield chain
+                chain = []
+            if statement['type'] == 'if':
+                chain = [statement]
             else:
-                variable_value = statement['params']
-            print(variable_value, ' <- var val')
-            self.memory.store_func_variable(
-                                            function_name=func_name,
-                                            variable=variable_name,
-                                            value=variable_value
-                                           )
-        else:
-            variable_name = statement['var']
+                yield [statement]
+        if chain:
+            yield chain
 
-            if elm_spec:
-                variable_spec = statement['params'][1]['var']
-                _location = statement['params'][1]['element']
-                try:
-                    variable_value = variable_storage[variable_spec][1][_location]
-                except Exception:
-                    error_out(f'Variable "{variable_name}" is not defined', undef_var)
-            else:
-                variable_value = statement['params']
-                            
-            self.memory.store_variable(variable=variable_name, value=variable_value)
-
-    def assign_function(self, statement: dict, func_name: str):
-        function_name = statement['name']
-        function_content = statement['code']
-        self.memory.store_function_content(function=function_name, content=function_content)
-
-        parameters = statement['parameters']
-        self.memory.store_function_parameter(function=function_name, parameters=parameters)
-
-    def call_function(self, statement: dict, function_name: str):
-        function_name = statement['name']
-        param_vals = statement['params']
-
-        try: 
-            self.memory.assign_parameter_mem(
-                                         values=param_vals,
-                                         params=function_parameter_storage[function_name],
-                                         name=function_name
-                                        )
-        except KeyError: 
-            error_out(f'Function "{function_name}" not defined', undef_function)
+    def parse(self, source: str):  # Getting Parsed Code (ASP Module)
         try:
-            self._exec_function(func_name=function_name)
-        except KeyError: 
-            pass
+            return asp.parse(source.splitlines(True), assignment_kw='params')
+        except SyntaxError as SE:
+            self.error_out(SE, syntax_error)
+            return []
 
-    def call_statement(self, statement: dict, inside_function: bool, func_name: str): # base statement execution
-        parameter_type = statement['params'][0][0]  # Parameter Type Handle ('var', 'str', ...)
-        parameter_name = statement['params'][0][1]  # Parameter Name Handle                          
-        
-        if parameter_type == 'elm':
+    def parse_file(self, src_file: str):
+        try:
+            if self.use_cache:
+                return apc.load(src_file, assignment_kw='params')     # Parsed code from __asxcache__
+            with open(src_file, 'r') as file:
+                return asp.parse(file, assignment_kw='params')
+        except FileNotFoundError as FNF:
+            self.error_out(FNF, file_error)
+        except SyntaxError as SE:
+            self.error_out(SE, syntax_error)
+        return []
+
+    def compile(self, source, prefix: str = '', filename: str = '<string>'):  # Compiling the parsed code into instructions (ASC Module)
+        try:
+            return asc.compile_code(source, assignment_kw='params', prefix=prefix, filename=filename,
+                                    profile=self.profiler is not None)
+        except asc.CompileError as CE:
+            self.error_out(CE, syntax_error)
+            return asc.Code('<error>')
 
-            parameter_name = statement['params'][0][1]['var']
-        
-        if inside_function:
-            if parameter_type == 'var' or parameter_type == 'elm':                                                 #-----------------INSIDE-FUNC-----------------
-                try:                                                                    #-----------------INSIDE-FUNC----------------- 
-                    val = function_variable_storage[func_name][parameter_name]      # Trying to get local scope func storage (2. prior)
-                except KeyError:
-                    try: 
-                        val = variable_storage[parameter_name]                      # Trying to get global scope variable storage (3. prior)
-                    except KeyError:
-                        error_out(f'Variable "{parameter_name}" undefined', undef_var)
-            else: 
-                val = statement['params'][0]                                   # Trying to get non-AMM implemented parameter (Last prior)
-        else:
-            if parameter_type == 'var':                                                #----------------OUTSIDE-FUNC----------------
-                try:                                                                    #----------------OUTSIDE-FUNC----------------
-                    val = variable_storage[parameter_name]                              # Trying to get variable storage (First prior)
-                except KeyError:
-                    error_out(f'Variable "{parameter_name}" undefined', undef_var) 
-            elif parameter_type == 'elm':
-                try:
-                    val = variable_storage[parameter_name]
-                except KeyError:
-                    error_out(f'Variable "{parameter_name} undefined', undef_var)
-            else: 
-                val = statement['params'][0]                                      # Trying to get non-AMM implemented parameter (Last prior)                                       
-        
+    def call_out(self, values: list):   # say statement execution function
+        self.output.write(' '.join([self.format_value(value) for value in values]) + '\n')
+
+    def format_value(self, value, nested: bool = False):  # Turning a value into its printed form
+        type_str = value[0]
+        if type_str == 'array':
+            if isinstance(value[1], NumArray) and value[1].numeric:
+                return '[' + ', '.join(map(str, value[1].data)) + ']'
+            return '[' + ', '.join([self.format_value(item, nested=True) for item in value[1]]) + ']'
+        elif type_str == 'map':
+            return '{' + ', '.join([f'{self.format_value(key, nested=True)}: {self.format_value(item, nested=True)}'
+                                    for key, item in value[1].items()]) + '}'
+        elif type_str == 'str' and nested:
+            return f'"{value[1]}"'
+        elif type_str == 'null':
+            return 'null'
+        return str(value[1])
+
+    def _exec_wait(self, time): # wait statement execution function
+        self.output.flush()     # Everything said before waiting is shown
+        sleep(time)
+
+    def _exec_delete(self, variable: str, storage: dict):
         try:
-            if parameter_type == 'elm': 
-                return ['elm', val[1], parameter_name]                  # Returning, Now, Handled Parameter
-            else:
-                return val                                                                
-        except UnboundLocalError: 
-            pass
+            del storage[variable]
+        except KeyError:
+            self.error_out(f'Variable "{variable}" undefined', undef_var)
 
-    def check_import(self, statement: dict):
-        import_name = statement['name']
-        if f'{import_name}.asx' in os.listdir('lib'): 
-            return 'STD' # Standard Lib 
-        elif f'{import_name}.asx' in os.getcwd():
+    def check_import(self, import_name: str):
+        if os.path.isfile(os.path.join(lib_path, f'{import_name}.asx')):
+            return 'STD' # Standard Lib
+        elif os.path.isfile(f'{import_name}.asx'):
             return 'USER' # Custom Lib
         else:
             return 'INVALID' # Lib Not Found
@@ -305,77 +350,411 @@ class Interpreter:
     def call_import(self, lib_name: str, std_check: str):
         # Calling the import
         if std_check == 'STD':
-            with open(f'lib\\{lib_name}.asx', 'r') as f:
-                lib_content = _get_parse(f'lib\\{lib_name}.asx')
-                print(lib_content)
-            self.interpret(source=lib_content, in_function=False)
+            lib_file = os.path.join(lib_path, f'{lib_name}.asx')
+        elif std_check == 'USER':
+            lib_file = f'{lib_name}.asx'
+        else:
+            self.error_out(f'Library "{lib_name}" not found', file_error)
+            return
+        lib_code = self.compile(self.parse_file(lib_file), prefix=f'{lib_name}.', filename=lib_file)
+        self.memory.store_module(lib_name=lib_name, code=lib_code)     # AMM | Stored before executing, so circular imports stop here
+        self.run_code(lib_code)
+
+    def call_mixin(self, mixin_name: str, scope: dict):
+        mixin = mixins.get(mixin_name)
+        if mixin is None:
+            self.error_out(f'Mixin "{mixin_name}" not defined', undef_function)
+            return scope
+        try:
+            if self.profiler is not None:
+                return self.profiler.mixin(mixin, scope)
+            return mixin.execute(scope)
+        except RuntimeError as RE:
+            ErrorType, _, message = str(RE).partition('::')
+            self.error_out(message, ErrorType)
+            return scope
+
+    def operate(self, operator, op: str, a, b):  # Operators on anything else than two numbers
+        try:
+            return operator(op, a, b)
+        except operators.OperatorError as e:
+            self.error_out(e.message, e.kind)
+            return asc.NULL
+
+    def interpret(self, source, filename: str = '<string>'):    # Compiles the parsed code and executes it
+        return self.run_code(self.compile(source, filename=filename))
+
+    def run_code(self, code):   # Executes module code, timed as a call of <module> when profiling
+        if self.profiler is not None:
+            return self.profiler.function(self.execute, code)
+        return self.execute(code)
+
+    # VM Loop - Executes compiled code, uses a lot of functions from above this line ^^^^
+    def execute(self, code, frame: Frame = None):
+        ops = code.ops
+        consts = code.consts
+        names = code.names
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        compare = operators.COMPARE_FUNCTIONS
+        TRUE, FALSE = operators.TRUE, operators.FALSE
+        error_out = self.error_out
+        profiler = self.profiler
+
+        # AMM | Storages of this interpreter
+        variable_storage = self.memory.variable_storage
+        function_storage = self.memory.function_storage
+        module_storage = self.memory.module_storage
+
+        # AMM | Function code keeps its local variables in the slots of its frame, module code only has globals
+        fast = frame.fast if frame else None
+
+        pc = 0
+        end = len(ops)
+        while pc < end:
+            opcode = ops[pc]
+            arg = ops[pc + 1]
+            pc += 2
+
+            if opcode == LOAD_FAST:
+                value = fast[arg]
+                if value is None:
+                    # Not assigned yet, falling back to the global variable
+                    value = variable_storage.get(code.varnames[arg])
+                    if value is None:
+                        error_out(f'Variable "{code.varnames[arg]}" undefined', undef_var)
+                        value = asc.NULL
+                push(value)
+
+            elif opcode == STORE_FAST:
+                fast[arg] = pop()
+
+            elif opcode == LOAD_CONST:
+                push(consts[arg])
+
+            elif opcode == LOAD_NAME:
+                value = variable_storage.get(names[arg])
+                if value is None:
+                    error_out(f'Variable "{names[arg]}" undefined', undef_var)
+                    value = asc.NULL
+                push(value)
+
+            elif opcode == STORE_NAME:
+                variable_storage[names[arg]] = pop()   # AMM | Storing Variables
+
+            elif opcode == JUMP_IF_FALSE:
+                if not pop()[1]:    # False, 0, empty strings & arrays and null
+                    pc = arg
+
+            elif opcode == JUMP_IF_TRUE:
+                if pop()[1]:
+                    pc = arg
+
+            elif opcode == JUMP:
+                pc = arg
+
+            elif opcode == BINARY_ADD:
+                b = pop()
+                a = pop()
+                if a[0] == 'num' and b[0] == 'num':    # Numbers are computed right here, everything else goes through operators
+                    push(('num', a[1] + b[1]))
+                else:
+                    push(self.operate(operators.binary, 'ADD', a, b))
 
-    def _exec_delete(self, variable: str): 
-        pass
+            elif opcode == BINARY_SUB:
+                b = pop()
+                a = pop()
+                if a[0] == 'num' and b[0] == 'num':
+                    push(('num', a[1] - b[1]))
+                else:
+                    push(self.operate(operators.binary, 'SUB', a, b))
 
-    def call_if(self, statement: dict):     ### TODO Finish If-Statement Checking Function, return True / False
-        pass
+            elif opcode == BINARY_MUL:
+                b = pop()
+                a = pop()
+                if a[0] == 'num' and b[0] == 'num':
+                    push(('num', a[1] * b[1]))
+                else:
+                    push(self.operate(operators.binary, 'MUL', a, b))
+
+            elif opcode == BINARY_DIV:
+                b = pop()
+                a = pop()
+                if a[0] == 'num' and b[0] == 'num' and b[1]:
+                    push(('num', a[1] / b[1]))
+                else:
+                    push(self.operate(operators.binary, 'DIV', a, b))
+
+            elif opcode == COMPARE_OP:
+                b = pop()
+                a = pop()
+                if a[0] == 'num' and b[0] == 'num':
+                    push(TRUE if compare[arg](a[1], b[1]) else FALSE)
+                else:
+                    push(self.operate(operators.compare, operators.COMPARISONS[arg], a, b))
 
-    # Main Method - Uses a lot of function from above this line ^^^^
-    def interpret(self, source, in_function: bool, function_name: str = ''): 
-        # main interpreting loop
-        for statement in source:
-            # print('Statement: ', statement)
-            ### AMM | Variable Storage ###
-            if statement['type'] == 'assignment':
+            elif opcode == UNARY_NEG:
+                a = pop()
+                if a[0] == 'num':
+                    push(('num', -a[1]))
+                else:
+                    try:
+                        push(operators.negative(a))
+                    except operators.OperatorError as e:
+                        error_out(e.message, e.kind)
+                        push(asc.NULL)
+
+            elif opcode == CALL:
+                function, argc = consts[arg]
+                if argc:
+                    values = stack[-argc:]
+                    del stack[-argc:]
+                else:
+                    values = []
+                func_code = function_storage.get(function)
+                if func_code is None:
+                    error_out(f'Function "{function}" not defined', undef_function)
+                    push(asc.NULL)
+                    continue
                 try:
-                    if statement['params'][0] == 'elm':
-                        self.assign_variable(statement=statement, inside_function=in_function, func_name=function_name, elm_spec=True) # AMM | Storing Variables
+                    if profiler is None:
+                        push(self.execute(func_code, Frame(func_code, values)))
                     else:
-                        self.assign_variable(statement=statement, inside_function=in_function, func_name=function_name) # AMM | Storing Variables
-                except KeyError as E:
-                    print(E)
-                except IndexError as E: 
-                    print(E)
-
-            ### AMM | Function Content & Parameter Name Storage ### 
-            elif statement['type'] == 'function': 
-                self.assign_function(statement=statement, func_name=function_name)  # AMM | Storing Function Params Names & Content
-
-            ### AMM | Function Calling ###
-            elif statement['type'] == 'call':
-                self.call_function(statement=statement, function_name=function_name) # AMM | Calling Storage And Executing Function
-
-            ### Statement Execution ###
-            elif statement['type'] == 'statement':
-                ### Say Statement ###
-                if statement['name'] == 'out' or statement['name'] == 'say':
-                    out = self.call_statement(statement=statement, inside_function=in_function, func_name=function_name)    # AMM | Param Handling
-                    type_str = out[0]
+                        push(profiler.function(self.execute, func_code, Frame(func_code, values)))
+                except RecursionError:  # Every astro call is a python call of execute(), too deep runs out of the python stack
+                    error_out(f'Maximum recursion depth exceeded in "{function}"', recursion_error)
+                    push(asc.NULL)
+
+            elif opcode == POP_TOP:
+                pop()
+
+            elif opcode == LOAD_INDEX:
+                value = pop()
+                type_ = value[0]
+                if type_ == 'array':
+                    try:
+                        push(value[1][arg])
+                    except IndexError:
+                        error_out(f'Index {arg} is out of range', index_error)
+                        push(asc.NULL)
+                elif type_ == 'str':    # A character is a string too
                     try:
-                        self.call_out(out=out, type_str=type_str, statement=statement, variable_name=out[2])     # Executing Statement with handled parameter/s
-                    except IndexError: 
-                        self.call_out(out=out, type_str=type_str, statement=statement, variable_name='')     # Executing Statement with handled parameter/s
-                ### Wait Statement ###
-                elif statement['name'] == 'pause':
-                    sec = self.call_statement(statement=statement, inside_function=in_function, func_name=function_name)[1]    # AMM | Param Handling
-                    self._exec_wait(time=sec)   # Executing Statement with handled parameter/s
-                ### Delete Statement ###
-                elif statement['name'] == 'delete':
-                    var = self.call_statement(statement=statement, inside_function=in_function, func_name=function_name)[1]
-                    self._exec_delete(variable=var)
-            elif statement['type'] == 'import':
-                in_mixin = self.check_import(statement=statement) # Checking if imported libary is in STD or User lib
-                self.call_import(std_check=in_mixin, lib_name=statement['name'])
-            elif statement['type'] == 'mixin': 
-                mixin_name = statement['name']
-                function_variable_storage[function_name] = mixins[mixin_name](function_variable_storage[function_name])
-
-
-mem = Memory()  # Memory Instance Initialization
-Interpreter = Interpreter(
-                            dev=dev,                # Dev Tools 
-                            memory=mem,             # AMM | Memory Handling
-                            src_path=script_name    # _PATH_
-                        )
-
-math = Math()
-
-Interpreter.interpret(source=Interpreter.content, in_function=False) # Main Interpreting Method
-print('\n\n\nVariable Storage: ', variable_storage)
- 
+                        push(('str', value[1][arg]))
+                    except IndexError:
+                        error_out(f'Index {arg} is out of range', index_error)
+                        push(asc.NULL)
+                elif type_ == 'map':    # Maps are indexed by their number keys, m[1] is the value of the key 1
+                    item = value[1].get(('num', arg))
+                    if item is None:
+                        error_out(f'Key {arg} not found', index_error)
+                        item = asc.NULL
+                    push(item)
+                else:
+                    error_out(f'Type "{type_}" cannot be indexed', index_error)
+                    push(asc.NULL)
+
+            elif opcode == BUILD_ARRAY:
+                if arg:
+                    elements = stack[-arg:]
+                    del stack[-arg:]
+                else:
+                    elements = []
+                push(('array', elements))
+
+            elif opcode == BUILD_NUMBERS:
+                push(('array', NumArray(array('d', consts[arg]))))
+
+            elif opcode == BUILD_MAP:
+                items = {}
+                if arg:
+                    pairs = stack[-2 * arg:]
+                    del stack[-2 * arg:]
+                    for i in range(0, 2 * arg, 2):
+                        key = pairs[i]
+                        if key[0] in Map.KEY_TYPES:    # AMM | Keys are hashed in the variable format
+                            items[key[0], key[1]] = pairs[i + 1]
+                        else:
+                            error_out(f"'{key[0]}' cannot be used as a map key", type_error)
+                push(('map', items))
+
+            elif opcode == RETURN_VALUE:
+                return pop()
+
+            elif opcode == OUT:
+                values = stack[-arg:] if arg else []
+                del stack[len(stack) - arg:]
+                self.call_out(values)
+
+            elif opcode == PAUSE:
+                self._exec_wait(time=pop()[1])
+
+            elif opcode == MAKE_FUNCTION:
+                func_code = consts[arg]
+                self.memory.store_function_content(function=func_code.name, content=func_code)       # AMM | Storing Function Content
+                self.memory.store_function_parameter(function=func_code.name, parameters=func_code.params)     # AMM | Storing Function Param Names
+
+            elif opcode == DELETE_FAST:
+                if fast[arg] is None:
+                    error_out(f'Variable "{code.varnames[arg]}" undefined', undef_var)
+                fast[arg] = None
+
+            elif opcode == DELETE_NAME:
+                self._exec_delete(variable=names[arg], storage=variable_storage)
+
+            elif opcode == IMPORT:
+                lib_name = names[arg]
+                if lib_name not in module_storage:  # AMM | Every library is only imported once
+                    self.call_import(lib_name=lib_name, std_check=self.check_import(lib_name))
+
+            elif opcode == MIXIN:
+                if frame:
+                    frame.update(self.call_mixin(mixin_name=names[arg], scope=frame.scope()))
+                else:
+                    variable_storage.update(self.call_mixin(mixin_name=names[arg], scope=variable_storage))
+
+            elif opcode == LINE:    # Only in code compiled for the profiler
+                profiler.line(code, arg)
+
+        return asc.NULL
+
+
+# --------------------------------------- 
+# Server mode
+# ---------------------------------------
+# Requests & responses are JSON objects, one per line. A request is either
+# {"path": "script.asx"} or {"source": "say 1"}, optionally with "cwd" (the
+# working directory of the script) and "ignoreErrors". The output of the
+# script is sent back as {"out": "text"} messages while the script runs,
+# followed by {"status": 0} (or 1 if the script ended with an error).
+
+class ServerOutput:     # Replaces stdout while serving a script, sends the printed text to the client line by line
+    def __init__(self, send):
+        self.send = send
+        self.buffer = ''
+
+    def write(self, text: str):
+        self.buffer += text
+        if '\n' in text:
+            lines, _, self.buffer = self.buffer.rpartition('\n')
+            self.send({'out': lines + '\n'})
+        return len(text)
+
+    def flush(self):
+        if self.buffer:
+            self.send({'out': self.buffer})
+            self.buffer = ''
+
+
+def serve_request(request: dict, send, use_cache: bool = True):
+    out = ServerOutput(send)
+    # AMM | Every served script gets a new interpreter with empty memory, mixins & parsed code stay loaded
+    # Unbuffered, ServerOutput sends every line as soon as it's printed
+    interpreter = Interpreter(ignore_errors=bool(request.get('ignoreErrors', False)), use_cache=use_cache, out=out,
+                              buffer_size=0)
+    cwd = os.getcwd()
+    status = 0
+    try:
+        if request.get('cwd'):
+            os.chdir(request['cwd'])
+        if 'source' in request:
+            interpreter.run(request['source'])
+        else:
+            interpreter.run_file(request['path'])
+    except ScriptError:
+        status = 1
+    except Exception as E:  # Invalid requests & internal errors, the server keeps running
+        print(f'[{E.__class__.__name__}] | {E}', file=out)
+        status = 1
+    finally:
+        out.flush()
+        os.chdir(cwd)
+    send({'status': status})
+
+
+def serve_lines(lines, send, use_cache: bool):   # Handles the requests of a single client
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict) or ('path' not in request and 'source' not in request):
+                raise ValueError('expected a "path" or "source"')
+        except ValueError as VE:
+            send({'out': f'[RequestError] | {VE}\n'})
+            send({'status': 1})
+            continue
+        serve_request(request, send, use_cache)
+
+
+def serve(socket_path: str, use_cache: bool = True):
+    if socket_path == '-':
+        stream = sys.stdout
+        def send(message: dict):
+            stream.write(json.dumps(message) + '\n')
+            stream.flush()
+        serve_lines(sys.stdin, send, use_cache)
+        return
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            def send(message: dict):
+                self.wfile.write((json.dumps(message) + '\n').encode('utf8'))
+            serve_lines((line.decode('utf8') for line in self.rfile), send, use_cache)
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)  # Left over by a server that was killed
+    server = socketserver.UnixStreamServer(socket_path, Handler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(socket_path)
+
+
+# --------------------------------------- 
+# Argument parsing
+# ---------------------------------------
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser() # Initializing the ArgumentParser
+
+    # Adding arguments
+    parser.add_argument('asx', nargs='?', help='Name of the file')
+    parser.add_argument('-o', '--ignoreErrors', action='store_true', help="Ignores Program Errors")
+    parser.add_argument('-n', '--noCache', action='store_true', help="Always parses the code, without using __asxcache__")
+    parser.add_argument('-b', '--buffer', type=int, default=None, metavar='SIZE', help="Output buffer size, 0 writes every line right away")
+    parser.add_argument('--stream', action='store_true', help="Runs the script while it's being parsed, for huge scripts (no parse cache)")
+    parser.add_argument('-p', '--profile', nargs='?', const='', metavar='FILE', help="Prints the time of every line, function & mixin, saves them to FILE (.json or pstats) if given")
+    parser.add_argument('-s', '--serve', nargs='?', const='-', metavar='SOCKET', help="Runs scripts sent by clients, over a unix socket or stdin if no socket is given")
+
+    args = parser.parse_args(argv)
+    if args.asx is None and args.serve is None:
+        parser.error('the asx file is required')
+
+    if args.serve is not None:
+        serve(args.serve, use_cache=not args.noCache)
+        return
+
+    profiler = Profiler() if args.profile is not None else None
+    interpreter = Interpreter(ignore_errors=args.ignoreErrors, use_cache=not args.noCache, buffer_size=args.buffer, profiler=profiler)
+    try:
+        if args.stream:
+            interpreter.run_stream(args.asx)
+        else:
+            interpreter.run_file(args.asx)  # Main Interpreting Method
+    except ScriptError:
+        sys.exit(1)
+    finally:
+        if profiler:
+            # The report goes to stderr, so it doesn't end up in the output of the script
+            print(profiler.report(), file=sys.stderr)
+            if args.profile:
+                profiler.dump(args.profile)
+    print('\n\n\nVariable Storage: ', interpreter.memory.variable_storage)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,58 @@
 """ The python side implementation of the Array module in astro.
+Arrays of numbers can come as a NumArray, the mixins work on its
+numbers directly instead of going through the variable tuples. If
+numpy is installed, longer arrays of numbers are handed to numpy
+(without copying them), otherwise the python versions are used. Both
+give the same results, apart from sums of numbers which numpy adds up
+pairwise, so they can differ in the last digits.
 """
+from itertools import accumulate, repeat
+from array import array
+import operator
 import astropy as apy
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 __author__  = 'bellrise'
-__version__ = '0.3'
+__version__ = '0.6'
+
+# Arrays shorter than this are not handed to numpy, the conversion
+# would take longer than the python loop.
+NUMPY_MIN = 64
+
+
+def numeric(buf) -> bool:
+    """ Returns True if the array is a NumArray holding numbers. """
+    return isinstance(buf, apy.NumArray) and buf.numeric
+
+
+def numbers_of(buf, name: str = 'buf') -> array:
+    """ Returns the array('d') of the numbers in the array, throws a
+    type error if the array holds anything else. """
+    if numeric(buf):
+        return buf.numbers()
+    packed = apy.NumArray.pack(buf)
+    if packed is None:
+        apy.throw(apy.errors.type_error, f"'{name}' has to be an array of numbers")
+    return packed.numbers()
+
+
+def vector(numbers: array):
+    """ Returns a numpy array sharing the memory of the numbers, or
+    None if numpy is not installed or there are only a few of them. """
+    if numpy is None or len(numbers) < NUMPY_MIN:
+        return None
+    return numpy.frombuffer(numbers, dtype=numpy.float64)
+
+
+def from_vector(vec) -> apy.NumArray:
+    """ Returns the numpy array as a NumArray. """
+    numbers = array('d')
+    numbers.frombytes(numpy.ascontiguousarray(vec, dtype=numpy.float64).tobytes())
+    return apy.NumArray(numbers)
 
 
 def buf_check(scope, buf, name='buf'):
@@ -16,25 +65,12 @@ def buf_check(scope, buf, name='buf'):
                     f"'{name}' parameter has to be of type Array")
 
 
-def reformat(buf):
-    """ Reformats the array and turns it into astro types. """
-    for i, v in enumerate(buf):
-        buf[i] = apy.models.create('null', v)
-    return buf
-
-
-def f_len(scope: apy.Scope):
+@apy.native(returns='length', buf='array')
+def f_len(buf: list):
     # params: (buf: array)
     # comment: Returns the length of an array
 
-    # Get the buffer
-    buf: apy.models.Array = scope.get('buf')
-    buf_check(scope, buf)
-
-    length = apy.models.Num.new('length', len(buf))
-    scope.set('length', length)
-
-    return scope.format()
+    return len(buf)
 
 
 def f_join(scope: apy.Scope):
@@ -65,39 +101,40 @@ def f_join(scope: apy.Scope):
     return scope.format()
 
 
-def f_sum(scope: apy.Scope):
+@apy.native(returns='injection', buf='array')
+def f_sum(buf: list):
     # params: (buf: array)
     # comment: Returns the sum of all numbers in the array. It also works
     # for strings, as their length is calculated. If any other
     # type is found in the array, it is discarded and not counted
     # in to the total size.
 
-    buf = scope.get('buf')
-    buf_check(scope, buf)
+    if numeric(buf):
+        vec = vector(buf.numbers())
+        return float(vec.sum()) if vec is not None else sum(buf.numbers())
 
     total = 0
-    for i in range(len(buf)):
-        e = buf[i]
+    for e in buf:
         if e[0] == 'str':
             total += len(e[1])
         if e[0] == 'num':
             total += e[1]
 
-    scope.place(apy.models.Num.new('injection', total))
-    return scope.format()
+    return total
 
 
-def f_average(scope: apy.Scope):
+@apy.native(returns='injection', buf='array')
+def f_average(buf: list):
     # params: (buf: array)
     # comment: Returns the average for all numbers in the array, if a string
     # is found the length of the string is taken into consideration.
 
-    buf = scope.get('buf')
-    buf_check(scope, buf)
+    if numeric(buf) and len(buf):
+        vec = vector(buf.numbers())
+        return float(vec.mean()) if vec is not None else sum(buf.numbers()) / len(buf)
 
     total, amount = 0, 0
-    for i in range(len(buf)):
-        e = buf[i]
+    for e in buf:
         if e[0] == 'str':
             total += len(e[1])
             amount += 1
@@ -105,154 +142,259 @@ def f_average(scope: apy.Scope):
             total += e[1]
             amount += 1
 
-    scope.place(apy.models.Num.new('injection', total / amount))
-    return scope.format()
+    if not amount:
+        apy.throw(apy.errors.zero_division, 'average of an array without numbers or strings')
+    return total / amount
 
 
-def f_contains(scope: apy.Scope):
+@apy.native(returns='injection', buf='array', item='any')
+def f_contains(buf: list, item: tuple):
     # params: (buf: array, item: any)
     # comment: Returns True if the item is found in the array, returns False
     # if not.
 
-    buf: apy.models.Array = scope.get('buf')
-    item = scope.get('item')
-    buf_check(scope, buf)
+    if numeric(buf) and item[0] == 'num':
+        vec = vector(buf.numbers())
+        if vec is not None:
+            return bool((vec == item[1]).any())
 
-    found = False
-    for i in range(len(buf)):
-        if buf[i] == item.raw():
-            found = True
-            break
-
-    scope.place(apy.models.Bool('injection', found))
-    return scope.format()
+    return item in buf
 
 
-def f_find(scope: apy.Scope):
+@apy.native(returns='injection', buf='array', item='any')
+def f_find(buf: list, item: tuple):
     # params: (buf: array, item: any)
     # comment: Returns the index of the first found item, returns -1 if no
     # such item is found.
 
-    buf: apy.models.Array = scope.get('buf')
-    item = scope.get('item')
-    buf_check(scope, buf)
+    if numeric(buf):
+        vec = vector(buf.numbers())
+        if vec is not None and item[0] == 'num':
+            found = numpy.flatnonzero(vec == item[1])
+            return int(found[0]) if len(found) else -1
+        try:
+            return buf.index(item)
+        except ValueError:
+            return -1
 
-    index = -1
-    for i in range(len(buf)):
-        if buf[i] == item.raw():
-            index = i
-            break
-
-    scope.place(apy.models.Num('injection', index))
-    return scope.format()
+    for i, e in enumerate(buf):
+        if e == item:
+            return i
+    return -1
 
 
-def f_sort(scope: apy.Scope):
+@apy.native(returns='injection', buf='array')
+def f_sort(buf: list):
     # params: (buf: array)
     # comment: Sorts the array in a particular way. Numbers come first and then
     # strings. Each group of numbers and strings are sorted from smallest
     # to largest and alphabetically.
 
-    buf: apy.models.Array = scope.get('buf')
-    buf_check(scope, buf)
+    if numeric(buf):
+        vec = vector(buf.numbers())
+        if vec is not None:
+            return from_vector(numpy.sort(vec, kind='stable'))
+        return apy.NumArray(array('d', sorted(buf.numbers())))
 
     nums = []
     strings = []
     other = []
 
-    for i in range(len(buf)):
-        e = buf[i]
+    for e in buf:
         if e[0] == 'str':
-            strings.append(e[1])
+            strings.append(e)
         elif e[0] == 'num':
-            nums.append(e[1])
+            nums.append(e)
         else:
             other.append(e)
 
     nums.sort()
     strings.sort()
 
-    total = []
-    for i in nums:
-        total.append(apy.models.Num.new('null', i))
-    for i in strings:
-        total.append(apy.models.String.new('null', i))
-    for i in other:
-        total.append(apy.models.create('null', i))
-
-    scope.place(apy.models.Array.new('injection', total))
-    return scope.format()
+    return nums + strings + other
 
 
-def f_reverse(scope: apy.Scope):
+@apy.native(returns='injection', buf='array')
+def f_reverse(buf: list):
     # params: (buf: array)
     # comment: Reverses the whole array around.
 
-    buf = scope.get('buf')
-    buf_check(scope, buf)
-
-    temp = buf.get()
-    temp.reverse()
-    temp = reformat(temp)
-
-    scope.place(apy.models.Array.new('injection', temp))
-    return scope.format()
+    return buf[::-1]
 
 
-def f_put(scope: apy.Scope):
+@apy.native(returns='injection', buf='array', item='any')
+def f_put(buf: list, item: tuple):
     # params: (buf: array, item: any)
     # comment: Appends an item to the array. It it always put on the last place
     # without exceptions.
 
-    buf = scope.get('buf')
-    item = scope.get('item')
-    buf_check(scope, buf)
-
-    t = buf.get()
-    t = reformat(t)
-    t.append(item)
-    scope.place(apy.models.Array.new('injection', t))
-    return scope.format()
+    return buf + [item]
 
 
-def f_pop(scope: apy.Scope):
-    # params: (buf: array, index: any)
+@apy.native(returns='injection', buf='array', index='num')
+def f_pop(buf: list, index: float):
+    # params: (buf: array, index: num)
     # comment: Removes an item from the array at the specified index, this results
     # in shortening the array length by 1 and moving the items around so
     # there aren't any spaces left. This is using a simple Python list in
     # the background, so it happens automatically. This may not be the fastest,
     # but that's not the point of this language.
 
-    buf = scope.get('buf')
-    index = scope.get('index')
-    if index.get() > len(buf.get()):
-        scope.throw(apy.errors.index_error, 'index out of range')
+    index = int(index)
+    if not 0 <= index < len(buf):
+        apy.throw(apy.errors.index_error, 'index out of range')
 
-    t = buf.get()
-    t.pop(index.get())
-    t = reformat(t)
-
-    scope.place(apy.models.Array.new('injection', t))
-    return scope.format()
+    return buf[:index] + buf[index + 1:]
 
 
-def f_append(scope: apy.Scope):
+@apy.native(returns='injection', buf='array', other='array')
+def f_append(buf: list, other: list):
     # params: (buf: array, other: array)
     # comment: Joins two array together creating one single array. Note: do not
     # mix this up with the Pythonic .append(), which adds a single item
     # to the array. This is done by the put() function.
 
-    buf = scope.get('buf')
-    other = scope.get('other')
-    buf_check(scope, buf)
-    buf_check(scope, other, 'other')
+    return buf + other
 
-    t = buf.get()
-    t.extend(other.get())
-    t = reformat(t)
 
-    scope.place(apy.models.Array.new('injection', t))
-    return scope.format()
+def elementwise(buf, other: tuple, function, vectorized):
+    """ Applies the function to every number of the array and the
+    number, or the number at the same index in the other array. The
+    vectorized function is the numpy version of it. """
+    numbers = numbers_of(buf)
+    if other[0] == 'num':
+        vec = vector(numbers)
+        if vec is not None:
+            return from_vector(vectorized(vec, other[1]))
+        return apy.NumArray(array('d', map(function, numbers, repeat(other[1]))))
+
+    if other[0] != 'array':
+        apy.throw(apy.errors.type_error, "'other' parameter has to be of type Array or Num")
+    others = numbers_of(other[1], 'other')
+    if len(numbers) != len(others):
+        apy.throw(apy.errors.index_error, f'arrays of different lengths ({len(numbers)} and {len(others)})')
+    vec = vector(numbers)
+    if vec is not None:
+        return from_vector(vectorized(vec, numpy.frombuffer(others, dtype=numpy.float64)))
+    return apy.NumArray(array('d', map(function, numbers, others)))
+
+
+@apy.native(returns='injection', buf='array', other='any')
+def f_add(buf, other: tuple):
+    # params: (buf: array, other: array | num)
+    # comment: Adds the numbers of both arrays together, element by element,
+    # or the number to every element of the array.
+
+    return elementwise(buf, other, operator.add, numpy and numpy.add)
+
+
+@apy.native(returns='injection', buf='array', other='any')
+def f_mul(buf, other: tuple):
+    # params: (buf: array, other: array | num)
+    # comment: Multiplies the numbers of both arrays, element by element,
+    # or every element of the array by the number.
+
+    return elementwise(buf, other, operator.mul, numpy and numpy.multiply)
+
+
+@apy.native(returns='injection', buf='array')
+def f_min(buf):
+    # params: (buf: array)
+    # comment: Returns the smallest number of the array.
+
+    numbers = numbers_of(buf)
+    if not numbers:
+        apy.throw(apy.errors.index_error, 'min of an empty array')
+    vec = vector(numbers)
+    return float(vec.min()) if vec is not None else min(numbers)
+
+
+@apy.native(returns='injection', buf='array')
+def f_max(buf):
+    # params: (buf: array)
+    # comment: Returns the largest number of the array.
+
+    numbers = numbers_of(buf)
+    if not numbers:
+        apy.throw(apy.errors.index_error, 'max of an empty array')
+    vec = vector(numbers)
+    return float(vec.max()) if vec is not None else max(numbers)
+
+
+@apy.native(returns='injection', buf='array')
+def f_cumsum(buf):
+    # params: (buf: array)
+    # comment: Returns the running totals of the array, every element is
+    # the sum of all the numbers up to it.
+
+    numbers = numbers_of(buf)
+    vec = vector(numbers)
+    if vec is not None:
+        return from_vector(numpy.cumsum(vec))
+    return apy.NumArray(array('d', accumulate(numbers)))
+
+
+@apy.native(returns='injection', buf='array')
+def f_argsort(buf):
+    # params: (buf: array)
+    # comment: Returns the indexes of the numbers in sorted order, equal
+    # numbers keep their order.
+
+    numbers = numbers_of(buf)
+    vec = vector(numbers)
+    if vec is not None:
+        return from_vector(numpy.argsort(vec, kind='stable'))
+    return apy.NumArray(array('d', sorted(range(len(numbers)), key=numbers.__getitem__)))
+
+
+@apy.native(returns='injection', buf='array')
+def f_unique(buf):
+    # params: (buf: array)
+    # comment: Returns every number of the array once, sorted.
+
+    numbers = numbers_of(buf)
+    vec = vector(numbers)
+    if vec is not None:
+        return from_vector(numpy.unique(vec))
+    return apy.NumArray(array('d', sorted(set(numbers))))
+
+
+@apy.native(returns='injection', buf='array', bins='num')
+def f_histogram(buf, bins: float):
+    # params: (buf: array, bins: num)
+    # comment: Splits the range from the smallest to the largest number into
+    # the amount of equally wide bins and returns how many numbers fall
+    # into each one. The last bin also holds the largest number.
+
+    numbers = numbers_of(buf)
+    bins = int(bins)
+    if bins < 1:
+        apy.throw(apy.errors.index_error, "'bins' has to be at least 1")
+
+    vec = vector(numbers)
+    if vec is not None:
+        return from_vector(numpy.histogram(vec, bins=bins)[0])
+
+    # The same bins as numpy.histogram()
+    if numbers:
+        low, high = min(numbers), max(numbers)
+    else:
+        low, high = 0.0, 1.0
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    step = (high - low) / bins
+    edges = [low + i * step for i in range(bins)] + [high]
+    scale = bins / (high - low)
+
+    counts = [0] * bins
+    for x in numbers:
+        i = min(int((x - low) * scale), bins - 1)
+        if x < edges[i]:
+            i -= 1
+        elif i != bins - 1 and x >= edges[i + 1]:
+            i += 1
+        counts[i] += 1
+    return apy.NumArray(counts)
 
 
 def __build__():
@@ -268,7 +410,15 @@ def __build__():
         f_reverse: 'reverse',
         f_put: 'put',
         f_pop: 'pop',
-        f_append: 'append'
+        f_append: 'append',
+        f_add: 'add',
+        f_mul: 'mul',
+        f_min: 'min',
+        f_max: 'max',
+        f_cumsum: 'cumsum',
+        f_argsort: 'argsort',
+        f_unique: 'unique',
+        f_histogram: 'histogram'
     }
 
     return [apy.render(f, '__Array', k) for f, k in renders.items()]
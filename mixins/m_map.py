@@ -0,0 +1,100 @@
+""" The python side implementation of the Map module in astro. Maps
+are passed as the dict used by the interpreter, the keys are hashed
+in the variable format (see models.Map.key), so getting, setting and
+deleting a key doesn't depend on the size of the map. Unlike arrays,
+maps are changed in place: Map.set and Map.delete return the same map.
+"""
+import astropy as apy
+
+__version__ = '0.1'
+
+
+def key_of(key: tuple) -> tuple:
+    """ Returns the hashable key of the variable, throws a type error if
+    the variable can't be a key. """
+    try:
+        return apy.models.Map.key(key)
+    except TypeError as e:
+        apy.throw(apy.errors.type_error, e)
+
+
+@apy.native(returns='injection', items='map', key='any')
+def f_get(items: dict, key: tuple):
+    # params: (items: map, key: num | str | bool)
+    # comment: Returns the value of the key.
+
+    try:
+        return items[key_of(key)]
+    except KeyError:
+        apy.throw(apy.errors.index_error, f'key {key[1]!r} not found')
+
+
+@apy.native(returns='injection', items='map', key='any', value='any')
+def f_set(items: dict, key: tuple, value: tuple):
+    # params: (items: map, key: num | str | bool, value: any)
+    # comment: Sets the value of the key, returns the map.
+
+    items[key_of(key)] = value
+    return items
+
+
+@apy.native(returns='injection', items='map', key='any')
+def f_has(items: dict, key: tuple):
+    # params: (items: map, key: num | str | bool)
+    # comment: Returns True if the key is in the map.
+
+    return key_of(key) in items
+
+
+@apy.native(returns='injection', items='map', key='any')
+def f_delete(items: dict, key: tuple):
+    # params: (items: map, key: num | str | bool)
+    # comment: Removes the key from the map, returns the map.
+
+    try:
+        del items[key_of(key)]
+    except KeyError:
+        apy.throw(apy.errors.index_error, f'key {key[1]!r} not found')
+    return items
+
+
+@apy.native(returns='injection', items='map')
+def f_keys(items: dict):
+    # params: (items: map)
+    # comment: Returns an array of the keys, in the order they were added.
+
+    keys = list(items)
+    return apy.NumArray.pack(keys) or keys
+
+
+@apy.native(returns='injection', items='map')
+def f_values(items: dict):
+    # params: (items: map)
+    # comment: Returns an array of the values, in the order their keys
+    # were added.
+
+    values = list(items.values())
+    return apy.NumArray.pack(values) or values
+
+
+@apy.native(returns='injection', items='map')
+def f_len(items: dict):
+    # params: (items: map)
+    # comment: Returns the amount of keys in the map.
+
+    return len(items)
+
+
+def __build__():
+    """ build function for the Map module. """
+    renders = {
+        f_get: 'get',
+        f_set: 'set',
+        f_has: 'has',
+        f_delete: 'delete',
+        f_keys: 'keys',
+        f_values: 'values',
+        f_len: 'len'
+    }
+
+    return [apy.render(f, '__Map', k) for f, k in renders.items()]
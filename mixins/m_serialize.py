@@ -1,51 +1,57 @@
 """ The python side implementation of the Serialize module in astro.
 """
+from itertools import chain
+from array import array
 import astropy as apy
+import struct
+import sys
+import io
 import os
 
 __author__  = 'bellrise'
-__version__ = '0.1'
+__version__ = '0.4'
 
-# Global variable for holding the current filename for deserialization
-# purposes. This works in combination of the fail() function which
-# is responsible for throwing a RuntimeError with a "deserialization
-# failed of file x: why" message.
-file = ''
+
+class DecodeError(ValueError):
+    """ Raised when the data cannot be deserialized. """
 
 
 def fail(why):
-    raise RuntimeError(f"Deserialization of '{file}' failed: {why}")
+    raise DecodeError(why)
 
 # Serialize special astro format opcodes grouped by types and
-# instructions. These are for defining the types and element
-# size in the bytes string. The instruction bytes have been made
-# so specific to prepare for the map type model, which can have
-# any astro type as the key and value (arrays too). In order
-# to not change the whole format and make the previous versions
-# incompatible, so this format is built in now. The raw string
-# type is there as a placeholder for anything that could be a
-# raw data type (bytes-style).
+# instructions. The data always starts with the START byte and the
+# format version, followed by a BLOB byte and the serialized object,
+# and ends with the STOP byte.
+#
+# Format 002 stores every value as its type byte, the length of its
+# payload (4 byte unsigned int, little endian) and the payload itself,
+# so the reader never has to search for the next byte of some kind,
+# which could just as well be a part of a string. Numbers are stored
+# as 8 byte doubles and bools as a single byte, arrays & maps start
+# with the amount of their elements (pairs of a key and a value for
+# maps), followed by the elements in the same format, so arrays & maps
+# can hold other arrays & maps. Arrays of numbers are stored as the
+# packed doubles (NUMS_T), written & read in one go.
 #
-# There is always one BLOB byte (\x82) currently to signify
-# one piece of data being stored. This is pretty much redundant
-# and just takes up valuable space for now, but it may come in
-# handy if a model system will ever be implemented. If that
-# happens, the format will still be the same without the need
-# to re-serialize all old data to keep the newest standard.
+# Both the writer and the reader keep the open arrays & maps on a
+# stack instead of recursing, so the nesting is only limited by the
+# memory. The reader decodes straight out of the file, a buffer at a
+# time (see Reader).
 #
-# If you looked closer into the serialization process, you could
-# also see that the name of the object is being saved while it
-# will always be "object" in this case, because the variable
-# name is also always object. This is, also, because of the stable
-# format version
+# Format 001 split the data by the instruction bytes and stored the
+# numbers as text, it can still be read (see deserialize_001()) but
+# is not written anymore.
 
 
-FORMAT   = b'001'   # format version
+FORMAT   = b'002'   # format version
+FORMAT_1 = b'001'   # previous format version, read only
 
 # Types
 
 ARRAY_T  = b'a'     # array type
 BOOL_T   = b'b'     # boolean type
+NUMS_T   = b'd'     # array of numbers type
 MAP_T    = b'm'     # map type
 NUM_T    = b'n'     # number type
 RSTR_T   = b'r'     # -
@@ -56,13 +62,32 @@ STRING_T = b's'     # string type
 START    = b'\x80'  # start byte
 NULL     = b'\x81'  # null byte
 BLOB     = b'\x82'  # start of blob byte
-NAME     = b'\x83'  # start of var name byte
-DATA     = b'\x84'  # start of data byte
-ELEMENT  = b'\x85'  # start of element byte
-KEY      = b'\x86'  # start of key byte
-VALUE    = b'\x87'  # start of value byte
+NAME     = b'\x83'  # start of var name byte (001)
+DATA     = b'\x84'  # start of data byte (001)
+ELEMENT  = b'\x85'  # start of element byte (001)
+KEY      = b'\x86'  # start of key byte (001)
+VALUE    = b'\x87'  # start of value byte (001)
 STOP     = b'\x8F'  # ending byte
 
+# The type bytes as ints, compared with the bytes of the reader
+ARRAY_B, BOOL_B, NUMS_B, MAP_B, NUM_B, STRING_B = (t[0] for t in (ARRAY_T, BOOL_T, NUMS_T, MAP_T, NUM_T, STRING_T))
+
+# Payload lengths & numbers
+
+U32 = struct.Struct('<I')
+F64 = struct.Struct('<d')
+
+# Arrays of numbers are stored little endian, like the other numbers
+SWAP = sys.byteorder != 'little'
+
+# Size of the buffer of the reader, longer strings & arrays of numbers
+# are read into their own memory
+BUFFER_SIZE = 65536
+
+# Payloads longer than this are read in growing chunks, so a corrupt
+# length can't allocate more memory than there is data to fill it
+CHUNK_SIZE = 1 << 20
+
 # Models
 
 # If classes / objects / models will ever be implemented this
@@ -71,187 +96,400 @@ STOP     = b'\x8F'  # ending byte
 # safety (so it doesn't get corrupted).
 
 
-def serialize_blob(data: apy.objects.var_t, __n=None, __t=DATA):
-    """ Serializes one single object. Note: this does not place
-    a BLOB byte at the beggining, this is handled by the parent
-    function, serialize().
-    :param data: the data you want to serialize
-    :param __n: name of the variable, places an ELEMENT byte if
-                not specified.
-    :param __t: type of the data structure, this is placed after
-                the name or the ELEMENT byte. The default is just
-                DATA, can be KEY or VALUE. """
-
-    # The bytes stack
-    stack = b''
-    if __n:
-        stack += NAME + bytes(data.nameof(), 'utf8')
-    else:
-        stack += ELEMENT
-    stack += __t
-
-    if data.typeof() == 'str':
-        # String type serialization, simple blob object
-        stack += STRING_T
-        stack += bytes(data.get(), 'utf8')
-
-    if data.typeof() == 'num':
-        # Number type serialization
-        stack += NUM_T
-        stack += bytes(str(data.get()), 'utf8')
-
-    if data.typeof() == 'bool':
-        # Boolean type serialization, false is 0 true is 1
-        stack += BOOL_T
-        if data.get(): stack += bytes(b'1')
-        else: stack += bytes(b'0')
-
-    return stack
-
-
-def deserialize_blob(data: bytes):
-    """ Returns a deserialized blob object in astropy model form. """
-
-    if not isb(data[0], DATA):
-        fail('unsupported operation for blob decoding')
-
-    type_ = bytes([data[1]])
-    data  = data[2:]
-
-    if type_ == NUM_T:
-        # Number type
-        blob = apy.models.Num.new('null', float(data))
-
-    elif type_ == STRING_T:
-        # String type
-        blob = apy.models.String.new('null', str(data, 'utf8'))
-
-    elif type_ == BOOL_T:
-        # Boolean type
-        evaluation = True
-        if data == b'0':
-            evaluation = False
-        blob = apy.models.Bool.new('null', evaluation)
+def numbers_of(items):
+    """ Returns the array('d') of the numbers if the array only holds
+    numbers, else None. """
+    if isinstance(items, apy.NumArray):
+        if items.numeric:
+            return items.numbers()
+        return None
+    packed = apy.NumArray.pack(items)
+    return None if packed is None else packed.numbers()
+
+
+def begin(out: bytearray, type_: bytes) -> int:
+    """ Writes the type byte & a placeholder for the payload length,
+    returns where the length has to be written by end(). """
+    out += type_
+    out += b'\0\0\0\0'
+    return len(out) - 4
+
+
+def end(out: bytearray, start: int):
+    """ Writes the length of the payload written since begin(). """
+    length = len(out) - start - 4
+    if length > 0xFFFFFFFF:
+        apy.throw(apy.errors.type_error, 'the object is too large to be serialized')
+    U32.pack_into(out, start, length)
+
+
+def write_numbers(out: bytearray, numbers: array):
+    """ Appends the array of numbers, copied in one go. """
+    if SWAP:
+        numbers = array('d', numbers)
+        numbers.byteswap()
+    start = begin(out, NUMS_T)
+    out += numbers
+    end(out, start)
+
+
+def write_value(out: bytearray, value: tuple):
+    """ Appends the serialized value to the output. The arrays & maps
+    being written are kept on a stack with the elements left to write.
+    :param out: the output buffer
+    :param value: the value in the astro (type, data) format """
+
+    stack = []      # (elements left, start of the length, id) of the open arrays & maps
+    opened = set()  # ids of the open arrays & maps, one holding itself can't be written
+    elements = iter((value, ))
+
+    while True:
+        for type_, data in elements:
+            if type_ == 'num':
+                out += NUM_T
+                out += U32.pack(8)
+                out += F64.pack(data)
+
+            elif type_ == 'str':
+                start = begin(out, STRING_T)
+                out += data.encode('utf8')
+                end(out, start)
+
+            elif type_ == 'bool':
+                out += BOOL_T
+                out += U32.pack(1)
+                out += b'\x01' if data else b'\x00'
+
+            elif type_ == 'array' or type_ == 'map':
+                if type_ == 'array':
+                    numbers = numbers_of(data)
+                    if numbers is not None:
+                        write_numbers(out, numbers)
+                        continue
+
+                if id(data) in opened:
+                    apy.throw(apy.errors.type_error, f'a {type_} holding itself cannot be serialized')
+                start = begin(out, ARRAY_T if type_ == 'array' else MAP_T)
+                out += U32.pack(len(data))
+                stack.append((elements, start, id(data)))
+                opened.add(id(data))
+                elements = iter(data) if type_ == 'array' else chain.from_iterable(data.items())
+                break
+
+            else:
+                apy.throw(apy.errors.type_error, f"the '{type_}' type cannot be serialized")
+
+        else:
+            # Every element is written, closing the array or map
+            if not stack:
+                return
+            elements, start, data_id = stack.pop()
+            opened.discard(data_id)
+            end(out, start)
+
+
+def serialize(value: tuple) -> bytearray:
+    """ Serializes the value into the bytes of the newest format,
+    places the START/STOP and BLOB bytes. """
+
+    out = bytearray(START + FORMAT + BLOB)
+    write_value(out, value)
+    out += STOP
+    return out
+
+
+class Reader:
+    """ Reads a serialized object of format 002 from a binary file. The
+    file is read into one buffer over and over, and the values are
+    decoded straight out of it, so no byte strings are created on the
+    way. Strings & arrays of numbers longer than the buffer are read
+    right into their own memory, which grows with the data read, never
+    trusting the length written in the data. """
+
+    __slots__ = ('file', 'buffer', 'view', 'pos', 'end', 'base')
+
+    def __init__(self, file, buffer_size: int = BUFFER_SIZE):
+        """ Constructor, the file has to support readinto(). """
+        self.file = file
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+        self.pos = 0    # Position of the next byte in the buffer
+        self.end = 0    # End of the read bytes in the buffer
+        self.base = 0   # Offset of the start of the buffer in the data
+
+    @property
+    def offset(self) -> int:
+        """ Returns the amount of bytes read so far. """
+        return self.base + self.pos
+
+    def fill(self, n: int):
+        """ Makes sure the next n bytes are in the buffer, moving the
+        unread bytes to its start to make place for more. """
+        if self.end - self.pos >= n:
+            return
+        rest = self.end - self.pos
+        self.view[:rest] = self.view[self.pos:self.end]
+        self.base += self.pos
+        self.pos = 0
+        self.end = rest
+        while self.end < n:
+            read = self.file.readinto(self.view[self.end:])
+            if not read:
+                fail('unexpected end of data')
+            self.end += read
+
+    def readinto(self, target: memoryview):
+        """ Reads the next len(target) bytes into the target, the ones
+        not in the buffer yet come straight from the file. """
+        n = min(len(target), self.end - self.pos)
+        target[:n] = self.view[self.pos:self.pos + n]
+        self.pos += n
+        while n < len(target):
+            read = self.file.readinto(target[n:])
+            if not read:
+                fail('unexpected end of data')
+            n += read
+            self.base += read
+
+    def payload(self, typecode: str, length: int) -> array:
+        """ Reads the next length bytes into a new array of the type. It
+        is allocated at most CHUNK_SIZE bytes at a time, doubling in size
+        as long as the data keeps coming. """
+        data = array(typecode)
+        size = 0
+        while size < length:
+            step = min(length - size, max(size, CHUNK_SIZE))
+            data.frombytes(bytes(step))
+            self.readinto(memoryview(data).cast('B')[size:])
+            size += step
+        return data
+
+    def byte(self) -> int:
+        """ Reads a single byte. """
+        if self.pos == self.end:
+            self.fill(1)
+        self.pos += 1
+        return self.buffer[self.pos - 1]
+
+    def string(self, length: int) -> str:
+        """ Reads a string of the length (in bytes). """
+        if length > len(self.buffer):
+            return str(self.payload('B', length), 'utf8')
+        self.fill(length)
+        self.pos += length
+        return str(self.view[self.pos - length:self.pos], 'utf8')
+
+    def numbers(self, length: int) -> array:
+        """ Reads an array of numbers of the length (in bytes). """
+        if length % 8:
+            fail('invalid array of numbers')
+        numbers = self.payload('d', length)
+        if SWAP:
+            numbers.byteswap()
+        return numbers
+
+    def value(self) -> tuple:
+        """ Reads the next value. Arrays & maps are returned empty, with
+        the amount of elements (or pairs) they hold and the offset of
+        their end. This is called for every value, so the header and
+        the numbers are read right here. """
+        if self.end - self.pos < 5:
+            self.fill(5)
+        buffer = self.buffer
+        pos = self.pos
+        type_ = buffer[pos]
+        length = U32.unpack_from(buffer, pos + 1)[0]
+        self.pos = pos = pos + 5
+
+        if type_ == NUM_B:
+            if length != 8:
+                fail('invalid number')
+            if self.end - pos < 8:
+                self.fill(8)
+                pos = self.pos
+            self.pos = pos + 8
+            return ('num', F64.unpack_from(buffer, pos)[0]), None
+
+        if type_ == STRING_B:
+            return ('str', self.string(length)), None
+
+        if type_ == BOOL_B:
+            if length != 1:
+                fail('invalid bool')
+            return ('bool', self.byte() != 0), None
+
+        if type_ == NUMS_B:
+            return ('array', apy.NumArray(self.numbers(length))), None
+
+        if type_ == ARRAY_B or type_ == MAP_B:
+            if length < 4:
+                fail('invalid array or map')
+            stop = self.offset + length
+            if self.end - self.pos < 4:
+                self.fill(4)
+            count = U32.unpack_from(buffer, self.pos)[0]
+            self.pos += 4
+            if type_ == ARRAY_B:
+                return ('array', []), [count, stop, None, True]
+            return ('map', {}), [count, stop, None, False]
 
-    else:
         fail('unknown type')
-        return None
 
-    return blob
+    def read(self) -> tuple:
+        """ Reads the whole object, from the BLOB byte to the STOP byte.
+        The open arrays & maps are kept on a stack, together with the
+        key of a map still waiting for its value. """
+
+        if self.byte() != BLOB[0]:
+            fail('missing blob byte')
+
+        result = None
+        stack = []      # [elements left, end offset, key, is array, container] of the open arrays & maps
+        while True:
+            value, contents = self.value()
+
+            # Placing the value into the array or map it belongs to
+            if stack:
+                parent = stack[-1]
+                if parent[3]:
+                    parent[4].append(value)
+                    parent[0] -= 1
+                elif parent[2] is None:
+                    try:
+                        parent[2] = apy.models.Map.key(value)
+                    except TypeError as e:
+                        fail(e)
+                else:
+                    parent[4][parent[2]] = value
+                    parent[2] = None
+                    parent[0] -= 1
+            else:
+                result = value
+
+            if contents is not None:
+                contents.append(value[1])
+                stack.append(contents)
+
+            # Closing every array & map with all of its elements read
+            while stack and stack[-1][0] == 0 and stack[-1][2] is None:
+                if self.offset != stack.pop()[1]:
+                    fail('element lengths do not match')
+            if not stack:
+                break
+
+        if self.byte() != STOP[0]:
+            fail('missing ending byte')
+        if self.pos != self.end or self.file.read(1):
+            fail('unexpected data after the object')
+        return result
+
+
+def load(file) -> tuple:
+    """ Reads the serialized object from the binary file, the file is
+    only read as far as needed for the next value. """
+
+    head = file.read(4)
+    if len(head) < 4 or head[0] != START[0]:
+        fail('missing start byte')
 
+    # Format check
+    if head[1:] == FORMAT_1:
+        data = head + file.read()
+        if data[-1] != STOP[0]:
+            fail('missing ending byte')
+        return deserialize_001(data)
+    if head[1:] != FORMAT:
+        fail('unreadable format')
+    return Reader(file).read()
 
-def serialize(data: apy.objects.var_t):
-    """ Serializes the data into a bytes string. Controlls the whole
-    serialization process, places the START/STOP and BLOB bytes. """
 
-    # The bytes stack
-    stack = START + FORMAT
+def deserialize(data) -> tuple:
+    """ Turns the data back into an astro value. """
+    return load(io.BytesIO(data))
 
-    if data.typeof() == 'array':
-        # Array model serialization
-        stack += BLOB + ARRAY_T
-        for i in data.get():
-            stack += serialize_blob(apy.models.create('null', i))
 
-    elif data.typeof() == 'map':
-        # Map model serialization
-        # TODO: Later implementation
-        raise NotImplementedError('map serialization is not implemented')
+def deserialize_blob(data: bytes) -> tuple:
+    """ Returns a deserialized blob object of format 001. """
 
-    else:
-        stack += BLOB + serialize_blob(data, __n=data.nameof())
+    if data[0] != DATA[0]:
+        fail('unsupported operation for blob decoding')
 
-    stack += STOP
-    return stack
+    type_ = bytes([data[1]])
+    data  = data[2:]
 
+    if type_ == NUM_T:
+        # Number type
+        return 'num', float(data)
 
-def isb(byte: int, other):
-    """ Compares 2 bytes to eachother while the first one is an int,
-    and the other just a byte string. This is just a shorthand. """
-    return bytes([byte]) == other
+    if type_ == STRING_T:
+        # String type
+        return 'str', str(data, 'utf8')
 
+    if type_ == BOOL_T:
+        # Boolean type, false is 0 true is 1
+        return 'bool', data != b'0'
 
-def deserialize(data):
-    """ Turns the data back into an astropy model. """
+    fail('unknown type')
 
-    # Start and stop check
-    if not isb(data[0], START):
-        fail('missing start byte')
-    if not isb(data[-1], STOP):
-        fail('missing ending byte')
 
-    # Format check
-    form = data[1:4]
-    if form != FORMAT:
-        fail('unreadable format')
+def deserialize_001(data: bytes) -> tuple:
+    """ Reads the data of format 001, split by the instruction bytes. """
 
     # Split by blob
     data = data[1:-1]
     blob = data.split(BLOB)[1:][0]
 
-    if isb(blob[0], ARRAY_T):
+    if blob[0] == ARRAY_T[0]:
         elements = blob.split(ELEMENT)[1:]
-        blobs = []
-        for e in elements:
-            blobs.append(deserialize_blob(e))
-        obj = apy.models.Array.new('null', blobs)
-
-    elif isb(blob[0], MAP_T):
-        # Map model serialization
-        # TODO: Later implementation
-        raise NotImplementedError('map serialization is not implemented')
+        return 'array', [deserialize_blob(e) for e in elements]
 
-    else:
-        blob = DATA + blob.split(DATA)[1]
-        obj = deserialize_blob(blob)
+    if blob[0] == MAP_T[0]:
+        # The elements are read in pairs
+        elements = blob.split(ELEMENT)[1:]
+        if len(elements) % 2:
+            fail('map key without a value')
+        pairs = {}
+        for key, value in zip(elements[::2], elements[1::2]):
+            if key[0] != KEY[0] or value[0] != VALUE[0]:
+                fail('map element is not a key-value pair')
+            pairs[deserialize_blob(DATA + key[1:])] = deserialize_blob(DATA + value[1:])
+        return 'map', pairs
 
-    return obj
+    blob = DATA + blob.split(DATA)[1]
+    return deserialize_blob(blob)
 
 
-def f_serialize(scope: apy.Scope):
+@apy.native(returns='injection', object='any', filename='str')
+def f_serialize(object: tuple, filename: str):
     # params: (object: any, filename: str)
     # comment: Serialize the object into a special format used in only
     # this library and write it to a file.
 
-    obj = scope.get('object')
-    filename = scope.get('filename')
-
-    # type checking
-    if filename.typeof() != 'str':
-        scope.throw(apy.errors.type_error, "'filename' has to be of type String")
-
-    data: bytes = serialize(obj)
+    data = serialize(object)
     try:
-        with open(os.getcwd() + '/' + filename.get(), 'wb') as f:
+        with open(os.getcwd() + '/' + filename, 'wb') as f:
             f.write(data)
     except Exception as e:
-        scope.throw(apy.errors.file_error, e)
-
-    return scope.format()
+        apy.throw(apy.errors.file_error, e)
 
 
-def f_deserialize(scope: apy.Scope):
+@apy.native(returns='object', filename='str')
+def f_deserialize(filename: str):
     # params: (filename: str)
     # Deserialize the bytes from the given filename and return
     # them in an Astro format.
 
-    filename = scope.get('filename')
-
-    # type checking
-    if filename.typeof() != 'str':
-        scope.throw(apy.errors.type_error, "'filename' has to be of type String")
-
     try:
-        with open(os.getcwd() + '/' + filename.get(), 'rb') as f:
-            data = f.read()
+        f = open(os.getcwd() + '/' + filename, 'rb', buffering=0)
     except Exception as e:
-        scope.throw(apy.errors.file_error, e)
-
-    global file
-    file = filename.get()
-    obj = deserialize(data)
-    scope.set('object', obj)
-    return scope.format()
+        apy.throw(apy.errors.file_error, e)
+
+    # The object is decoded while the file is being read
+    with f:
+        try:
+            return load(f)
+        except (ValueError, IndexError, struct.error) as e:
+            apy.throw(apy.errors.file_error, f"Deserialization of '{filename}' failed: {e}")
 
 
 def __build__():
@@ -154,7 +154,7 @@ def f_replace(scope: apy.Scope):
 
     string, __a, __b = fetch(scope, 'string', '__a', '__b')
     s = string.get().replace(__a.get(), __b.get())
-    scope.place(apy.models.Num.new('string', s))
+    scope.place(apy.models.String.new('string', s))
     return scope.format()
 
 
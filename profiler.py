@@ -0,0 +1,157 @@
+''' ASX Profiler '''
+# Counts & times every source line, user function and mixin of a script.
+# The interpreter reports the events (see LINE in asc.opcodes), the times
+# are measured here: self time is the time spent in the line/function
+# itself, cumulative time also includes the functions & mixins it called.
+# The results can be printed as a report, or saved as JSON or in the
+# pstats format (python -m pstats file.prof) for other tools.
+
+__version__ = '0.1'
+
+import marshal
+import json
+import time
+import os
+
+LINE = 0
+FUNCTION = 1
+
+
+class Profiler:
+    def __init__(self, timer=time.perf_counter):
+        self.timer = timer
+        self.lines = {}         # (file, line, function) -> [hits, self time, cumulative time]
+        self.functions = {}     # (file, line, name) -> [primitive calls, calls, self time, cumulative time, callers]
+        self.stack = []         # [kind, key, start, time of the children] of everything running right now
+        self.active = {}        # key -> times on the stack, recursive calls only count once for the cumulative time
+        self.total = 0.0
+
+    # Events, called by the interpreter
+
+    def line(self, code, line: int):    # A statement starts, the one before it in the same code is done
+        stack = self.stack
+        if stack and stack[-1][0] == LINE:
+            self.stop()
+        self.start(LINE, (code.filename, line, code.name))
+
+    def function(self, execute, code, frame=None):  # Runs execute(code, frame) as a function call
+        if code.name == '<module>':
+            key = (code.filename, 0, '<module>')
+        else:
+            key = (code.filename, code.firstline, code.name)
+        return self.call(key, execute, code, frame)
+
+    def mixin(self, mixin, scope: dict):
+        return self.call(('~', 0, f'<mixin {mixin.name}>'), mixin.execute, scope)
+
+    def call(self, key: tuple, function, *args):
+        depth = len(self.stack)
+        self.start(FUNCTION, key)
+        try:
+            return function(*args)
+        finally:
+            # The last line of the function is still running
+            while len(self.stack) > depth:
+                self.stop()
+
+    # Timing
+
+    def start(self, kind: int, key: tuple):
+        self.active[key] = self.active.get(key, 0) + 1
+        self.stack.append([kind, key, self.timer(), 0.0])
+
+    def stop(self):
+        kind, key, start, children = self.stack.pop()
+        elapsed = self.timer() - start
+        self.active[key] -= 1
+        outermost = self.active[key] == 0
+
+        if kind == LINE:
+            stats = self.lines.get(key)
+            if stats is None:
+                stats = self.lines[key] = [0, 0.0, 0.0]
+            stats[0] += 1
+            stats[1] += elapsed - children
+            if outermost:
+                stats[2] += elapsed
+        else:
+            stats = self.functions.get(key)
+            if stats is None:
+                stats = self.functions[key] = [0, 0, 0.0, 0.0, {}]
+            stats[0] += outermost
+            stats[1] += 1
+            stats[2] += elapsed - children
+            if outermost:
+                stats[3] += elapsed
+
+            # The caller is the closest function below on the stack
+            for entry in reversed(self.stack):
+                if entry[0] == FUNCTION:
+                    caller = stats[4].get(entry[1])
+                    if caller is None:
+                        caller = stats[4][entry[1]] = [0, 0, 0.0, 0.0]
+                    caller[0] += 1
+                    caller[1] += outermost
+                    caller[2] += elapsed - children
+                    if outermost:
+                        caller[3] += elapsed
+                    break
+
+        if self.stack:
+            # Lines only hand up the time of the functions they called, so the self time
+            # of a function is the time of its lines without the functions they called
+            self.stack[-1][3] += elapsed if kind == FUNCTION else children
+        else:
+            self.total += elapsed
+
+    # Results
+
+    def report(self, limit: int = 20) -> str:  # Readable report, the lines & functions taking the most time first
+        out = [f'Profile: {self.total:.6f}s in total', '',
+               f'Lines (top {limit} by self time)',
+               f'{"hits":>10} {"self":>11} {"cumulative":>11}  line']
+        lines = sorted(self.lines.items(), key=lambda item: item[1][1], reverse=True)
+        for (filename, line, function), (hits, self_time, cumulative) in lines[:limit]:
+            out.append(f'{hits:>10} {self_time:>10.6f}s {cumulative:>10.6f}s  '
+                       f'{os.path.basename(filename)}:{line} ({function})')
+
+        out += ['', f'Functions & mixins (top {limit} by cumulative time)',
+                f'{"calls":>10} {"self":>11} {"cumulative":>11}  function']
+        functions = sorted(self.functions.items(), key=lambda item: item[1][3], reverse=True)
+        for (filename, line, name), (primitive, calls, self_time, cumulative, _) in functions[:limit]:
+            count = str(calls) if calls == primitive else f'{calls}/{primitive}'
+            where = '' if filename == '~' else f'  {os.path.basename(filename)}:{line}'
+            out.append(f'{count:>10} {self_time:>10.6f}s {cumulative:>10.6f}s  {name}{where}')
+        return '\n'.join(out)
+
+    def to_dict(self) -> dict:
+        return {
+            'total': self.total,
+            'lines': [
+                {'file': key[0], 'line': key[1], 'function': key[2],
+                 'hits': stats[0], 'self': stats[1], 'cumulative': stats[2]}
+                for key, stats in sorted(self.lines.items(), key=lambda item: item[1][1], reverse=True)
+            ],
+            'functions': [
+                {'file': key[0], 'line': key[1], 'name': key[2],
+                 'calls': stats[1], 'primitive_calls': stats[0], 'self': stats[2], 'cumulative': stats[3],
+                 'callers': [{'file': caller[0], 'line': caller[1], 'name': caller[2], 'calls': values[0],
+                              'self': values[2], 'cumulative': values[3]} for caller, values in stats[4].items()]}
+                for key, stats in sorted(self.functions.items(), key=lambda item: item[1][3], reverse=True)
+            ]
+        }
+
+    def pstats(self) -> dict:   # The stats dict of the pstats module, only functions & mixins (lines have no place there)
+        return {
+            key: (primitive, calls, self_time, cumulative,
+                  {caller: tuple(values) for caller, values in callers.items()})
+            for key, (primitive, calls, self_time, cumulative, callers) in self.functions.items()
+        }
+
+    def dump(self, path: str):  # Saves the results, as JSON if the file ends with .json, in the pstats format otherwise
+        if path.endswith('.json'):
+            with open(path, 'w') as f:
+                json.dump(self.to_dict(), f, indent=1)
+        else:
+            with open(path, 'wb') as f:
+                marshal.dump(self.pstats(), f)
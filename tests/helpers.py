@@ -0,0 +1,15 @@
+""" Helpers shared by the tests. """
+import textwrap
+import io
+
+import interpreter as asx
+
+
+def run(source: str, out=None, **kw) -> tuple:
+    """ Runs the script without the parse cache, returns its output &
+    its return value. The output is written to the out stream if one is
+    given (the returned output is None then), else it's collected in a
+    StringIO. The keywords are passed to the Interpreter. """
+    stream = io.StringIO() if out is None else out
+    value = asx.Interpreter(out=stream, use_cache=False, **kw).run(textwrap.dedent(source))
+    return (stream.getvalue() if out is None else None), value
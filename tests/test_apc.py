@@ -0,0 +1,165 @@
+""" Tests of the parse cache. """
+from unittest import mock
+import tempfile
+import unittest
+import hashlib
+import json
+import os
+
+from asp import apc, asp3
+
+
+class CacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'script.asx')
+        self.write('x = 1\nsay x\n')
+        apc._memory.clear()
+        self.addCleanup(apc._memory.clear)
+
+    def write(self, source: str, mtime: int = None):
+        with open(self.path, 'w') as f:
+            f.write(source)
+        if mtime is not None:
+            os.utime(self.path, ns=(mtime, mtime))
+
+    def load(self, **kw):
+        """ Loads the script without the code kept in memory, returns
+        the code & whether it had to be parsed. """
+        apc._memory.clear()
+        with mock.patch.object(apc.asp3, 'parse', wraps=asp3.parse) as parse:
+            code = apc.load(self.path, **kw)
+        return code, parse.called
+
+    def key(self):
+        with open(apc.cache_path(self.path)) as f:
+            return json.load(f)['key']
+
+    def test_hit(self):
+        code, parsed = self.load()
+        self.assertTrue(parsed)
+        again, parsed = self.load()
+        self.assertFalse(parsed)
+        self.assertEqual(json.loads(json.dumps(code)), again)
+
+    def test_cache_file(self):
+        self.load()
+        path = apc.cache_path(self.path)
+        self.assertEqual(os.path.dirname(path), os.path.join(self.tmp.name, apc.CACHE_DIR))
+        self.assertEqual(os.listdir(os.path.dirname(path)), [os.path.basename(path)])
+
+        stat = os.stat(self.path)
+        with open(self.path, 'rb') as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        self.assertEqual(self.key(), {
+            'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'hash': digest,
+            'version': asp3.__version__, 'format': asp3.FORMAT, 'options': {}})
+
+    def test_changed_source(self):
+        self.load()
+        self.write('x = 2\nsay x, x\n')
+        code, parsed = self.load()
+        self.assertTrue(parsed)
+        self.assertEqual(len(code[2]['params']), 2)
+
+    def test_touched_source(self):
+        # A new mtime with the same content only updates the key
+        self.load()
+        self.write('x = 1\nsay x\n', mtime=10 ** 18)
+        code, parsed = self.load()
+        self.assertFalse(parsed)
+        self.assertEqual(self.key()['mtime'], 10 ** 18)
+
+    def test_same_size(self):
+        # The size is the same, the hash is not
+        self.load()
+        self.write('x = 7\nsay x\n', mtime=10 ** 18)
+        code, parsed = self.load()
+        self.assertTrue(parsed)
+        self.assertEqual(code[1]['data'], ('num', 7.0))
+
+    def test_version(self):
+        self.load()
+        with mock.patch.object(apc.asp3, '__version__', '0.0.0'):
+            code, parsed = self.load()
+            self.assertTrue(parsed)
+            self.assertEqual(self.key()['version'], '0.0.0')
+
+    def test_format(self):
+        self.load()
+        with mock.patch.object(apc.asp3, 'FORMAT', 'pax0'):
+            code, parsed = self.load()
+            self.assertTrue(parsed)
+
+    def test_options(self):
+        self.load()
+        code, parsed = self.load(assignment_kw='params')
+        self.assertTrue(parsed)
+        self.assertIn('params', code[1])
+        code, parsed = self.load(assignment_kw='params')
+        self.assertFalse(parsed)
+
+    def test_corrupt_file(self):
+        for content in ('{"key": {"mtime"', '[1, 2]', '{"key": 1}', '{"key": {}}', ''):
+            with self.subTest(content=content):
+                self.load()
+                stat = os.stat(self.path)
+                with open(apc.cache_path(self.path), 'w') as f:
+                    f.write(content)
+                code, parsed = self.load()
+                self.assertTrue(parsed)
+                self.assertEqual(code[1]['data'], ('num', 1.0))
+                self.assertEqual(self.key()['mtime'], stat.st_mtime_ns)
+
+    def test_missing_code(self):
+        self.load()
+        key = self.key()
+        with open(apc.cache_path(self.path), 'w') as f:
+            json.dump({'key': key}, f)
+        code, parsed = self.load()
+        self.assertTrue(parsed)
+
+
+class MemoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        apc._memory.clear()
+        self.addCleanup(apc._memory.clear)
+
+    def script(self, i: int) -> str:
+        path = os.path.join(self.tmp.name, f's{i}.asx')
+        if not os.path.exists(path):
+            with open(path, 'w') as f:
+                f.write(f'say {i}\n')
+        return path
+
+    def test_least_recently_used(self):
+        paths = [self.script(i) for i in range(apc.MEMORY_SIZE + 1)]
+        for path in paths[:-1]:
+            apc.load(path)
+        apc.load(paths[0])   # used again, the second one is the oldest now
+        apc.load(paths[-1])
+
+        self.assertEqual(len(apc._memory), apc.MEMORY_SIZE)
+        self.assertNotIn(paths[1], apc._memory)
+        self.assertEqual(list(apc._memory)[-2:], paths[::len(paths) - 1])
+
+        with mock.patch.object(apc, '_load', wraps=apc._load) as load:
+            apc.load(paths[0])
+            apc.load(paths[-1])
+            self.assertFalse(load.called)
+            apc.load(paths[1])
+            self.assertEqual(load.call_count, 1)
+        self.assertNotIn(paths[2], apc._memory)
+
+    def test_shared(self):
+        path = self.script(0)
+        self.assertIs(apc.load(path), apc.load(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+""" Tests of the vector operations of the Array mixin, on the python
+path & their parity with the numpy backend. """
+from unittest import mock
+import unittest
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'mixins'))
+
+import astropy as apy
+import m_array as ar
+
+
+def nums(*numbers):
+    return apy.NumArray(numbers)
+
+
+def values(result):
+    """ Returns the numbers of a NumArray result as a list. """
+    if isinstance(result, apy.NumArray):
+        return list(result.numbers())
+    return result
+
+
+class PythonTest(unittest.TestCase):
+    """ The operations without numpy, which is what runs for arrays
+    shorter than NUMPY_MIN anyway. """
+
+    def setUp(self):
+        patcher = mock.patch.object(ar, 'numpy', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertThrows(self, error, function, *args):
+        with self.assertRaises(RuntimeError) as e:
+            function(*args)
+        self.assertTrue(str(e.exception).startswith(f'{error}::'))
+
+    def test_add(self):
+        self.assertEqual(values(ar.f_add(nums(1, 2, 3), ('array', nums(10, 20, 30)))), [11, 22, 33])
+        self.assertEqual(values(ar.f_add(nums(1, 2), ('num', 0.5))), [1.5, 2.5])
+        self.assertEqual(values(ar.f_add(nums(), ('array', nums()))), [])
+        self.assertEqual(values(ar.f_add(nums(), ('num', 1.0))), [])
+
+    def test_mul(self):
+        self.assertEqual(values(ar.f_mul(nums(1, 2, 3), ('array', nums(2, 3, -1)))), [2, 6, -3])
+        self.assertEqual(values(ar.f_mul(nums(1, 2), ('num', 3.0))), [3, 6])
+        self.assertEqual(values(ar.f_mul(nums(), ('array', nums()))), [])
+
+    def test_list_of_numbers(self):
+        # Arrays built at runtime are lists of variables
+        buf = [('num', 1.0), ('num', 2.0)]
+        self.assertEqual(values(ar.f_add(buf, ('array', [('num', 1.0), ('num', 1.0)]))), [2, 3])
+        self.assertEqual(ar.f_max(buf), 2)
+
+    def test_elementwise_errors(self):
+        self.assertThrows(apy.errors.index_error, ar.f_add, nums(1, 2), ('array', nums(1)))
+        self.assertThrows(apy.errors.type_error, ar.f_mul, nums(1), ('str', 'a'))
+        self.assertThrows(apy.errors.type_error, ar.f_add, [('str', 'a')], ('num', 1.0))
+        self.assertThrows(apy.errors.type_error, ar.f_add, nums(1), ('array', [('str', 'a')]))
+
+    def test_min_max(self):
+        self.assertEqual(ar.f_min(nums(3, -1, 2)), -1)
+        self.assertEqual(ar.f_max(nums(3, -1, 2)), 3)
+        self.assertThrows(apy.errors.index_error, ar.f_min, nums())
+        self.assertThrows(apy.errors.index_error, ar.f_max, nums())
+
+    def test_cumsum(self):
+        self.assertEqual(values(ar.f_cumsum(nums(1, 2, 3, -4))), [1, 3, 6, 2])
+        self.assertEqual(values(ar.f_cumsum(nums())), [])
+
+    def test_argsort(self):
+        self.assertEqual(values(ar.f_argsort(nums(3, 1, 2))), [1, 2, 0])
+        self.assertEqual(values(ar.f_argsort(nums())), [])
+
+    def test_argsort_ties(self):
+        # Equal numbers keep their order
+        self.assertEqual(values(ar.f_argsort(nums(3, 1, 3, 1, 2))), [1, 3, 4, 0, 2])
+
+    def test_unique(self):
+        self.assertEqual(values(ar.f_unique(nums(3, 1, 3, 2, 1))), [1, 2, 3])
+        self.assertEqual(values(ar.f_unique(nums())), [])
+
+    def test_histogram(self):
+        self.assertEqual(values(ar.f_histogram(nums(0.5, 1.5, 1.7, 3.5), 4.0)), [1, 2, 0, 1])
+        self.assertEqual(values(ar.f_histogram(nums(1, 2), 1.0)), [2])
+
+    def test_histogram_edges(self):
+        # A number on an edge falls into the bin right of it, the largest
+        # number into the last bin
+        self.assertEqual(values(ar.f_histogram(nums(0, 1, 2, 3, 4), 4.0)), [1, 1, 1, 2])
+        self.assertEqual(values(ar.f_histogram(nums(0, 0.1, 0.2, 0.3), 3.0)), [1, 1, 2])
+
+    def test_histogram_without_range(self):
+        self.assertEqual(values(ar.f_histogram(nums(), 3.0)), [0, 0, 0])
+        self.assertEqual(values(ar.f_histogram(nums(5, 5, 5), 2.0)), [0, 3])
+
+    def test_histogram_bins(self):
+        self.assertThrows(apy.errors.index_error, ar.f_histogram, nums(1, 2), 0.0)
+
+
+@unittest.skipUnless(ar.numpy, 'numpy is not installed')
+class ParityTest(unittest.TestCase):
+    """ The numpy backend has to give the same results as the python
+    loops, for arrays long enough to be handed to numpy. """
+
+    SIZE = 2 * ar.NUMPY_MIN
+
+    def setUp(self):
+        # Ties, negative numbers & fractions
+        self.arrays = [
+            [float((i * 37) % 101 - 50) for i in range(self.SIZE)],
+            [i / 10 for i in range(self.SIZE)],
+            [float(i % 3) for i in range(self.SIZE)],
+            [7.0] * self.SIZE
+        ]
+
+    def assertParity(self, function, *args):
+        for numbers in self.arrays:
+            with self.subTest(function=function.__name__, numbers=numbers[:4]):
+                self.assertIsNotNone(ar.vector(nums(*numbers).numbers()))
+                vectorized = values(function(nums(*numbers), *args))
+                with mock.patch.object(ar, 'numpy', None):
+                    python = values(function(nums(*numbers), *args))
+                self.assertEqual(vectorized, python)
+
+    def test_add(self):
+        self.assertParity(ar.f_add, ('num', 1.5))
+        self.assertParity(ar.f_add, ('array', nums(*range(self.SIZE))))
+
+    def test_mul(self):
+        self.assertParity(ar.f_mul, ('num', -2.0))
+        self.assertParity(ar.f_mul, ('array', nums(*range(self.SIZE))))
+
+    def test_min_max(self):
+        self.assertParity(ar.f_min)
+        self.assertParity(ar.f_max)
+
+    def test_cumsum(self):
+        self.assertParity(ar.f_cumsum)
+
+    def test_argsort(self):
+        self.assertParity(ar.f_argsort)
+
+    def test_unique(self):
+        self.assertParity(ar.f_unique)
+
+    def test_histogram(self):
+        for bins in (1.0, 4.0, 7.0, 10.0):
+            self.assertParity(ar.f_histogram, bins)
+
+
+if __name__ == '__main__':
+    unittest.main()
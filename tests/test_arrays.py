@@ -0,0 +1,61 @@
+""" Tests of the compact arrays of numbers (astropy.NumArray). """
+import unittest
+
+import asp.asp3 as asp
+import asc
+from asc import opcodes as op
+from astropy import NumArray
+from helpers import run
+
+
+class NumArrayTest(unittest.TestCase):
+
+    def test_pack(self):
+        array = NumArray.pack([('num', 1.0), ('num', 2.5)])
+        self.assertTrue(array.numeric)
+        self.assertEqual(list(array), [('num', 1.0), ('num', 2.5)])
+        self.assertEqual(array[1], ('num', 2.5))
+        self.assertIsNone(NumArray.pack([('num', 1.0), ('str', 'a')]))
+
+    def test_set_number(self):
+        array = NumArray([1, 2])
+        array[0] = ('num', 5.0)
+        self.assertTrue(array.numeric)
+        self.assertEqual(array.tolist(), [('num', 5.0), ('num', 2.0)])
+
+    def test_set_other(self):
+        array = NumArray([1, 2])
+        array[0] = ('str', 'a')
+        self.assertFalse(array.numeric)
+        self.assertEqual(array.tolist(), [('str', 'a'), ('num', 2.0)])
+        with self.assertRaises(TypeError):
+            array.numbers()
+
+    def test_concatenation(self):
+        self.assertIsInstance(NumArray([1]) + [('num', 2.0)], NumArray)
+        self.assertEqual(NumArray([1]) + [('str', 'a')], [('num', 1.0), ('str', 'a')])
+
+    def test_compiled_literal(self):
+        parsed = asp.parse(['x = [1, 2, 3]\n', 'y = [1, "a"]\n'], assignment_kw='params')
+        code = asc.compile_code(parsed, assignment_kw='params')
+        self.assertEqual(code.ops[::2], [op.BUILD_NUMBERS, op.STORE_NAME,
+                                         op.LOAD_CONST, op.LOAD_CONST, op.BUILD_ARRAY, op.STORE_NAME])
+        self.assertIn((1.0, 2.0, 3.0), code.consts)
+
+    def test_literal_at_runtime(self):
+        out, _ = run('''
+            import Array
+            a = [3, 1, 2]
+            b = Array.sort(a)
+            c = Array.sum(a)
+            s = "x"
+            d = Array.put(a, s)
+            say b
+            say c
+            say d
+        ''')
+        self.assertEqual(out, '[1.0, 2.0, 3.0]\n6.0\n[3.0, 1.0, 2.0, "x"]\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+""" Tests of the astropy objects passed to the mixins. """
+from unittest import mock
+import unittest
+
+import astropy as apy
+from astropy import models
+from helpers import run
+import interpreter as asx
+
+
+@apy.native(returns='result', n='num', s='str', b='bool', buf='array', m='map', item='any')
+def f_native(n, s, b, buf, m, item):
+    return [('num', n), ('str', s), ('bool', b), ('num', float(len(buf))), ('num', float(len(m))), item]
+
+
+class ScopeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data = {
+            'a': ('num', 1.0),
+            's': ('str', 'abc'),
+            'm': ('map', {('str', 'k'): ('num', 2.0)})
+        }
+
+    def test_models_on_first_access(self):
+        with mock.patch.object(models, 'create', wraps=models.create) as create:
+            scope = apy.Scope(self.data)
+            create.assert_not_called()
+            a = scope.get('a')
+            self.assertIs(scope.get('a'), a)
+        create.assert_called_once_with('a', ('num', 1.0))
+        self.assertEqual((a.nameof(), a.typeof(), a.get()), ('a', 'num', 1.0))
+
+    def test_missing_variable(self):
+        scope = apy.Scope(self.data)
+        self.assertIsNone(scope.get('x'))
+        self.assertEqual(scope.get('x', 0), 0)
+        self.assertEqual(scope.format(), {})
+
+    def test_format_only_used(self):
+        scope = apy.Scope(self.data)
+        scope.get('s')
+        self.assertEqual(scope.format(), {'s': ('str', 'abc')})
+
+    def test_assign(self):
+        scope = apy.Scope(self.data)
+        scope.get('a')
+        num = models.Num.new('a', 5)
+        scope.set('a', num)
+        self.assertIs(scope.get('a'), num)
+        scope.place(models.String.new('t', 'new'))
+        self.assertEqual(scope.get('t').get(), 'new')
+        self.assertEqual(scope.format(), {'a': ('num', 5.0), 't': ('str', 'new')})
+        # The raw variables are left to the interpreter
+        self.assertEqual(self.data['a'], ('num', 1.0))
+
+    def test_assign_array(self):
+        scope = apy.Scope({})
+        scope.set('b', models.Array.new('b', [models.Num.new('', 1), models.String.new('', 'x')]))
+        self.assertEqual(scope.format(), {'b': ('array', [('num', 1.0), ('str', 'x')])})
+
+    def test_assign_non_model(self):
+        with self.assertRaises(TypeError):
+            apy.Scope(self.data).set('a', ('num', 1.0))
+
+    def test_delete(self):
+        scope = apy.Scope(self.data)
+        scope.get('m').delete(('str', 'k'))
+        self.assertNotIn(('str', 'k'), scope.get('m'))
+        self.assertEqual(scope.format(), {'m': ('map', {})})
+
+    def test_scopes_do_not_share(self):
+        first = apy.Scope(self.data)
+        first.set('x', models.Num.new('x', 1))
+        second = apy.Scope(self.data)
+        self.assertIsNone(second.get('x'))
+        self.assertEqual(second.format(), {})
+
+
+class NativeMixinTest(unittest.TestCase):
+
+    def setUp(self):
+        self.mixin = apy.render(f_native, '__Test', 'native')
+        self.data = {
+            'n': ('num', 1.5),
+            's': ('str', 'abc'),
+            'b': ('bool', True),
+            'buf': ('array', [('num', 1.0)]),
+            'm': ('map', {}),
+            'item': ('str', 'x')
+        }
+
+    def assertThrows(self, error, message, data):
+        with self.assertRaises(RuntimeError) as e:
+            self.mixin.execute(data)
+        self.assertEqual(str(e.exception), f'{error}::{message}')
+
+    def test_render(self):
+        self.assertIsInstance(self.mixin, apy.NativeMixin)
+        self.assertEqual(self.mixin.name, '__Test#native')
+        self.assertEqual(self.mixin.result, 'result')
+
+    def test_arguments(self):
+        self.assertEqual(self.mixin.execute(self.data), {'result': ('array', [
+            ('num', 1.5), ('str', 'abc'), ('bool', True), ('num', 1.0), ('num', 0.0), ('str', 'x')])})
+
+    def test_any(self):
+        for item in (('num', 2.0), ('array', []), ('map', {})):
+            with self.subTest(item=item):
+                self.data['item'] = item
+                self.assertIs(self.mixin.execute(self.data)['result'][1][-1], item)
+
+    def test_wrong_type(self):
+        for name, value in (('n', ('str', '1')), ('s', ('num', 1.0)), ('b', ('num', 1.0)),
+                            ('buf', ('str', 'ab')), ('m', ('array', []))):
+            with self.subTest(name=name):
+                data = dict(self.data, **{name: value})
+                type_ = f_native.__native__[1][name]
+                self.assertThrows(apy.errors.type_error, f"'{name}' parameter has to be of type {type_}", data)
+
+    def test_missing(self):
+        del self.data['s']
+        self.assertThrows(apy.errors.undef_parameter, "'s' is not defined", self.data)
+
+    def test_results(self):
+        for value, expected in ((2, ('num', 2)), (1.5, ('num', 1.5)), (False, ('bool', False)),
+                                ('a', ('str', 'a')), ([], ('array', [])), ({}, ('map', {})),
+                                (None, ('null', None)), (('num', 1.0), ('num', 1.0))):
+            with self.subTest(value=value):
+                self.assertEqual(apy.objects.wrap(value), expected)
+        with self.assertRaises(TypeError):
+            apy.objects.wrap(object())
+
+    def test_invalid_type(self):
+        with self.assertRaises(RuntimeError):
+            apy.native(returns='result', n='number')
+
+    def test_script(self):
+        out, _ = run('import Array\na = [1, 2]\nx = Array.len(a)\nsay x\n')
+        self.assertEqual(out, '2\n')
+        with self.assertRaises(asx.ScriptError) as e:
+            run('import Array\ns = "ab"\nx = Array.len(s)\n')
+        self.assertEqual(e.exception.ErrorType, asx.type_error)
+        self.assertIn("'buf' parameter has to be of type array", str(e.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+""" Tests of the batch runner, on both of its pools. """
+import contextlib
+import tempfile
+import unittest
+import io
+import os
+
+import batch
+
+SCRIPTS = {
+    'loop.asx': 'i = 0\nwhile i < 3:\n    i = i + 1\n    say i\n',
+    'lib/array.asx': 'import Array\na = [3, 1, 2]\nsay Array.sort(a), Array.sum(a)\n',
+    'lib/nested/string.asx': 'import String\nsay String.upper("abc")\n',
+    'undefined.asx': 'say 1\nsay x\nsay 2\n',
+    'syntax.asx': 'say 1\nx = = 1\n',
+}
+
+OUTPUTS = {
+    'loop.asx': '1.0\n2.0\n3.0\n',
+    'lib/array.asx': '[1.0, 2.0, 3.0] 6.0\n',
+    'lib/nested/string.asx': 'ABC\n',
+}
+
+
+class BatchTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(tmp.name)
+        for name, source in SCRIPTS.items():
+            os.makedirs(os.path.dirname(os.path.join('scripts', name)), exist_ok=True)
+            with open(os.path.join('scripts', name), 'w') as f:
+                f.write(source)
+        self.addCleanup(batch.options.clear)
+
+    def run_batch(self, *argv):
+        """ Returns the exit status & the printed report. """
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out), self.assertRaises(SystemExit) as exit:
+            batch.main(['scripts', '--output', 'out', *argv])
+        return exit.exception.code, out.getvalue()
+
+    def output(self, name: str) -> str:
+        with open(os.path.join('out', 'scripts', name + '.out')) as f:
+            return f.read()
+
+    def assertResults(self, status: int, report: str, pool: str):
+        self.assertEqual(status, 1)
+        self.assertIn(f'5 scripts, 2 failed, 2 {pool}', report)
+        for name, expected in OUTPUTS.items():
+            with self.subTest(name=name):
+                self.assertEqual(self.output(name), expected)
+        self.assertEqual(self.output('undefined.asx').splitlines(),
+                         ['1.0', '[UndefinedVariable] | Variable "x" undefined'])
+        self.assertTrue(self.output('syntax.asx').startswith('[SyntaxError]'))
+
+    def test_processes(self):
+        self.assertResults(*self.run_batch('-j', '2'), 'processes')
+
+    def test_threads(self):
+        self.assertResults(*self.run_batch('-j', '2', '-t'), 'threads')
+
+    def test_pools_agree(self):
+        outputs = []
+        for argv in (('-j', '2'), ('-j', '4', '-t'), ('-j', '1', '-n')):
+            self.run_batch(*argv)
+            outputs.append({name: self.output(name) for name in SCRIPTS})
+        self.assertEqual(outputs[1:], outputs[:1] * 2)
+
+    def test_ignore_errors(self):
+        # Like the interpreter, syntax errors are reported & ignored too
+        status, report = self.run_batch('-j', '2', '-o')
+        self.assertEqual(status, 0)
+        self.assertIn('5 scripts, 0 failed', report)
+        self.assertEqual(self.output('undefined.asx').splitlines()[-1], '2.0')
+        self.assertTrue(self.output('syntax.asx').startswith('[SyntaxError]'))
+
+    def test_quiet(self):
+        os.remove(os.path.join('scripts', 'syntax.asx'))
+        os.remove(os.path.join('scripts', 'undefined.asx'))
+        status, report = self.run_batch('-q', '-t')
+        self.assertEqual(status, 0)
+        self.assertNotIn('ok', report)
+        self.assertIn('3 scripts, 0 failed', report)
+
+    def test_find_scripts(self):
+        self.assertEqual(batch.find_scripts(['scripts']), sorted(
+            os.path.join('scripts', name) for name in SCRIPTS))
+        self.assertEqual(batch.find_scripts([os.path.join('scripts', '*.asx'), os.path.join('scripts', 'loop.asx')]), [
+            os.path.join('scripts', 'loop.asx'), os.path.join('scripts', 'syntax.asx'),
+            os.path.join('scripts', 'undefined.asx'), os.path.join('scripts', 'loop.asx')])
+
+    def test_output_path(self):
+        self.assertEqual(batch.output_path('out', os.path.join('scripts', 'loop.asx')),
+                         os.path.join('out', 'scripts', 'loop.asx.out'))
+        # Scripts outside the working directory keep their absolute path
+        outside = os.path.join(os.path.dirname(os.getcwd()), 'a.asx')
+        self.assertEqual(batch.output_path('out', outside),
+                         os.path.join('out', outside.lstrip(os.sep) + '.out'))
+
+    def test_run_script(self):
+        batch.warm_up(False, False, None)
+        script, status, seconds = batch.run_script(os.path.join('scripts', 'loop.asx'))
+        self.assertEqual((script, status), (os.path.join('scripts', 'loop.asx'), 0))
+        self.assertGreaterEqual(seconds, 0)
+        self.assertEqual(batch.run_script(os.path.join('scripts', 'syntax.asx'))[1], 1)
+        self.assertFalse(os.path.exists('out'))
+
+
+if __name__ == '__main__':
+    unittest.main()
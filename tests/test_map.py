@@ -0,0 +1,63 @@
+""" Tests of the Map type, its literals & the Map library. """
+import unittest
+
+import asp.asp3 as asp
+import asc
+from asc import opcodes as op
+from astropy.models import Map
+from helpers import run
+import interpreter as asx
+
+
+class MapTest(unittest.TestCase):
+
+    def test_keys(self):
+        self.assertEqual(Map.key(('num', 1.0)), ('num', 1.0))
+        self.assertNotEqual(Map.key(('num', 1.0)), Map.key(('bool', True)))
+        with self.assertRaises(TypeError):
+            Map.key(('array', []))
+
+    def test_compiled_literal(self):
+        parsed = asp.parse(['x = {"a": 1, "b": y}\n'], assignment_kw='params')
+        code = asc.compile_code(parsed, assignment_kw='params')
+        self.assertEqual(code.ops[::2], [op.LOAD_CONST, op.LOAD_CONST, op.LOAD_CONST, op.LOAD_NAME,
+                                         op.BUILD_MAP, op.STORE_NAME])
+        self.assertEqual(code.ops[-3], 2)
+
+    def test_index(self):
+        self.assertEqual(run('m = {1: "one", "a": 2}\nb = m[1]\nsay b\nsay m\n')[0],
+                         'one\n{1.0: "one", "a": 2.0}\n')
+
+    def test_missing_index(self):
+        with self.assertRaises(asx.ScriptError) as e:
+            run('m = {1: "one"}\nb = m[2]\n')
+        self.assertEqual(e.exception.ErrorType, asx.index_error)
+
+    def test_library(self):
+        out, _ = run('''
+            import Map
+            m = {"a": 1}
+            k = "b"
+            v = 2
+            m = Map.set(m, k, v)
+            x = Map.get(m, k)
+            say x
+            say Map.has(m, k), Map.len(m)
+            m = Map.delete(m, k)
+            say Map.keys(m), Map.values(m)
+        ''')
+        self.assertEqual(out, '2.0\nTrue 2\n["a"] [1.0]\n')
+
+    def test_missing_key(self):
+        with self.assertRaises(asx.ScriptError) as e:
+            run('import Map\nm = {"a": 1}\nk = "b"\nx = Map.get(m, k)\n')
+        self.assertEqual(e.exception.ErrorType, asx.index_error)
+
+    def test_invalid_key(self):
+        with self.assertRaises(asx.ScriptError) as e:
+            run('import Map\nm = {"a": 1}\nk = [1, 2]\nx = Map.get(m, k)\n')
+        self.assertEqual(e.exception.ErrorType, asx.type_error)
+
+
+if __name__ == '__main__':
+    unittest.main()
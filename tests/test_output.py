@@ -0,0 +1,105 @@
+""" Tests of the buffered output of the interpreter. """
+from unittest import mock
+import contextlib
+import unittest
+import io
+
+from helpers import run
+import interpreter as asx
+
+
+class Stream:
+    """ Records every write & flush, a terminal if tty is set. """
+
+    def __init__(self, tty: bool = False):
+        self.tty = tty
+        self.writes = []
+        self.flushes = 0
+
+    def isatty(self):
+        return self.tty
+
+    def write(self, text: str):
+        self.writes.append(text)
+
+    def flush(self):
+        self.flushes += 1
+
+
+class PlainStream(Stream):
+    """ A stream without isatty(), like the output of the server. """
+    isatty = None
+
+
+class OutputTest(unittest.TestCase):
+
+    def test_terminal(self):
+        stream = Stream(tty=True)
+        self.assertEqual(asx.Output(stream).buffer_size, 0)
+        run('say 1\nsay 2\n', out=stream)
+        self.assertEqual(stream.writes, ['1.0\n', '2.0\n'])
+        self.assertEqual(stream.flushes, 2)
+
+    def test_file(self):
+        for stream in (Stream(), PlainStream()):
+            with self.subTest(stream=type(stream).__name__):
+                self.assertEqual(asx.Output(stream).buffer_size, asx.Output.BUFFER_SIZE)
+                run('say 1\nsay 2\n', out=stream)
+                self.assertEqual(stream.writes, ['1.0\n2.0\n'])
+
+    def test_buffer_size(self):
+        stream = Stream(tty=True)
+        output = asx.Output(stream, buffer_size=8)
+        for _ in range(3):
+            output.write('abc\n')
+        self.assertEqual(stream.writes, ['abc\nabc\n'])
+        output.flush()
+        output.flush()
+        self.assertEqual(stream.writes, ['abc\nabc\n', 'abc\n'])
+
+    def test_unbuffered_option(self):
+        stream = Stream()
+        run('say 1\nsay 2\n', out=stream, buffer_size=0)
+        self.assertEqual(stream.writes, ['1.0\n', '2.0\n'])
+
+    def test_pause(self):
+        # Everything said before a pause is written out before sleeping
+        stream = Stream()
+        written = []
+        with mock.patch.object(asx, 'sleep', lambda _: written.append(''.join(stream.writes))):
+            run('say 1\npause 1\nsay 2\n', out=stream)
+        self.assertEqual(written, ['1.0\n'])
+        self.assertEqual(''.join(stream.writes), '1.0\n2.0\n')
+
+    def test_error(self):
+        stream = Stream()
+        with self.assertRaises(asx.ScriptError):
+            run('say 1\nsay x\nsay 2\n', out=stream)
+        self.assertEqual(len(stream.writes), 1)
+        self.assertEqual(stream.writes[0].splitlines(),
+                         ['1.0', '[UndefinedVariable] | Variable "x" undefined'])
+
+    def test_ignored_errors(self):
+        # The error messages are buffered in order with the said lines
+        stream = Stream()
+        run('say 1\nsay x\nsay 2\n', out=stream, ignore_errors=True)
+        lines = ''.join(stream.writes).splitlines()
+        self.assertEqual(lines[0], '1.0')
+        self.assertTrue(lines[1].startswith('[UndefinedVariable]'))
+        self.assertEqual(lines[-1], '2.0')
+
+    def test_return(self):
+        stream = Stream()
+        run('say 1\nreturn 2\nsay 3\n', out=stream)
+        self.assertEqual(stream.writes, ['1.0\n'])
+
+    def test_stdout(self):
+        # Without a stream, sys.stdout is looked up when flushing
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            asx.Interpreter(use_cache=False).run('say 1\n')
+        self.assertEqual(out.getvalue(), '1.0\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
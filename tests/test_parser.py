@@ -0,0 +1,206 @@
+""" Tests of the asp3 parser. """
+import unittest
+
+import asp.asp3 as asp
+
+
+def parse(*lines):
+    return asp.parse([line + '\n' for line in lines])[1:]
+
+
+class CallTest(unittest.TestCase):
+
+    def test_call_arguments(self):
+        code = parse('say Foo.bar(a, 2), x')
+        params = code[0]['params']
+        self.assertEqual(params, [
+            ('call', {'module': 'Foo', 'name': 'bar', 'params': [('var', 'a'), ('num', 2.0)]}),
+            ('var', 'x')])
+
+    def test_nested_calls(self):
+        code = parse('say Foo.a(Foo.b(m, 1), 2), x')
+        params = code[0]['params']
+        self.assertEqual(len(params), 2)
+        self.assertEqual(params[0][1]['params'][0][1]['name'], 'b')
+        self.assertEqual(params[0][1]['params'][1], ('num', 2.0))
+        self.assertEqual(params[1], ('var', 'x'))
+
+
+class MapTest(unittest.TestCase):
+
+    def test_statement_with_map_call(self):
+        code = parse('say Map.get(m, 2)')
+        self.assertEqual(code[0]['params'], [('call', {
+            'module': 'Map', 'name': 'get', 'params': [('var', 'm'), ('num', 2.0)]})])
+
+    def test_map_literal(self):
+        code = parse('x = {1: "one", "a": True}')
+        self.assertEqual(code[0]['data'], ('map', [[('num', 1.0), ('str', 'one')],
+                                                   [('str', 'a'), ('bool', True)]]))
+
+    def test_map_with_call(self):
+        code = parse('x = {1: Map.get(m, 1), 2: 3}')
+        pairs = code[0]['data'][1]
+        self.assertEqual(pairs[0][1][1]['params'], [('var', 'm'), ('num', 1.0)])
+        self.assertEqual(pairs[1], [('num', 2.0), ('num', 3.0)])
+
+    def test_invalid_map_item(self):
+        with self.assertRaises(SyntaxError):
+            parse('x = {1 2}')
+
+
+class StatementTest(unittest.TestCase):
+    """ The types of statements, the way the parser before the lexer
+    told them apart. """
+
+    def test_element_assignment(self):
+        code = parse('arr[0] = 3')
+        self.assertEqual(code[0], {'line': 1, 'type': 'assignment', 'var': 'arr[0]', 'data': ('num', 3.0)})
+
+    def test_bare_import(self):
+        self.assertEqual(parse('import')[0], {'line': 1, 'type': 'statement', 'name': 'import', 'params': []})
+        self.assertEqual(parse('delete')[0], {'line': 1, 'type': 'statement', 'name': 'delete', 'params': []})
+
+    def test_import(self):
+        self.assertEqual(parse('import Array')[0], {'line': 1, 'type': 'import', 'name': 'Array'})
+        self.assertEqual(parse('delete x')[0], {'line': 1, 'type': 'delete', 'var': 'x'})
+
+    def test_comparison_statement(self):
+        with self.assertRaises(SyntaxError):
+            parse('x == 1')
+
+    def test_statement(self):
+        self.assertEqual(parse('say x, 1')[0]['params'], [('var', 'x'), ('num', 1.0)])
+        self.assertEqual(parse('say')[0]['params'], [])
+
+    def test_block_without_colon(self):
+        with self.assertRaises(SyntaxError):
+            parse('if x', '    say 1')
+
+
+class ValueTest(unittest.TestCase):
+    """ The values are parsed from the tokens, like the parser before the
+    lexer did, apart from a few cases it got wrong. """
+
+    def test_single_element_array(self):
+        self.assertEqual(parse('x = [1]')[0]['data'], ('array', [('num', 1.0)]))
+        self.assertEqual(parse('x = []')[0]['data'], ('array', []))
+        self.assertEqual(parse('x = [[1, 2], [3]]')[0]['data'], ('array', [
+            ('array', [('num', 1.0), ('num', 2.0)]), ('array', [('num', 3.0)])]))
+
+    def test_element(self):
+        self.assertEqual(parse('say a[12]')[0]['params'], [('elm', {'var': 'a', 'element': 12})])
+
+    def test_call_without_params(self):
+        self.assertEqual(parse('foo()')[0]['params'], [])
+        self.assertEqual(parse('x = Foo.bar()')[0]['data'][1]['params'], [])
+
+    def test_strings(self):
+        self.assertEqual(parse('say "a, b", c')[0]['params'], [('str', 'a, b'), ('var', 'c')])
+        self.assertEqual(parse('x = "a = b\\q"')[0]['data'], ('str', 'a = b"'))
+        self.assertEqual(parse('x = Foo.bar("a")')[0]['data'][1]['params'], [('str', 'a')])
+
+    def test_numbers(self):
+        for text, number in (('1', 1.0), ('1.5', 1.5), ('-1', -1.0), ('1e3', 1000.0), ('.5', 0.5),
+                             ('-2.5e-3', -0.0025), ('+1E+2', 100.0)):
+            with self.subTest(text=text):
+                self.assertEqual(parse(f'x = {text}')[0]['data'], ('num', number))
+
+    def test_math(self):
+        self.assertEqual(parse('x = a == b')[0]['data'], ('math', ['a', 'CEQ', 'b']))
+        self.assertEqual(parse('x = -a')[0]['data'], ('math', ['SUB', 'a']))
+        self.assertEqual(parse('x = a < b <= 2')[0]['data'], ('math', ['a', 'CSM', 'b', 'CSE', 2.0]))
+        self.assertEqual(parse('say Foo.len(b, 1) + 1')[0]['params'], [
+            ('math', ['Foo.len', 'BRO', 'b,1', 'BRC', 'ADD', 1.0])])
+
+    def test_strings_in_math(self):
+        self.assertEqual(parse('x = a + "b\\n"')[0]['data'], ('math', ['a', 'ADD', ('str', 'b\n')]))
+        self.assertEqual(parse('say Foo.f(1, "a,b") + "c"')[0]['params'], [
+            ('math', ['Foo.f', 'BRO', '1,', ('str', 'a,b'), 'BRC', 'ADD', ('str', 'c')])])
+        self.assertEqual(parse('if x == "abc":', '    say 1')[0]['condition'], ['x', 'CEQ', ('str', 'abc')])
+
+    def test_conditions(self):
+        self.assertEqual(parse('if x:', '    say 1')[0]['condition'], ['x'])
+        self.assertEqual(parse('if 1:', '    say 1')[0]['condition'], [1.0])
+        self.assertEqual(parse('if a[0]:', '    say 1')[0]['condition'], ['a[0]'])
+        self.assertEqual(parse('while x < 2:', '    say 1')[0]['condition'], ['x', 'CSM', 2.0])
+
+    def test_header(self):
+        self.assertEqual(parse('#f(a, b):', '    say a')[0]['parameters'], ['a', 'b'])
+        self.assertEqual(parse('#f():', '    say 1')[0]['parameters'], [''])
+
+
+class BlockTest(unittest.TestCase):
+
+    def test_nesting(self):
+        code = parse('if x:', '    while y:', '        say 1', '    say 2', 'say 3')
+        self.assertEqual([s['line'] for s in code], [1, 5])
+        self.assertEqual([s['line'] for s in code[0]['code']], [2, 4])
+        self.assertEqual(code[0]['code'][0]['code'][0]['line'], 3)
+
+    def test_stream(self):
+        lines = ['#f(a):\n', '    return a\n', 'say 1\n', 'if x:\n', '    say 2\n']
+        streamed = list(asp.parse_stream(iter(lines)))[1:]
+        self.assertEqual(streamed, asp.parse(lines)[1:])
+
+    def test_empty_block(self):
+        for lines in (('x = 1', 'if x:', 'say 1'),
+                      ('while x:', ),
+                      ('if x:', '    if y:', '    say 1'),
+                      ('#f(a):', 'say 1')):
+            with self.subTest(lines=lines):
+                with self.assertRaises(SyntaxError):
+                    parse(*lines)
+                with self.assertRaises(SyntaxError):
+                    list(asp.parse_stream(line + '\n' for line in lines))
+
+
+class SyntaxErrorTest(unittest.TestCase):
+    """ Lines the statement parsers can't make sense of are reported as
+    a SyntaxError of their line, not as the error of the parser. """
+
+    def assertInvalid(self, *lines, line=1):
+        with self.assertRaises(SyntaxError) as e:
+            parse(*lines)
+        self.assertIn(f'line {line}', str(e.exception))
+
+    def test_unclosed_call(self):
+        self.assertInvalid('x = Foo.bar(1')
+        self.assertInvalid('say Foo.bar(')
+        self.assertInvalid('x = 1', 'say Foo.len(x,', line=2)
+
+    def test_double_assignment(self):
+        self.assertInvalid('x = a = 1')
+
+    def test_invalid_header(self):
+        self.assertInvalid('#f(a)(b):')
+        self.assertInvalid('#f(a b):')
+
+    def test_unmatched_bracket(self):
+        self.assertInvalid('say a)')
+        self.assertInvalid('x = (1')
+        self.assertInvalid('x = [1, 2')
+
+    def test_missing_value(self):
+        self.assertInvalid('x =')
+        self.assertInvalid('x = [1, 2,]')
+        self.assertInvalid('say a,, b')
+
+    def test_split_numbers(self):
+        # Whitespace between the parts of a number is not ignored
+        self.assertInvalid('x = 1 2')
+        self.assertInvalid('say 1 2')
+        self.assertInvalid('x = 1 e 5')
+        self.assertInvalid('x = 1e 5')
+        self.assertInvalid('x = a + 1 2')
+        self.assertInvalid('x = 1 + a b')
+
+    def test_string_in_math(self):
+        self.assertInvalid('x = a "b"')
+        self.assertInvalid('x = "a" "b" + c')
+        self.assertInvalid('say "a" b')
+        self.assertInvalid('if a "b":', '    say 1')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+""" Tests of the profiler & the LINE instructions it needs. """
+import unittest
+import io
+
+import asp.asp3 as asp
+import asc
+from asc import opcodes as op
+from profiler import Profiler
+import interpreter as asx
+
+SOURCE = '''#double(n):
+    return n * 2
+i = 0
+while i < 3:
+    i = double(i) + 1
+say i
+'''
+
+
+class ProfilerTest(unittest.TestCase):
+
+    def test_line_instructions(self):
+        parsed = asp.parse(['x = 1\n', 'y = 2\n'], assignment_kw='params')
+        code = asc.compile_code(parsed, assignment_kw='params', profile=True)
+        self.assertEqual([arg for opcode, arg in zip(code.ops[::2], code.ops[1::2]) if opcode == op.LINE], [1, 2])
+
+    def test_no_line_instructions(self):
+        parsed = asp.parse(['x = 1\n', 'y = 2\n'], assignment_kw='params')
+        code = asc.compile_code(parsed, assignment_kw='params')
+        self.assertNotIn(op.LINE, code.ops[::2])
+
+    def test_counts(self):
+        profiler = Profiler()
+        out = io.StringIO()
+        asx.Interpreter(out=out, use_cache=False, profiler=profiler).run(SOURCE)
+        self.assertEqual(out.getvalue(), '3.0\n')
+
+        hits = {(line, function): stats[0] for (_, line, function), stats in profiler.lines.items()}
+        self.assertEqual(hits[(5, '<module>')], 2)
+        self.assertEqual(hits[(2, 'double')], 2)
+        self.assertEqual(hits[(6, '<module>')], 1)
+
+        calls = {name: stats[1] for (_, _, name), stats in profiler.functions.items()}
+        self.assertEqual(calls['double'], 2)
+        self.assertEqual(calls['<module>'], 1)
+
+    def test_times(self):
+        ticks = iter(range(1000000))
+        profiler = Profiler(timer=lambda: next(ticks))
+        asx.Interpreter(out=io.StringIO(), use_cache=False, profiler=profiler).run(SOURCE)
+        module = [stats for key, stats in profiler.functions.items() if key[2] == '<module>'][0]
+        # The program runs for the whole time, the self times add up to it
+        self.assertEqual(module[3], profiler.total)
+        self.assertEqual(sum(stats[2] for stats in profiler.functions.values()), profiler.total)
+        self.assertIn('double', profiler.report())
+
+
+if __name__ == '__main__':
+    unittest.main()
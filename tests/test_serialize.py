@@ -0,0 +1,232 @@
+""" Tests of the Serialize mixin, format 002 & reading format 001. """
+import tracemalloc
+import tempfile
+import unittest
+import os
+import io
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'mixins'))
+
+import astropy as apy
+import m_serialize as ser
+
+
+def num(n):
+    return 'num', float(n)
+
+
+def string(s):
+    return 'str', s
+
+
+def array(*items):
+    return 'array', list(items)
+
+
+def map_(*pairs):
+    return 'map', dict(pairs)
+
+
+class RoundTripTest(unittest.TestCase):
+
+    def assertRoundTrip(self, value):
+        data = ser.serialize(value)
+        self.assertTrue(data.startswith(ser.START + ser.FORMAT + ser.BLOB))
+        self.assertTrue(data.endswith(ser.STOP))
+        self.assertEqual(ser.deserialize(data), value)
+        return data
+
+    def test_scalars(self):
+        for value in (num(0), num(-1.5), num(1e300), string(''), string('astro ✓'),
+                      ('bool', True), ('bool', False)):
+            self.assertRoundTrip(value)
+
+    def test_number_is_exact(self):
+        value = ser.deserialize(ser.serialize(num(0.1 + 0.2)))
+        self.assertEqual(value[1], 0.1 + 0.2)
+
+    def test_instruction_bytes_in_strings(self):
+        # Format 001 split the data by these bytes
+        self.assertRoundTrip(array(string('\x80\x82\x85\x8f'), string('a\x84b')))
+
+    def test_mixed_array(self):
+        data = self.assertRoundTrip(array(num(1), string('two'), ('bool', True)))
+        self.assertEqual(data[5:6], ser.ARRAY_T)
+
+    def test_empty(self):
+        self.assertRoundTrip(array())
+        self.assertRoundTrip(map_())
+
+    def test_numbers_are_packed(self):
+        value = ('array', apy.NumArray.pack([num(1), num(2.5), num(-3)]))
+        data = ser.serialize(value)
+        self.assertEqual(data[5:6], ser.NUMS_T)
+        self.assertEqual(len(data), 5 + 5 + 3 * 8 + 1)
+        result = ser.deserialize(data)
+        self.assertIsInstance(result[1], apy.NumArray)
+        self.assertEqual(list(result[1]), list(value[1]))
+
+    def test_list_of_numbers_is_packed(self):
+        data = ser.serialize(array(num(1), num(2)))
+        self.assertEqual(data[5:6], ser.NUMS_T)
+        self.assertEqual(list(ser.deserialize(data)[1]), [num(1), num(2)])
+
+    def test_map(self):
+        self.assertRoundTrip(map_((num(1), string('one')), (string('a'), ('bool', False)),
+                                  (('bool', True), num(3))))
+
+    def test_nesting(self):
+        value = map_(
+            (string('list'), array(num(1), array(string('x'), map_((num(2), array()))), ('bool', True))),
+            (string('map'), map_((string('inner'), array(num(5), string('y'))))),
+        )
+        self.assertRoundTrip(value)
+
+    def test_deep_nesting(self):
+        value = string('bottom')
+        for _ in range(10000):
+            value = array(value, num(1))
+        # Comparing the values would recurse, so the result is walked
+        result = ser.deserialize(ser.serialize(value))
+        for _ in range(10000):
+            self.assertEqual(result[0], 'array')
+            self.assertEqual(result[1][1], num(1))
+            result = result[1][0]
+        self.assertEqual(result, string('bottom'))
+
+    def test_small_buffer(self):
+        value = array(string('x' * 100), num(1), map_((string('key'), string('y' * 40))),
+                      ('array', apy.NumArray.pack([num(i) for i in range(50)])), ('bool', True))
+        data = ser.serialize(value)
+        for size in (9, 16, 33):
+            with self.subTest(buffer_size=size):
+                self.assertEqual(ser.Reader(io.BytesIO(data[4:]), size).read(), value)
+
+    def test_self_reference(self):
+        items = []
+        items.append(('array', items))
+        with self.assertRaises(RuntimeError) as e:
+            ser.serialize(('array', items))
+        self.assertTrue(str(e.exception).startswith(f'{apy.errors.type_error}::'))
+
+    def test_shared_value(self):
+        # The same array twice is not a cycle
+        shared = array(string('s'))
+        self.assertRoundTrip(array(shared, shared))
+
+    def test_unserializable_type(self):
+        with self.assertRaises(RuntimeError):
+            ser.serialize(array(('null', None)))
+
+
+class DecodeErrorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data = bytes(ser.serialize(array(string('hello'), map_((num(1), num(2))))))
+
+    def test_truncated(self):
+        for n in range(len(self.data)):
+            with self.subTest(length=n):
+                with self.assertRaises(ser.DecodeError):
+                    ser.deserialize(self.data[:n])
+
+    def test_trailing_data(self):
+        with self.assertRaises(ser.DecodeError):
+            ser.deserialize(self.data + b'x')
+
+    def test_unknown_format(self):
+        with self.assertRaises(ser.DecodeError):
+            ser.deserialize(ser.START + b'009' + self.data[4:])
+
+    def test_unknown_type(self):
+        data = bytearray(self.data)
+        data[5] = ord('z')
+        with self.assertRaises(ser.DecodeError):
+            ser.deserialize(bytes(data))
+
+    def test_wrong_length(self):
+        data = bytearray(self.data)
+        data[6] += 1
+        with self.assertRaises(ser.DecodeError):
+            ser.deserialize(bytes(data))
+
+    def test_huge_length(self):
+        # 11 bytes declaring a payload of almost 4 GB
+        for type_ in (ser.STRING_T, ser.NUMS_T):
+            data = ser.START + ser.FORMAT + ser.BLOB + type_ + ser.U32.pack(0xF0000000)
+            with self.subTest(type=type_):
+                tracemalloc.start()
+                try:
+                    with self.assertRaises(ser.DecodeError):
+                        ser.deserialize(data)
+                    peak = tracemalloc.get_traced_memory()[1]
+                finally:
+                    tracemalloc.stop()
+                self.assertLess(peak, 4 * ser.CHUNK_SIZE)
+
+    def test_long_payloads(self):
+        # Longer than a few chunks, read with a growing array
+        value = array(string('x' * (3 * ser.CHUNK_SIZE + 5)), ('array', apy.NumArray(range(400000))))
+        self.assertEqual(ser.deserialize(bytes(ser.serialize(value))), value)
+
+    def test_invalid_key(self):
+        # An array cannot be the key of a map
+        data = ser.serialize(map_((string('k'), num(1))))
+        data = data.replace(b's\x01\x00\x00\x00k', b'a\x04\x00\x00\x00\x00\x00\x00\x00')
+        with self.assertRaises(ser.DecodeError):
+            ser.deserialize(bytes(data))
+
+
+class Format001Test(unittest.TestCase):
+    """ Data written by the previous version of the mixin. """
+
+    def test_number(self):
+        self.assertEqual(ser.deserialize(b'\x80001\x82\x84n2.5\x8f'), num(2.5))
+
+    def test_string(self):
+        self.assertEqual(ser.deserialize(b'\x80001\x82\x84shello\x8f'), string('hello'))
+
+    def test_bool(self):
+        self.assertEqual(ser.deserialize(b'\x80001\x82\x84b1\x8f'), ('bool', True))
+        self.assertEqual(ser.deserialize(b'\x80001\x82\x84b0\x8f'), ('bool', False))
+
+    def test_array(self):
+        data = b'\x80001\x82a\x85\x84n1.0\x85\x84sab\x85\x84b0\x8f'
+        self.assertEqual(ser.deserialize(data), array(num(1), string('ab'), ('bool', False)))
+
+    def test_map(self):
+        data = b'\x80001\x82m\x85\x86n1\x85\x87sone\x85\x86sk\x85\x87b1\x8f'
+        self.assertEqual(ser.deserialize(data), map_((num(1), string('one')), (string('k'), ('bool', True))))
+
+    def test_missing_stop(self):
+        with self.assertRaises(ser.DecodeError):
+            ser.deserialize(b'\x80001\x82\x84n2.5')
+
+
+class FileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.temp = tempfile.TemporaryDirectory()
+        os.chdir(self.temp.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.temp.cleanup()
+
+    def test_file(self):
+        value = map_((string('a'), array(num(1), string('b'))))
+        ser.f_serialize(value, 'object.ser')
+        self.assertEqual(ser.f_deserialize('object.ser'), value)
+
+    def test_corrupted_file(self):
+        with open('object.ser', 'wb') as f:
+            f.write(ser.serialize(string('data'))[:-3])
+        with self.assertRaises(RuntimeError) as e:
+            ser.f_deserialize('object.ser')
+        self.assertTrue(str(e.exception).startswith(f'{apy.errors.file_error}::'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+""" Tests of the server mode of the interpreter & its client. """
+import contextlib
+import tempfile
+import threading
+import unittest
+import time
+import io
+import os
+
+import interpreter
+import client
+
+
+class ServeRequestTest(unittest.TestCase):
+
+    def serve(self, request):
+        messages = []
+        interpreter.serve_request(request, messages.append, use_cache=False)
+        return messages
+
+    def test_lines_sent_while_running(self):
+        # Every printed line is its own message, not a buffer at the end
+        self.assertEqual(self.serve({'source': 'say 1\nsay "a"'}),
+                         [{'out': '1.0\n'}, {'out': 'a\n'}, {'status': 0}])
+
+    def test_error_status(self):
+        messages = self.serve({'source': 'say 1\nsay x'})
+        self.assertEqual(messages[0], {'out': '1.0\n'})
+        self.assertIn('UndefinedVariable', messages[1]['out'])
+        self.assertEqual(messages[-1], {'status': 1})
+
+    def test_invalid_request(self):
+        messages = []
+        interpreter.serve_lines(['{"x": 1}\n', '\n', '{"source": "say 2"}\n'], messages.append, False)
+        self.assertIn('RequestError', messages[0]['out'])
+        self.assertEqual(messages[1:], [{'status': 1}, {'out': '2.0\n'}, {'status': 0}])
+
+
+class ClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def script(self, name, source):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w') as f:
+            f.write(source)
+        return path
+
+    def run_client(self, *argv):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            status = client.main(list(argv))
+        return status, out.getvalue()
+
+    def test_scripts(self):
+        socket_path = os.path.join(self.tmp.name, 'asx.sock')
+        threading.Thread(target=interpreter.serve, args=(socket_path, False), daemon=True).start()
+        for _ in range(500):
+            if os.path.exists(socket_path):
+                break
+            time.sleep(0.01)
+
+        first = self.script('a.asx', 'say 1\n')
+        second = self.script('b.asx', 'say 2\nsay x\n')
+        status, out = self.run_client(first, second, '--socket', socket_path)
+        self.assertEqual(status, 1)
+        self.assertTrue(out.startswith('1.0\n2.0\n'))
+        self.assertIn('UndefinedVariable', out)
+
+    def test_no_server(self):
+        status, out = self.run_client('a.asx', '--socket', os.path.join(self.tmp.name, 'none.sock'))
+        self.assertEqual(status, 2)
+        self.assertIn('ServerError', out)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+""" Tests of the streaming execution, run_stream() has to give the same
+output, return value & errors as running the whole parsed file. """
+import textwrap
+import tempfile
+import unittest
+import glob
+import io
+import os
+
+import interpreter as asx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPTS = {
+    'flow': '''
+        #fib(n):
+            if n < 2:
+                return n
+            return fib(n - 1) + fib(n - 2)
+
+        x = 0
+        while x < 5:
+            x = x + 1
+            if x == 1:
+                say "one"
+            elif x == 2:
+                say "two"
+            else:
+                say x
+        if x > 10:
+            say "big"
+        if x == 5:
+            say "five"
+        elif x == 6:
+            say "six"
+        say fib(10)
+    ''',
+    'libraries': '''
+        import Array
+        import String
+        import Map
+        import Utils
+        import Serialize
+
+        a = [3, 1, 2]
+        say Array.len(a), Array.sum(a), Array.max(a)
+        say Array.sort(a)
+        say String.upper("abc"), String.length("hello")
+        m = {1: "one", "a": True}
+        say Map.get(m, 1), Map.len(m)
+        say String.length(Utils.md5("x"))
+        n = Serialize.serialize(a, "a.bin")
+        say Serialize.deserialize("a.bin")
+    ''',
+    'return': '''
+        say 1
+        if True:
+            return 7
+        say 2
+    ''',
+    'runtime_error': '''
+        say 1
+        a = [1, 2]
+        say 2
+        b = a[5]
+        say 3
+    ''',
+    'undefined': '''
+        #f(x):
+            return x + y
+        say "before"
+        say f(1)
+        say "after"
+    ''',
+}
+
+
+class StreamTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(tmp.name)
+
+    def script(self, name: str) -> str:
+        path = os.path.abspath(f'{name}.asx')
+        with open(path, 'w') as f:
+            f.write(textwrap.dedent(SCRIPTS[name]))
+        return path
+
+    @staticmethod
+    def execute(method: str, path: str, **kw):
+        """ Returns the output, the return value & the error type of
+        the script. """
+        out = io.StringIO()
+        interpreter = asx.Interpreter(out=out, use_cache=False, **kw)
+        try:
+            value, error = getattr(interpreter, method)(path), None
+        except asx.ScriptError as e:
+            value, error = None, e.ErrorType
+        return out.getvalue(), value, error
+
+    def assertSame(self, path: str, **kw):
+        whole = self.execute('run_file', path, **kw)
+        self.assertEqual(self.execute('run_stream', path, **kw), whole)
+        return whole
+
+    def test_library_files(self):
+        paths = glob.glob(os.path.join(ROOT, 'lib', '*.asx'))
+        paths += glob.glob(os.path.join(ROOT, 'examples', '**', '*.asx'), recursive=True)
+        self.assertTrue(paths)
+        for path in sorted(paths):
+            with self.subTest(path=os.path.relpath(path, ROOT)):
+                self.assertEqual(self.assertSame(path)[2], None)
+
+    def test_scripts(self):
+        for name in SCRIPTS:
+            with self.subTest(name=name):
+                out, _, _ = self.assertSame(self.script(name))
+                self.assertTrue(out)
+
+    def test_return(self):
+        self.assertEqual(self.assertSame(self.script('return')), ('1.0\n', ('num', 7.0), None))
+
+    def test_error_partway(self):
+        out, _, error = self.assertSame(self.script('runtime_error'))
+        self.assertEqual(out.splitlines()[:2], ['1.0', '2.0'])
+        self.assertEqual(len(out.splitlines()), 3)
+        self.assertEqual(error, asx.index_error)
+
+        out, _, error = self.assertSame(self.script('undefined'))
+        self.assertEqual(out.splitlines()[0], 'before')
+        self.assertEqual(error, asx.undef_var)
+
+    def test_ignored_errors(self):
+        out, _, error = self.assertSame(self.script('runtime_error'), ignore_errors=True)
+        self.assertEqual(error, None)
+        self.assertEqual(out.splitlines()[-1], '3.0')
+
+    def test_syntax_error(self):
+        # The one difference: the statements above a syntax error have
+        # already run when it's found
+        with open('broken.asx', 'w') as f:
+            f.write('say 1\nsay 2\nx = = 1\nsay 3\n')
+        out, _, error = self.execute('run_file', 'broken.asx')
+        self.assertEqual((out.count('\n'), error), (1, asx.syntax_error))
+        out, _, error = self.execute('run_stream', 'broken.asx')
+        self.assertEqual(out.splitlines()[:2], ['1.0', '2.0'])
+        self.assertEqual(error, asx.syntax_error)
+
+
+if __name__ == '__main__':
+    unittest.main()
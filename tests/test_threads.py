@@ -0,0 +1,102 @@
+""" Tests of many interpreters running at the same time in one process. """
+import concurrent.futures
+import threading
+import textwrap
+import tempfile
+import unittest
+import io
+import os
+
+from helpers import run
+import interpreter as asx
+from asp import apc
+
+THREADS = 16
+
+# Every thread runs the script with its own n, so output showing up in
+# the wrong interpreter or variables leaking between them would change it
+SCRIPT = textwrap.dedent('''
+    import Array
+    import String
+    import Map
+
+    #fib(k):
+        if k < 2:
+            return k
+        return fib(k - 1) + fib(k - 2)
+
+    n = {n}
+    total = 0
+    i = 0
+    while i < 50:
+        total = total + n
+        i = i + 1
+    say n, total, fib(n)
+    a = [n, 3, 1]
+    say Array.sort(a), Array.sum(a)
+    say String.upper("thread"), String.length("{name}")
+    m = {{n: "n"}}
+    say Map.get(m, n)
+    say missing
+''')
+
+
+def output(n: int) -> str:
+    return run(SCRIPT.format(n=n, name='x' * n), ignore_errors=True)[0]
+
+
+class ThreadTest(unittest.TestCase):
+
+    def test_concurrent_interpreters(self):
+        expected = [output(n) for n in range(THREADS)]
+        self.assertEqual(len(set(expected)), THREADS)
+
+        # All threads start at once, every one of them running a few times
+        barrier = threading.Barrier(THREADS)
+
+        def worker(n: int) -> list:
+            barrier.wait()
+            return [output(n) for _ in range(5)]
+
+        with concurrent.futures.ThreadPoolExecutor(THREADS) as pool:
+            results = list(pool.map(worker, range(THREADS)))
+
+        for n, outputs in enumerate(results):
+            with self.subTest(n=n):
+                self.assertEqual(outputs, [expected[n]] * 5)
+
+    def test_cached_script(self):
+        # The threads share the parsed code of one file & its cache file
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'script.asx')
+            with open(path, 'w') as f:
+                f.write(SCRIPT.format(n=10, name='name'))
+            expected = io.StringIO()
+            asx.Interpreter(out=expected, use_cache=False, ignore_errors=True).run_file(path)
+            apc._memory.clear()
+            self.addCleanup(apc._memory.clear)
+            barrier = threading.Barrier(THREADS)
+
+            def worker(_) -> str:
+                out = io.StringIO()
+                barrier.wait()
+                asx.Interpreter(out=out, ignore_errors=True).run_file(path)
+                return out.getvalue()
+
+            with concurrent.futures.ThreadPoolExecutor(THREADS) as pool:
+                results = list(pool.map(worker, range(THREADS)))
+
+        self.assertEqual(results, [expected.getvalue()] * THREADS)
+
+    def test_separate_memory(self):
+        first = asx.Interpreter(out=io.StringIO(), use_cache=False)
+        second = asx.Interpreter(out=io.StringIO(), use_cache=False)
+        first.run('x = 1\n#f():\n    return 2\n')
+        with self.assertRaises(asx.ScriptError):
+            second.run('say x\n')
+        with self.assertRaises(asx.ScriptError):
+            second.run('say f()\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
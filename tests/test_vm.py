@@ -0,0 +1,428 @@
+""" Tests of the compiler (asc) and the interpreter executing its code. """
+from unittest import mock
+import textwrap
+import tempfile
+import unittest
+import json
+import io
+import os
+
+import asp.asp3 as asp
+import asp.apc as apc
+import asc
+from asc import opcodes as op
+from helpers import run
+import interpreter as asx
+
+
+def compile_source(source: str, **kw) -> asc.Code:
+    parsed = asp.parse(textwrap.dedent(source).splitlines(True), assignment_kw='params')
+    return asc.compile_code(parsed, assignment_kw='params', **kw)
+
+
+def instructions(code: asc.Code) -> list:
+    """ Returns the (opcode, argument) pairs of the code. """
+    return list(zip(code.ops[::2], code.ops[1::2]))
+
+
+def opcodes(code: asc.Code) -> list:
+    return code.ops[::2]
+
+
+class IndexTest(unittest.TestCase):
+
+    def test_string_index(self):
+        out, _ = run('''
+            s = "hello"
+            c = s[1]
+            say c
+        ''')
+        self.assertEqual(out, 'e\n')
+
+    def test_string_index_out_of_range(self):
+        with self.assertRaises(asx.ScriptError) as e:
+            run('s = "hi"\nc = s[5]\n')
+        self.assertEqual(e.exception.ErrorType, asx.index_error)
+
+    def test_array_index(self):
+        out, _ = run('a = [1, "two", True]\nb = a[1]\nsay b\n')
+        self.assertEqual(out, 'two\n')
+
+    def test_array_index_out_of_range(self):
+        with self.assertRaises(asx.ScriptError) as e:
+            run('a = [1, 2]\nb = a[2]\n')
+        self.assertEqual(e.exception.ErrorType, asx.index_error)
+
+    def test_number_index(self):
+        with self.assertRaises(asx.ScriptError) as e:
+            run('n = 5\nb = n[0]\n')
+        self.assertEqual(e.exception.ErrorType, asx.index_error)
+
+    def test_ignored_index_error(self):
+        out, _ = run('n = 5\nb = n[0]\nsay b\n', ignore_errors=True)
+        self.assertEqual(out.splitlines()[-1], 'null')
+
+
+class ImportTest(unittest.TestCase):
+
+    def setUp(self):
+        # User libraries are looked up in the working directory
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(tmp.name)
+        with open('Counted.asx', 'w') as f:
+            f.write('say "loaded"\n#inc(a):\n    return a + 1\n')
+
+    def test_missing_library(self):
+        with self.assertRaises(asx.ScriptError) as e:
+            run('import NoSuchLibrary\n')
+        self.assertEqual(e.exception.ErrorType, asx.file_error)
+
+    def test_imported_once(self):
+        out, _ = run('''
+            import Counted
+            import Counted
+            #f(x):
+                import Counted
+                return Counted.inc(x)
+            y = f(1)
+            y = f(y)
+            say y
+        ''')
+        self.assertEqual(out, 'loaded\n3.0\n')
+
+    def test_parsed_once_per_process(self):
+        # Every interpreter runs the library, the process only parses it once
+        apc._memory.clear()
+        self.addCleanup(apc._memory.clear)
+        with mock.patch.object(apc.asp3, 'parse', wraps=asp.parse) as parse:
+            for _ in range(3):
+                out = io.StringIO()
+                asx.Interpreter(out=out).run('import Counted\n')
+                self.assertEqual(out.getvalue(), 'loaded\n')
+        libraries = [call for call in parse.call_args_list if call.args[0][0] == 'say "loaded"\n']
+        self.assertEqual(len(libraries), 1)
+
+
+class MixinIndexTest(unittest.TestCase):
+
+    MODULE = textwrap.dedent('''
+        import astropy as apy
+
+        def f_mixin(scope):
+            return {}
+
+        def __build__():
+            return [apy.render(f_mixin, '{lib}', '{name}')]
+    ''')
+
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp.cleanup)
+        self.write('m_one', '__One', 'first')
+
+    def write(self, module: str, lib: str, name: str, mtime: int = None):
+        path = os.path.join(self.temp.name, f'{module}.py')
+        with open(path, 'w') as f:
+            f.write(self.MODULE.replace('{lib}', lib).replace('{name}', name))
+        if mtime is not None:
+            os.utime(path, ns=(mtime, mtime))
+
+    def mixins(self):
+        """ Returns a new loader of the temporary mixins, as a new process would have. """
+        return asx.Mixins(self.temp.name)
+
+    def test_index(self):
+        self.assertEqual(self.mixins().get('__One#first').name, '__One#first')
+        with open(os.path.join(self.temp.name, asx.Mixins.INDEX_FILE)) as f:
+            self.assertEqual(json.load(f)['mixins'], {'__One#first': 'm_one'})
+
+    def test_index_used(self):
+        self.mixins().get('__One#first')
+        with mock.patch.object(asx.Mixins, 'build', autospec=True, side_effect=asx.Mixins.build) as build:
+            mixins = self.mixins()
+            self.assertIsNone(mixins.get('__One#other'))
+            build.assert_not_called()
+            self.assertIsNotNone(mixins.get('__One#first'))
+        build.assert_called_once_with(mixins, 'm_one')
+
+    def test_added_module(self):
+        self.mixins().get('__One#first')
+        self.write('m_two', '__Two', 'second')
+        mixins = self.mixins()
+        self.assertIsNotNone(mixins.get('__Two#second'))
+        self.assertIsNotNone(mixins.get('__One#first'))
+
+    def test_changed_module(self):
+        self.mixins().get('__One#first')
+        # Same size, only the modification time tells the change apart
+        stat = os.stat(os.path.join(self.temp.name, 'm_one.py'))
+        self.write('m_one', '__One', 'fixed', mtime=stat.st_mtime_ns + 10 ** 9)
+        mixins = self.mixins()
+        self.assertIsNone(mixins.get('__One#first'))
+        self.assertEqual(mixins.get('__One#fixed').name, '__One#fixed')
+
+    def test_removed_module(self):
+        self.write('m_two', '__Two', 'second')
+        self.mixins().get('__Two#second')
+        os.remove(os.path.join(self.temp.name, 'm_two.py'))
+        mixins = self.mixins()
+        self.assertIsNone(mixins.get('__Two#second'))
+        self.assertIsNotNone(mixins.get('__One#first'))
+
+
+class CompilerTest(unittest.TestCase):
+
+    def test_assignment(self):
+        code = compile_source('x = y\n')
+        self.assertEqual(opcodes(code), [op.LOAD_NAME, op.STORE_NAME])
+        self.assertEqual(code.names, ['y', 'x'])
+
+    def test_constants(self):
+        code = compile_source('x = 1\ny = 1\nsay "a"\n')
+        self.assertEqual(instructions(code), [(op.LOAD_CONST, 0), (op.STORE_NAME, 0),
+                                              (op.LOAD_CONST, 0), (op.STORE_NAME, 1),
+                                              (op.LOAD_CONST, 1), (op.OUT, 1)])
+        self.assertEqual(code.consts, [('num', 1.0), ('str', 'a')])
+
+    def test_call_site_named_like_a_value(self):
+        out, _ = run('''
+            x = 1
+            #num(a):
+                return a + 1
+            y = num(2)
+            say y
+        ''')
+        self.assertEqual(out, '3.0\n')
+
+    def test_call_sites_apart_from_constants(self):
+        code = asc.Code('test')
+        self.assertNotEqual(code.add_const(('num', 1.0)), code.add_call('num', 1))
+        self.assertEqual(code.add_call('num', 1), code.add_call('num', 1))
+
+    def test_constants_keyed_by_type_and_sign(self):
+        code = asc.Code('test')
+        indexes = [code.add_const(value) for value in (1, 1.0, True, 0.0, -0.0, (0.0,), (-0.0,))]
+        self.assertEqual(len(set(indexes)), 7)
+        self.assertIs(type(code.consts[0]), int)
+        self.assertEqual(str(code.consts[4]), '-0.0')
+        self.assertEqual(code.add_const(-0.0), indexes[4])
+
+    def test_dis(self):
+        listing = asc.dis(compile_source('x = 1\n'))
+        self.assertIn('LOAD_CONST', listing)
+        self.assertIn('STORE_NAME', listing)
+
+
+class ExecutionTest(unittest.TestCase):
+
+    def test_variables(self):
+        out, _ = run('a = 2\nb = a\nsay b\n')
+        self.assertEqual(out, '2.0\n')
+
+    def test_undefined_variable(self):
+        with self.assertRaises(asx.ScriptError) as e:
+            run('say nothing\n')
+        self.assertEqual(e.exception.ErrorType, asx.undef_var)
+
+    def test_delete(self):
+        with self.assertRaises(asx.ScriptError) as e:
+            run('a = 1\ndelete a\nsay a\n')
+        self.assertEqual(e.exception.ErrorType, asx.undef_var)
+
+    def test_return_value(self):
+        _, value = run('x = 3\nreturn x\n')
+        self.assertEqual(value, ('num', 3.0))
+
+
+class FrameTest(unittest.TestCase):
+
+    def test_function_locals(self):
+        code = compile_source('#f(a):\n    b = a\n    return b\n')
+        func = code.consts[0]
+        self.assertEqual(func.varnames, ['a', 'b'])
+        self.assertEqual(opcodes(func), [op.LOAD_FAST, op.STORE_FAST, op.LOAD_FAST, op.RETURN_VALUE])
+
+    def test_globals_in_function(self):
+        code = compile_source('#f(a):\n    return x\n')
+        self.assertEqual(opcodes(code.consts[0]), [op.LOAD_NAME, op.RETURN_VALUE])
+
+    def test_locals_do_not_leak(self):
+        out, _ = run('''
+            x = 1
+            #change(a):
+                x = a
+                return x
+            y = change(5)
+            say x
+            say y
+        ''')
+        self.assertEqual(out, '1.0\n5.0\n')
+
+    def test_recursion(self):
+        out, _ = run('''
+            #fib(n):
+                if n < 2:
+                    return n
+                return fib(n - 1) + fib(n - 2)
+            x = fib(10)
+            say x
+        ''')
+        self.assertEqual(out, '55.0\n')
+
+    def test_deep_recursion(self):
+        source = '''
+            #down(n):
+                if n < 1:
+                    return 0
+                return down(n - 1)
+            x = down(5000)
+            say "after"
+        '''
+        with self.assertRaises(asx.ScriptError) as e:
+            run(source)
+        self.assertEqual(e.exception.ErrorType, asx.recursion_error)
+        self.assertIn('"down"', e.exception.error_message)
+        # Ignoring the error, the calls are unwound & the script goes on
+        out, _ = run(source, ignore_errors=True)
+        self.assertEqual(out.count('[RecursionError]'), 1)
+        self.assertTrue(out.endswith('after\n'))
+
+
+class ExpressionTest(unittest.TestCase):
+
+    def test_precedence(self):
+        out, _ = run('x = 2 + 3 * 4 - (1 + 1) / 2\nsay x\n')
+        self.assertEqual(out, '13.0\n')
+
+    def test_names(self):
+        out, _ = run('a = 2\nb = a * a + a\nc = -a\nsay b\nsay c\n')
+        self.assertEqual(out, '6.0\n-2.0\n')
+
+    def test_strings(self):
+        out, _ = run('a = "ab"\nb = "cd"\nc = a + b\nsay c\n')
+        self.assertEqual(out, 'abcd\n')
+
+    def test_string_literals(self):
+        out, _ = run('''
+            s = "ab"
+            t = s + "c\\q"
+            u = "x" + s + "y"
+            v = s == "ab"
+            w = s != "ab"
+            say t
+            say u
+            say v
+            say w
+        ''')
+        self.assertEqual(out, 'abc"\nxaby\nTrue\nFalse\n')
+
+    def test_string_folding(self):
+        code = compile_source('x = "a" + "b"\n')
+        self.assertEqual(code.consts, [('str', 'ab')])
+
+    def test_cached_string_literals(self):
+        tree = asc.expression.parse(['s', 'ADD', ['str', 'a']])
+        self.assertEqual(tree, ('binary', 'ADD', ('var', 's'), ('const', ('str', 'a'))))
+
+    def test_type_error(self):
+        with self.assertRaises(asx.ScriptError) as e:
+            run('a = "ab"\nb = 1\nc = a - b\n')
+        self.assertEqual(e.exception.ErrorType, asx.type_error)
+
+    def test_operations(self):
+        code = compile_source('x = y + 1\n')
+        self.assertEqual(opcodes(code), [op.LOAD_NAME, op.LOAD_CONST, op.BINARY_ADD, op.STORE_NAME])
+
+    def test_constant_folding(self):
+        code = compile_source('x = 2 + 3 * 4\n')
+        self.assertEqual(instructions(code), [(op.LOAD_CONST, 0), (op.STORE_NAME, 0)])
+        self.assertEqual(code.consts, [('num', 14.0)])
+
+    def test_partial_folding(self):
+        code = compile_source('x = y * (2 + 3)\n')
+        self.assertEqual(opcodes(code), [op.LOAD_NAME, op.LOAD_CONST, op.BINARY_MUL, op.STORE_NAME])
+        self.assertIn(('num', 5.0), code.consts)
+
+
+class ControlFlowTest(unittest.TestCase):
+
+    def test_if_elif_else(self):
+        source = '''
+            x = {}
+            if x < 1:
+                say "small"
+            elif x < 10:
+                say "medium"
+            else:
+                say "large"
+        '''
+        for x, expected in ((0, 'small'), (5, 'medium'), (50, 'large')):
+            out, _ = run(source.replace('{}', str(x)))
+            self.assertEqual(out, expected + '\n')
+
+    def test_while(self):
+        out, _ = run('''
+            i = 0
+            total = 0
+            while i < 5:
+                total = total + i
+                i = i + 1
+            say total
+        ''')
+        self.assertEqual(out, '10.0\n')
+
+    def test_string_conditions(self):
+        out, _ = run('''
+            s = ""
+            while s != "aaa":
+                s = s + "a"
+            if s == "abc":
+                say "abc"
+            elif s + "b" == "aaab":
+                say s
+        ''')
+        self.assertEqual(out, 'aaa\n')
+
+    def test_while_never_taken(self):
+        out, _ = run('i = 5\nwhile i < 5:\n    say i\nsay "done"\n')
+        self.assertEqual(out, 'done\n')
+
+    def assertJumps(self, code: asc.Code):
+        """ Every jump has to land on an instruction of the code. """
+        for pos, (opcode, arg) in enumerate(instructions(code)):
+            if opcode in (op.JUMP, op.JUMP_IF_FALSE, op.JUMP_IF_TRUE):
+                self.assertEqual(arg % 2, 0)
+                self.assertTrue(0 <= arg <= len(code.ops), f'jump at {pos * 2} to {arg}')
+
+    def test_if_jumps(self):
+        code = compile_source('if x:\n    say 1\nelif y:\n    say 2\nelse:\n    say 3\nsay 4\n')
+        self.assertJumps(code)
+        ops = instructions(code)
+        # The first condition jumps to the elif condition
+        first = [opcode for opcode, _ in ops].index(op.JUMP_IF_FALSE)
+        self.assertEqual(ops[ops[first][1] // 2], (op.LOAD_NAME, code.names.index('y')))
+        # Both taken branches jump to the last say, over the else block
+        ends = [arg for opcode, arg in ops if opcode == op.JUMP]
+        self.assertEqual(len(ends), 2)
+        self.assertEqual(len(set(ends)), 1)
+        self.assertEqual(ends[0], len(code.ops) - 4)
+
+    def test_constant_if(self):
+        code = compile_source('if 1 == 2:\n    say 1\nelse:\n    say 2\n')
+        self.assertEqual(opcodes(code), [op.LOAD_CONST, op.OUT])
+        self.assertEqual(code.consts, [('num', 2.0)])
+
+    def test_while_jumps(self):
+        code = compile_source('while i < 3:\n    i = i + 1\n')
+        self.assertJumps(code)
+        ops = instructions(code)
+        # The loop jumps to the condition first, placed after the body
+        self.assertEqual(ops[0][0], op.JUMP)
+        self.assertEqual(ops[ops[0][1] // 2], (op.LOAD_NAME, code.names.index('i')))
+        self.assertEqual(ops[-1], (op.JUMP_IF_TRUE, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()